@@ -0,0 +1,98 @@
+"""
+后台刷新
+Background Refresh
+
+过期缓存先返回旧数据，由后台线程带抖动和指数退避重新获取（stale-while-revalidate）
+"""
+
+import heapq
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BackgroundRefresher:
+    """Single daemon thread that re-fetches keys scheduled by cache readers.
+
+    ``refresh(key)`` must return True on success. Failed refreshes are retried
+    with exponential backoff plus jitter until ``give_up(key)`` says the entry
+    is past its hard staleness limit, at which point readers fetch it
+    synchronously again. ``close()`` stops the thread.
+    """
+
+    def __init__(self, refresh: Callable[[str], bool], give_up: Callable[[str], bool],
+                 jitter: float = 1.0, backoff_base: float = 2.0, backoff_max: float = 60.0):
+        self.refresh = refresh
+        self.give_up = give_up
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.refreshes = 0
+        self.failures = 0
+
+        self._queue: List[Tuple[float, str, int]] = []
+        self._scheduled: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='rate-refresher', daemon=True)
+        self._thread.start()
+
+    def schedule(self, key: str):
+        """Queue a refresh for key unless one is already pending"""
+        with self._condition:
+            if self._closed or key in self._scheduled:
+                return
+            self._push(key, attempt=0, delay=random.uniform(0, self.jitter))
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._scheduled)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Drop pending refreshes and stop the thread, waiting up to timeout for a running one"""
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._scheduled.clear()
+            self._condition.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _push(self, key: str, attempt: int, delay: float):
+        self._scheduled[key] = attempt
+        heapq.heappush(self._queue, (time.monotonic() + delay, key, attempt))
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                _, key, attempt = heapq.heappop(self._queue)
+
+            try:
+                succeeded = self.refresh(key)
+            except Exception:
+                succeeded = False
+
+            with self._condition:
+                if self._closed:
+                    return
+                if succeeded:
+                    self.refreshes += 1
+                    del self._scheduled[key]
+                    continue
+                self.failures += 1
+                if self.give_up(key):
+                    del self._scheduled[key]
+                    continue
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                self._push(key, attempt + 1, backoff + random.uniform(0, self.jitter))
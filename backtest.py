@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+历史回测
+Historical Backtest
+
+在大量历史汇率快照上并行重放排行逻辑：快照数组放在共享内存中，由进程池按区间
+分片处理，最后合并为排名频次和收益率统计
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import click
+import numpy as np
+
+
+class BacktestResult(NamedTuple):
+    """Aggregated rankings over ``snapshots`` rate snapshots.
+
+    ``rank_counts[i, r]`` counts snapshots where currencies[i] ranked r+1;
+    efficiency statistics cover the snapshots where the path was available.
+    """
+    currencies: List[str]
+    snapshots: int
+    rank_counts: np.ndarray
+    available: np.ndarray
+    efficiency_sum: np.ndarray
+    efficiency_min: np.ndarray
+    efficiency_max: np.ndarray
+    positive: np.ndarray
+
+    @property
+    def best_counts(self) -> np.ndarray:
+        return self.rank_counts[:, 0]
+
+    @property
+    def best_frequency(self) -> np.ndarray:
+        return self.best_counts / self.snapshots if self.snapshots else np.zeros(len(self.currencies))
+
+    @property
+    def mean_efficiency(self) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.efficiency_sum / self.available
+
+    def summary(self) -> List[Dict]:
+        """One row per currency, most often best first"""
+        mean = self.mean_efficiency
+        rows = [
+            {
+                'currency': currency,
+                'best_count': int(self.best_counts[i]),
+                'best_frequency': float(self.best_frequency[i]),
+                'top_counts': self.rank_counts[i].tolist(),
+                'available': int(self.available[i]),
+                'mean_efficiency': float(mean[i]),
+                'min_efficiency': float(self.efficiency_min[i]),
+                'max_efficiency': float(self.efficiency_max[i]),
+                'positive_frequency': float(self.positive[i] / self.available[i]) if self.available[i] else 0.0,
+            }
+            for i, currency in enumerate(self.currencies)
+        ]
+        rows.sort(key=lambda row: (-row['best_count'], -np.nan_to_num(row['mean_efficiency'], nan=-np.inf)))
+        return rows
+
+
+# -- worker side ---------------------------------------------------------------
+
+_worker_arrays: Dict[str, np.ndarray] = {}
+_worker_blocks: List[shared_memory.SharedMemory] = []
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        # Python 3.13+: don't let the worker's resource tracker unlink the parent's block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(specs: Dict[str, Tuple[str, Tuple[int, ...], str]]):
+    """Map the parent's shared arrays into this worker process (no copies)"""
+    for key, (name, shape, dtype) in specs.items():
+        block = _attach(name)
+        _worker_blocks.append(block)
+        _worker_arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _rank_chunk(start: int, end: int, top_ranks: int) -> Tuple[np.ndarray, ...]:
+    """Rank snapshots [start, end) and return partial aggregates"""
+    return _aggregate(_worker_arrays['to_intermediate'][start:end],
+                      _worker_arrays['to_target'][start:end],
+                      _worker_arrays['direct'][start:end], top_ranks)
+
+
+def _aggregate(to_intermediate: np.ndarray, to_target: np.ndarray, direct: np.ndarray,
+               top_ranks: int) -> Tuple[np.ndarray, ...]:
+    """Same scoring as RateMatrix.rank_intermediates, applied to a block of snapshots"""
+    snapshots, n = to_intermediate.shape
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = (to_intermediate * to_target / direct[:, np.newaxis] - 1) * 100
+    valid = np.isfinite(scores) & (to_intermediate > 0) & (to_target > 0) & (direct[:, np.newaxis] > 0)
+    scores = np.where(valid, scores, np.nan)
+
+    # Unavailable paths sort last; stable ties follow currency order like the analyzer
+    order = np.argsort(np.where(valid, -scores, np.inf), axis=1, kind='stable')[:, :top_ranks]
+    ranked_valid = np.take_along_axis(valid, order, axis=1)
+    rank_counts = np.zeros((n, order.shape[1]), dtype=np.int64)
+    for rank in range(order.shape[1]):
+        rank_counts[:, rank] = np.bincount(order[ranked_valid[:, rank], rank], minlength=n)
+
+    return (
+        rank_counts,
+        valid.sum(axis=0),
+        np.nansum(scores, axis=0),
+        np.where(valid.any(axis=0), np.where(valid, scores, np.inf).min(axis=0), np.nan),
+        np.where(valid.any(axis=0), np.where(valid, scores, -np.inf).max(axis=0), np.nan),
+        (valid & (scores > 0)).sum(axis=0),
+    )
+
+
+# -- parent side ---------------------------------------------------------------
+
+def run_backtest(currencies: Sequence[str], to_intermediate: np.ndarray, to_target: np.ndarray,
+                 direct: np.ndarray, workers: Optional[int] = None, top_ranks: int = 10,
+                 chunk_size: Optional[int] = None) -> BacktestResult:
+    """Rank every snapshot and merge the results.
+
+    ``to_intermediate[t, i]`` / ``to_target[t, i]`` are the CNY -> X and
+    X -> USD legs for currencies[i] at snapshot t, ``direct[t]`` the direct
+    CNY -> USD rate. The arrays are copied once into shared memory; each
+    worker attaches to them by name and processes a contiguous range of
+    snapshots, returning only per-currency aggregates.
+    """
+    snapshots, n = to_intermediate.shape
+    top_ranks = min(top_ranks, n)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-snapshots // (workers * 4)))  # ~4 chunks per worker for load balance
+
+    if workers == 1 or snapshots <= chunk_size:
+        parts = [_aggregate(to_intermediate, to_target, direct, top_ranks)] if snapshots else []
+    else:
+        parts = _run_parallel(
+            {'to_intermediate': to_intermediate, 'to_target': to_target, 'direct': direct},
+            snapshots, workers, top_ranks, chunk_size
+        )
+
+    return _merge(list(currencies), snapshots, n, top_ranks, parts)
+
+
+def _run_parallel(arrays: Dict[str, np.ndarray], snapshots: int, workers: int,
+                  top_ranks: int, chunk_size: int) -> List[Tuple[np.ndarray, ...]]:
+    blocks = []
+    try:
+        specs = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=np.float64)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            specs[key] = (block.name, array.shape, array.dtype.str)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs,)) as pool:
+            futures = [pool.submit(_rank_chunk, start, min(start + chunk_size, snapshots), top_ranks)
+                       for start in range(0, snapshots, chunk_size)]
+            return [future.result() for future in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _merge(currencies: List[str], snapshots: int, n: int, top_ranks: int,
+           parts: List[Tuple[np.ndarray, ...]]) -> BacktestResult:
+    rank_counts = np.zeros((n, top_ranks), dtype=np.int64)
+    available = np.zeros(n, dtype=np.int64)
+    efficiency_sum = np.zeros(n)
+    efficiency_min = np.full(n, np.nan)
+    efficiency_max = np.full(n, np.nan)
+    positive = np.zeros(n, dtype=np.int64)
+    for counts, part_available, part_sum, part_min, part_max, part_positive in parts:
+        rank_counts += counts
+        available += part_available
+        efficiency_sum += part_sum
+        efficiency_min = np.fmin(efficiency_min, part_min)
+        efficiency_max = np.fmax(efficiency_max, part_max)
+        positive += part_positive
+    return BacktestResult(currencies, snapshots, rank_counts, available, efficiency_sum,
+                          efficiency_min, efficiency_max, positive)
+
+
+def load_history_snapshots(history, currencies: Optional[Sequence[str]] = None,
+                           start: Optional[float] = None, end: Optional[float] = None,
+                           source: str = 'CNY', target: str = 'USD'):
+    """Backtest inputs from a ``rate_history.RateHistory``.
+
+    Snapshots are the stored source tables. Every leg is looked up in the
+    latest table of each base at or before the snapshot, in the order
+    ``RateMatrix.from_bulk_rates`` uses: the direct quote from the leg's own
+    base table, then the reverse of the other side's quote, then USD
+    triangulation. Returns (timestamps, currencies, to_intermediate,
+    to_target, direct).
+    """
+    if currencies is None:
+        currencies = [c for c in history.currencies if c not in (source, target)]
+    currencies = list(currencies)
+    timestamps = history.range(source, start, end, []).timestamps
+
+    def as_of(base: str, codes: List[str]) -> np.ndarray:
+        return _quotes_as_of(history, base, codes, timestamps, end)
+
+    source_quotes = as_of(source, currencies + [target])
+    target_quotes = as_of(target, currencies + [source])
+    usd_quotes = as_of('USD', currencies + [source, target])
+    usd = dict(zip(currencies + [source, target], usd_quotes))
+    usd['USD'] = np.ones(len(timestamps))
+
+    to_intermediate = np.empty((len(timestamps), len(currencies)))
+    to_target = np.empty((len(timestamps), len(currencies)))
+    for i, currency in enumerate(currencies):
+        own = as_of(currency, [source, target])
+        to_intermediate[:, i] = _leg(source_quotes[i], own[0], usd[source], usd[currency])
+        to_target[:, i] = _leg(own[1], target_quotes[i], usd[currency], usd[target])
+    direct = _leg(source_quotes[-1], target_quotes[-1], usd[source], usd[target])
+    return timestamps, currencies, to_intermediate, to_target, direct
+
+
+def _quotes_as_of(history, base: str, codes: List[str], timestamps: np.ndarray,
+                  end: Optional[float]) -> np.ndarray:
+    """base -> code quotes from the latest base table at or before each timestamp (NaN = unusable)"""
+    frame = history.range(base, None, end, codes)
+    if not len(frame.timestamps):
+        return np.full((len(codes), len(timestamps)), np.nan)
+    position = np.searchsorted(frame.timestamps, timestamps, side='right') - 1
+    quotes = frame.values[:, np.maximum(position, 0)]
+    quotes[:, position < 0] = np.nan
+    quotes[~(np.isfinite(quotes) & (quotes > 0))] = np.nan
+    return quotes
+
+
+def _leg(direct: np.ndarray, reverse: np.ndarray, usd_from: np.ndarray, usd_to: np.ndarray) -> np.ndarray:
+    """A -> B rate: A's quote for B, else 1 / B's quote for A, else USD triangulation"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        leg = np.where(np.isnan(direct), 1.0 / reverse, direct)
+        return np.where(np.isnan(leg), usd_to / usd_from, leg)
+
+
+@click.command()
+@click.option('--path', default=None, help='Rate history directory (default: RATE_HISTORY_PATH)')
+@click.option('--days', type=float, default=90.0, help='Look back this many days')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+@click.option('--top', type=int, default=20, help='Rows to show')
+def main(path, days, workers, top):
+    """Replay rankings over stored rate history and report how often each currency won"""
+    from rich.console import Console
+    from rich.table import Table
+    from config import RATE_HISTORY_PATH
+    from rate_history import RateHistory
+
+    console = Console()
+    history = RateHistory(path or RATE_HISTORY_PATH)
+    timestamps, currencies, to_intermediate, to_target, direct = load_history_snapshots(
+        history, start=time.time() - days * 86400
+    )
+    if not len(timestamps):
+        console.print(f"[yellow]最近 {days:g} 天没有可回测的历史数据 (设置 RATE_HISTORY=true 开始记录)[/yellow]")
+        return
+
+    start_time = time.perf_counter()
+    result = run_backtest(currencies, to_intermediate, to_target, direct, workers=workers)
+    elapsed = time.perf_counter() - start_time
+
+    table = Table(title=f"回测结果 - {result.snapshots} 个快照 ({elapsed:.2f}秒)")
+    table.add_column("货币", style="magenta")
+    table.add_column("最佳次数", style="green", justify="right")
+    table.add_column("最佳频率", style="green", justify="right")
+    table.add_column("前3次数", style="cyan", justify="right")
+    table.add_column("平均收益率", style="yellow", justify="right")
+    table.add_column("正收益频率", style="yellow", justify="right")
+    for row in result.summary()[:top]:
+        table.add_row(
+            row['currency'],
+            str(row['best_count']),
+            f"{row['best_frequency']:.1%}",
+            str(sum(row['top_counts'][:3])),
+            f"{row['mean_efficiency']:+.4f}%",
+            f"{row['positive_frequency']:.1%}",
+        )
+    console.print(table)
+
+
+if __name__ == '__main__':
+    main()
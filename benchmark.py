@@ -6,21 +6,53 @@ Performance Benchmark Script
 测试不同模式下的性能差异
 """
 
+import json
+import os
+import sys
 import time
+import statistics
+import subprocess
 import click
+import numpy as np
 from rich.console import Console
 from rich.table import Table
 from currency_analyzer import CurrencyAnalyzer
+from exchange_rate_api import ExchangeRateAPI
 from config import DEFAULT_CURRENCIES, POPULAR_CURRENCIES
 from performance_monitor import perf_monitor
+from rate_fixtures import RateRecorder, ReplayProviderServer, fixtures_from_offline, load_fixtures
+import rate_parsing
 
 console = Console()
 
-def benchmark_currency_analysis():
+class ApiFactory:
+    """Build fresh ExchangeRateAPI instances for live, recording or replay runs"""
+
+    def __init__(self, api_urls=None, recorder=None):
+        self.api_urls = api_urls
+        self.recorder = recorder
+        self.apis = []
+
+    def __call__(self) -> ExchangeRateAPI:
+        # The on-disk cache would let later runs skip the network, skewing the comparison
+        api = ExchangeRateAPI(api_urls=self.api_urls, use_persistent_cache=False)
+        api.recorder = self.recorder
+        self.apis.append(api)
+        return api
+
+    def close(self):
+        """Stop every API built so far (background refreshers and connections)"""
+        for api in self.apis:
+            api.close()
+        self.apis.clear()
+
+def benchmark_currency_analysis(make_api=None):
     """Benchmark different currency analysis modes"""
     console.print("[bold blue]🚀 汇率分析性能基准测试[/bold blue]\n")
     
-    analyzer = CurrencyAnalyzer()
+    owns_factory = make_api is None
+    make_api = make_api or ApiFactory()
+    analyzer = CurrencyAnalyzer(make_api())
     test_amount = 10000.0
     
     # Test scenarios
@@ -47,7 +79,7 @@ def benchmark_currency_analysis():
         sequential_time = time.time() - start_time
         
         # Reset analyzer for bulk test
-        analyzer = CurrencyAnalyzer()
+        analyzer = CurrencyAnalyzer(make_api())
         
         # Test bulk processing
         console.print("  测试批量处理...")
@@ -75,26 +107,159 @@ def benchmark_currency_analysis():
     
     # Print performance monitor report
     perf_monitor.print_performance_report()
+    if owns_factory:
+        make_api.close()
+
+def benchmark_startup(runs: int = 5):
+    """Measure time-to-first-result for scripted, non-interactive runs"""
+    console.print("[bold blue]⏱️  启动时间基准测试 (Startup Benchmark)[/bold blue]\n")
+    
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    commands = [
+        ("导入 main 模块", [sys.executable, '-c', 'import main'], None),
+        ("离线分析 (3货币)", [sys.executable, 'main.py', '--offline', '--batch', '--amount', '1000',
+                          '--currencies', 'EUR,GBP,JPY'], '汇率兑换分析报告'),
+    ]
+    
+    results_table = Table(title=f"启动时间 ({runs}次运行)")
+    results_table.add_column("场景", style="cyan")
+    results_table.add_column("首个结果 (中位数)", style="green")
+    results_table.add_column("总耗时 (中位数)", style="yellow")
+    results_table.add_column("总耗时 (最快)", style="magenta")
+    
+    for name, command, marker in commands:
+        first_result_times = []
+        total_times = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            process = subprocess.Popen(command, cwd=project_dir, env=env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, text=True, encoding='utf-8')
+            first_result = None
+            for line in process.stdout:
+                if marker and first_result is None and marker in line:
+                    first_result = time.perf_counter() - start_time
+            process.wait()
+            total_times.append(time.perf_counter() - start_time)
+            first_result_times.append(first_result if first_result is not None else total_times[-1])
+        
+        results_table.add_row(
+            name,
+            f"{statistics.median(first_result_times):.3f}秒" if marker else "-",
+            f"{statistics.median(total_times):.3f}秒",
+            f"{min(total_times):.3f}秒"
+        )
+    
+    console.print(results_table)
+
+def benchmark_parsing(fixtures, runs: int = 200):
+    """Measure parse cost per provider payload for each JSON backend and output shape"""
+    console.print("[bold blue]🧮 汇率响应解析基准测试 (Parse Benchmark)[/bold blue]\n")
+    
+    data_keys = {'paid': 'conversion_rates', 'alternative': 'rates', 'free_v4': 'rates'}
+    payloads = [
+        (data_keys[key], base, json.dumps(entry['body']).encode('utf-8'))
+        for key, bases in fixtures.items() if key in data_keys
+        for base, entry in bases.items() if entry.get('status') == 200 and isinstance(entry.get('body'), dict)
+    ]
+    if not payloads:
+        console.print("[yellow]没有可解析的响应[/yellow]")
+        return
+    
+    # One fixed currency index shared by every payload, as an array-backed store would use
+    index = {}
+    for data_key, _, content in payloads:
+        for code in json.loads(content)[data_key]:
+            index.setdefault(code, len(index))
+    out = np.empty(len(index))
+    
+    backends = ['json'] + (['orjson'] if rate_parsing.orjson is not None else [])
+    scenarios = [(f"{backend}.loads + dict.get (原方式)",
+                  lambda data_key, base, content, backend=backend: rate_parsing.loads(content, backend).get(data_key))
+                 for backend in backends]
+    for backend in backends:
+        scenarios.append((f"{backend} parse_rates (校验)",
+                          lambda data_key, base, content, backend=backend:
+                          rate_parsing.parse_rates(content, data_key, base=base, backend=backend)))
+        scenarios.append((f"{backend} parse_rates + rates_to_array (对齐数组)",
+                          lambda data_key, base, content, backend=backend:
+                          rate_parsing.rates_to_array(rate_parsing.parse_rates(content, data_key, base=base,
+                                                                               backend=backend), index, out)))
+    
+    average_size = statistics.mean(len(content) for _, _, content in payloads)
+    results_table = Table(title=f"解析耗时 ({len(payloads)}个响应, 平均{average_size / 1024:.1f}KB, "
+                                f"{len(index)}种货币, {runs}轮)")
+    results_table.add_column("方式", style="cyan")
+    results_table.add_column("每个响应 (中位数)", style="green", justify="right")
+    results_table.add_column("每个响应 (最快)", style="magenta", justify="right")
+    
+    for name, parse in scenarios:
+        per_payload = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            for payload in payloads:
+                parse(*payload)
+            per_payload.append((time.perf_counter() - start_time) / len(payloads))
+        results_table.add_row(name, f"{statistics.median(per_payload) * 1e6:.1f}µs",
+                              f"{min(per_payload) * 1e6:.1f}µs")
+    
+    console.print(results_table)
+    if rate_parsing.orjson is None:
+        console.print("[dim]未安装orjson：pip install \"exchange-rate-ranking\\[fast]\" 可启用更快的JSON解析[/dim]")
 
 @click.command()
 @click.option('--full-test', is_flag=True, help='Run full scale test with all currencies')
-def main(full_test):
+@click.option('--record', 'record_path', help='Record provider responses to this fixture file')
+@click.option('--replay', 'replay_path', help='Replay provider responses from this fixture file')
+@click.option('--latency', type=float, default=0.0, help='Replay: artificial latency per request (seconds)')
+@click.option('--error-rate', type=float, default=0.0, help='Replay: fraction of requests answered with HTTP 503')
+@click.option('--seed', type=int, default=0, help='Replay: seed for error injection')
+@click.option('--startup', is_flag=True, help='Measure startup and time-to-first-result instead')
+@click.option('--runs', type=int, default=5, help='Startup: number of runs per scenario')
+@click.option('--parse', is_flag=True, help='Measure provider response parsing (uses --replay fixtures if given)')
+def main(full_test, record_path, replay_path, latency, error_rate, seed, startup, runs, parse):
     """Run performance benchmark tests"""
-    if full_test:
-        console.print("[yellow]警告: 全规模测试将使用所有可用货币，可能需要较长时间[/yellow]")
-        if click.confirm("是否继续?"):
-            analyzer = CurrencyAnalyzer()
-            all_currencies = analyzer.api.get_available_currencies()
-            console.print(f"将测试 {len(all_currencies)} 种货币")
-            
-            start_time = time.time()
-            analyzer._analyze_conversion_paths_bulk(10000.0, all_currencies)
-            total_time = time.time() - start_time
-            
-            console.print(f"全规模测试完成，总耗时: {total_time:.2f}秒")
-            perf_monitor.print_performance_report()
-    else:
-        benchmark_currency_analysis()
+    if startup:
+        benchmark_startup(runs)
+        return
+    if parse:
+        fixtures = load_fixtures(replay_path) if replay_path else fixtures_from_offline(seed)
+        benchmark_parsing(fixtures, runs * 40)
+        return
+    
+    recorder = RateRecorder() if record_path else None
+    server = None
+    api_urls = None
+    if replay_path:
+        server = ReplayProviderServer(load_fixtures(replay_path), latency=latency,
+                                      error_rate=error_rate, seed=seed).start()
+        api_urls = server.api_urls
+        console.print(f"[dim]回放模式: {replay_path} @ {server.root_url}[/dim]")
+    make_api = ApiFactory(api_urls, recorder)
+    
+    try:
+        if full_test:
+            console.print("[yellow]警告: 全规模测试将使用所有可用货币，可能需要较长时间[/yellow]")
+            if click.confirm("是否继续?"):
+                analyzer = CurrencyAnalyzer(make_api())
+                all_currencies = analyzer.api.get_available_currencies()
+                console.print(f"将测试 {len(all_currencies)} 种货币")
+                
+                start_time = time.time()
+                analyzer._analyze_conversion_paths_bulk(10000.0, all_currencies)
+                total_time = time.time() - start_time
+                
+                console.print(f"全规模测试完成，总耗时: {total_time:.2f}秒")
+                perf_monitor.print_performance_report()
+        else:
+            benchmark_currency_analysis(make_api)
+    finally:
+        make_api.close()
+        if server:
+            server.stop()
+        if recorder:
+            recorder.save(record_path)
+            console.print(f"[green]已录制API响应: {record_path}[/green]")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
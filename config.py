@@ -13,6 +13,39 @@ API_URLS = {
     'alternative': 'https://api.exchangerate.host/latest?base={base}'
 }
 
+# Provider fetch strategy: 'sequential' tries providers one after another,
+# 'hedged' starts the next provider after HEDGE_DELAY seconds and keeps the first valid response
+FETCH_MODE = os.getenv('FETCH_MODE', 'sequential')
+HEDGE_DELAY_SECONDS = float(os.getenv('HEDGE_DELAY', '0.5'))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT', '20'))
+# End-to-end time budget in seconds for one analysis (0 = none). Request timeouts
+# and retries shrink to fit it; when it runs out, partial results or cached
+# rates up to MAX_STALENESS old are returned instead of waiting
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv('ANALYSIS_DEADLINE', '0'))
+
+# Provider health: providers are tried in order of expected latency (rolling
+# window of PROVIDER_HEALTH_WINDOW requests); PROVIDER_FAILURE_THRESHOLD
+# consecutive SSL/timeout/connection/HTTP errors skip a provider for
+# PROVIDER_COOL_DOWN seconds, doubling while its trial requests keep failing
+PROVIDER_ADAPTIVE_ORDER = os.getenv('PROVIDER_ADAPTIVE_ORDER', 'true').lower() in ('1', 'true', 'yes')
+PROVIDER_HEALTH_WINDOW = int(os.getenv('PROVIDER_HEALTH_WINDOW', '20'))
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '3'))
+PROVIDER_COOL_DOWN_SECONDS = float(os.getenv('PROVIDER_COOL_DOWN', '60'))
+
+# HTTP connection pooling: keep-alive connections reused across requests.
+# HTTP_POOL_MAXSIZE caps connections kept per host; override single hosts with
+# HTTP_POOL_MAXSIZE_PER_HOST="api.exchangerate.host=4,v6.exchangerate-api.com=2"
+HTTP_KEEP_ALIVE = os.getenv('HTTP_KEEP_ALIVE', 'true').lower() in ('1', 'true', 'yes')
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+HTTP_POOL_MAXSIZE_PER_HOST = {
+    host.strip(): int(size)
+    for host, _, size in (
+        item.partition('=') for item in os.getenv('HTTP_POOL_MAXSIZE_PER_HOST', '').split(',')
+    )
+    if host.strip() and size.strip().isdigit()
+}
+
 # Comprehensive list of major currencies supported by most exchange rate APIs
 DEFAULT_CURRENCIES = [
     # Major currencies
@@ -35,7 +68,7 @@ DEFAULT_CURRENCIES = [
     # Pacific currencies
     'FJD', 'PGK', 'SBD', 'TOP', 'VUV', 'WST', 'XPF',
     # Others
-    'AFN', 'BTN', 'BND', 'KHR', 'LAK', 'MMK', 'NPR', 'MNT', 'UZS'
+    'AFN', 'BTN', 'BND', 'KHR', 'LAK', 'MMK', 'NPR', 'MNT'
 ]
 
 # Popular/Common currencies for quick analysis
@@ -45,8 +78,53 @@ POPULAR_CURRENCIES = [
     'ZAR', 'MXN', 'BRL', 'ARS', 'TRY', 'PLN', 'CZK', 'HUF', 'ILS', 'NZD'
 ]
 
+# Bases pre-fetched by get_all_rates_bulk. BULK_MODE=single fetches only USD and
+# derives the rest locally (5x fewer requests, time-consistent, but triangulated
+# rates carry no cross-rate spread); BULK_CONSISTENCY_CHECK then fetches
+# BULK_CONSISTENCY_BASE too and reports the largest triangulation discrepancy
+BULK_BASE_CURRENCIES = ['USD', 'CNY', 'EUR', 'GBP', 'JPY']
+BULK_MODE = os.getenv('BULK_MODE', 'multi').lower()
+BULK_CONSISTENCY_CHECK = os.getenv('BULK_CONSISTENCY_CHECK', 'false').lower() in ('1', 'true', 'yes')
+BULK_CONSISTENCY_BASE = os.getenv('BULK_CONSISTENCY_BASE', 'EUR').upper()
+
 # Cache settings
 CACHE_DURATION_MINUTES = int(os.getenv('CACHE_DURATION', '5'))
+# In-memory rate tables are LRU-evicted beyond this many bases or megabytes
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv('MEMORY_CACHE_MAX_ENTRIES', '256'))
+MEMORY_CACHE_MAX_BYTES = int(float(os.getenv('MEMORY_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+# Stale-while-revalidate: serve expired rates immediately and refresh them in a
+# background thread; entries older than MAX_STALENESS are always refetched synchronously
+STALE_WHILE_REVALIDATE = os.getenv('STALE_WHILE_REVALIDATE', 'false').lower() in ('1', 'true', 'yes')
+MAX_STALENESS_MINUTES = int(os.getenv('MAX_STALENESS', '60'))
+
+# Persistent on-disk cache shared by every process on this host
+PERSISTENT_CACHE_ENABLED = os.getenv('PERSISTENT_CACHE', 'true').lower() in ('1', 'true', 'yes')
+PERSISTENT_CACHE_PATH = os.path.expanduser(
+    os.getenv('RATE_CACHE_PATH', os.path.join('~', '.cache', 'exchange-rate-ranking', 'rates.sqlite3'))
+)
+
+# Append-only history of every fetched rate table (memory-mapped, per-minute polling friendly)
+RATE_HISTORY_ENABLED = os.getenv('RATE_HISTORY', 'false').lower() in ('1', 'true', 'yes')
+RATE_HISTORY_PATH = os.path.expanduser(
+    os.getenv('RATE_HISTORY_PATH', os.path.join('~', '.cache', 'exchange-rate-ranking', 'history'))
+)
+
+# Offline demo market: OFFLINE_MARKET_SIZE > 30 adds generated currencies (up to 17576)
+# for load testing; quotes deviate per table by OFFLINE_QUOTE_NOISE drawn from
+# OFFLINE_NOISE (uniform, normal or student_t), and each refresh moves every
+# currency by OFFLINE_VOLATILITY. The same OFFLINE_SEED reproduces the same rates
+OFFLINE_MARKET_SIZE = int(os.getenv('OFFLINE_MARKET_SIZE', '0'))
+OFFLINE_SEED = int(os.getenv('OFFLINE_SEED', '0'))
+OFFLINE_VOLATILITY = float(os.getenv('OFFLINE_VOLATILITY', '0.002'))
+OFFLINE_QUOTE_NOISE = float(os.getenv('OFFLINE_QUOTE_NOISE', '0.005'))
+OFFLINE_NOISE = os.getenv('OFFLINE_NOISE', 'uniform').lower()
+
+# Connectivity probe result is reused for this many seconds across runs
+NETWORK_PROBE_TTL_SECONDS = float(os.getenv('NETWORK_PROBE_TTL', '60'))
+NETWORK_PROBE_CACHE_PATH = os.path.expanduser(
+    os.path.join('~', '.cache', 'exchange-rate-ranking', 'network_probe.json')
+)
 
 # Base currency
 BASE_CURRENCY = 'CNY'
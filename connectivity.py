@@ -0,0 +1,109 @@
+"""
+网络连通性检测
+Connectivity Probe
+
+后台线程检测网络连通性，并将结果缓存一小段时间，避免每次启动都阻塞等待
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from config import API_URLS, NETWORK_PROBE_CACHE_PATH, NETWORK_PROBE_TTL_SECONDS
+
+PROBE_TIMEOUT_SECONDS = 3.0
+
+
+def _probe_hosts():
+    """Provider hosts to try, in config order"""
+    hosts = []
+    for url in API_URLS.values():
+        host = urlparse(url.replace('{api_key}', 'key').replace('{base}', 'USD')).hostname
+        if host and host not in hosts:
+            hosts.append(host)
+    return hosts
+
+
+def _probe_network(timeout: float) -> bool:
+    """Return True if any rate provider is reachable"""
+    if os.getenv('HTTPS_PROXY') or os.getenv('https_proxy'):
+        # A raw TCP connect bypasses the proxy, so probe over HTTP instead
+        import requests
+        try:
+            response = requests.get("https://httpbin.org/get", timeout=timeout)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    deadline = time.time() + timeout
+    for host in _probe_hosts():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            with socket.create_connection((host, 443), timeout=remaining):
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def _read_cached_result() -> Optional[bool]:
+    try:
+        with open(NETWORK_PROBE_CACHE_PATH, encoding='utf-8') as f:
+            cached = json.load(f)
+        if time.time() - cached['checked_at'] < NETWORK_PROBE_TTL_SECONDS:
+            return bool(cached['available'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_cached_result(available: bool):
+    try:
+        os.makedirs(os.path.dirname(NETWORK_PROBE_CACHE_PATH), exist_ok=True)
+        temp_path = f"{NETWORK_PROBE_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'available': available, 'checked_at': time.time()}, f)
+        os.replace(temp_path, NETWORK_PROBE_CACHE_PATH)
+    except OSError:
+        pass
+
+
+class NetworkProbe:
+    """Connectivity check running in a background thread"""
+
+    def __init__(self, timeout: float = PROBE_TIMEOUT_SECONDS, use_cache: bool = True):
+        self.timeout = timeout
+        self._available: Optional[bool] = _read_cached_result() if use_cache else None
+        self._done = threading.Event()
+        if self._available is not None:
+            self._done.set()
+        else:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        try:
+            self._available = _probe_network(self.timeout)
+            _write_cached_result(self._available)
+        finally:
+            self._done.set()
+
+    def result(self) -> bool:
+        """Wait for the probe to finish and return whether the network is usable"""
+        self._done.wait()
+        return bool(self._available)
+
+
+def start_network_probe(use_cache: bool = True) -> NetworkProbe:
+    """Start probing connectivity now; call .result() when the answer is needed"""
+    return NetworkProbe(use_cache=use_cache)
+
+
+def is_network_available(use_cache: bool = True) -> bool:
+    """检测网络是否可用"""
+    return start_network_probe(use_cache).result()
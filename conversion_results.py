@@ -0,0 +1,210 @@
+"""
+列式转换结果
+Columnar Conversion Results
+
+用NumPy结构化数组和货币代码表保存排行结果，支持零拷贝切片、按任意列排序，
+仅在显示时才按需生成ConversionPath对象
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union, overload
+
+import numpy as np
+
+from currency_registry import currency_registry
+
+
+@dataclass
+class ConversionPath:
+    intermediate_currency: str
+    cny_to_intermediate_rate: float
+    intermediate_to_usd_rate: float
+    total_usd_amount: float
+    efficiency_score: float
+
+
+class RankChange(NamedTuple):
+    """A currency whose rank moved between two rankings (ranks are 1-based; None = absent)"""
+    currency: str
+    old_rank: Optional[int]
+    new_rank: Optional[int]
+
+    @property
+    def delta(self) -> int:
+        """Positive when the currency moved up"""
+        if self.old_rank is None or self.new_rank is None:
+            return 0
+        return self.old_rank - self.new_rank
+
+
+# One packed 36-byte record per path; 'currency' indexes the results' code table
+RESULT_DTYPE = np.dtype([
+    ('currency', np.int32),
+    ('cny_to_intermediate_rate', np.float64),
+    ('intermediate_to_usd_rate', np.float64),
+    ('total_usd_amount', np.float64),
+    ('efficiency_score', np.float64),
+])
+
+
+class ConversionResults(Sequence):
+    """Ranked conversion paths stored column-wise.
+
+    Behaves like a read-only sequence of ``ConversionPath``: indexing builds
+    a path on demand, slicing returns another ``ConversionResults`` that
+    shares the same record buffer and code table.
+    """
+
+    def __init__(self, records: np.ndarray, codes: Sequence[str]):
+        self.records = records
+        self.codes = codes
+
+    @classmethod
+    def from_columns(cls, currencies: Sequence[str], cny_to_intermediate: np.ndarray,
+                     intermediate_to_usd: np.ndarray, total_usd_amounts: np.ndarray,
+                     efficiency_scores: np.ndarray, codes: Optional[Sequence[str]] = None) -> 'ConversionResults':
+        """Pack parallel columns.
+
+        By default 'currency' holds ids from the shared ``currency_registry``
+        and the registry's code list is the code table, so every result shares
+        it; pass ``codes`` to use a private table instead.
+        """
+        if codes is None:
+            codes = currency_registry.codes
+            ids = currency_registry.register(currencies)
+        else:
+            position: Dict[str, int] = {code: i for i, code in enumerate(codes)}
+            ids = np.fromiter((position[c] for c in currencies), dtype=np.int32, count=len(currencies))
+
+        records = np.empty(len(ids), dtype=RESULT_DTYPE)
+        records['currency'] = ids
+        records['cny_to_intermediate_rate'] = cny_to_intermediate
+        records['intermediate_to_usd_rate'] = intermediate_to_usd
+        records['total_usd_amount'] = total_usd_amounts
+        records['efficiency_score'] = efficiency_scores
+        return cls(records, codes)
+
+    @classmethod
+    def from_ranked(cls, ranked, codes: Optional[Sequence[str]] = None) -> 'ConversionResults':
+        """Build from a ``rate_matrix.RankedPaths``"""
+        return cls.from_columns(ranked.currencies, ranked.source_to_intermediate, ranked.intermediate_to_target,
+                                ranked.total_amounts, ranked.efficiency_scores, codes)
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[ConversionPath]) -> 'ConversionResults':
+        paths = list(paths)
+        return cls.from_columns(
+            [p.intermediate_currency for p in paths],
+            np.array([p.cny_to_intermediate_rate for p in paths], dtype=np.float64),
+            np.array([p.intermediate_to_usd_rate for p in paths], dtype=np.float64),
+            np.array([p.total_usd_amount for p in paths], dtype=np.float64),
+            np.array([p.efficiency_score for p in paths], dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @overload
+    def __getitem__(self, index: int) -> ConversionPath: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> 'ConversionResults': ...
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return ConversionResults(self.records[index], self.codes)
+        return self._path(self.records[index])
+
+    def __iter__(self) -> Iterator[ConversionPath]:
+        for record in self.records:
+            yield self._path(record)
+
+    def __repr__(self) -> str:
+        return f"ConversionResults({len(self)} paths, {self.nbytes} bytes)"
+
+    def _path(self, record) -> ConversionPath:
+        return ConversionPath(
+            intermediate_currency=self.codes[record['currency']],
+            cny_to_intermediate_rate=float(record['cny_to_intermediate_rate']),
+            intermediate_to_usd_rate=float(record['intermediate_to_usd_rate']),
+            total_usd_amount=float(record['total_usd_amount']),
+            efficiency_score=float(record['efficiency_score']),
+        )
+
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of one column"""
+        return self.records[name]
+
+    @property
+    def currencies(self) -> List[str]:
+        return [self.codes[i] for i in self.records['currency']]
+
+    @property
+    def nbytes(self) -> int:
+        return self.records.nbytes
+
+    def sort_by(self, name: str, descending: bool = True) -> 'ConversionResults':
+        """Copy sorted by one column; ties keep their current order and NaN sorts last"""
+        if name == 'currency':
+            values = np.array(self.currencies)
+            if descending:
+                # Stable ascending sort of the reversed column, flipped back: descending with ties in order
+                order = len(values) - 1 - np.argsort(values[::-1], kind='stable')[::-1]
+            else:
+                order = np.argsort(values, kind='stable')
+        else:
+            values = self.records[name]
+            # lexsort is stable; the last key (NaN flag) is the primary one
+            order = np.lexsort((-values if descending else values, np.isnan(values)))
+        return ConversionResults(self.records[order], self.codes)
+
+    def rescaled(self, cny_amount: float) -> 'ConversionResults':
+        """Copy with total_usd_amount recomputed for a new CNY amount"""
+        records = self.records.copy()
+        records['total_usd_amount'] = cny_amount * records['cny_to_intermediate_rate'] * records['intermediate_to_usd_rate']
+        return ConversionResults(records, self.codes)
+
+    def with_replaced(self, drop: np.ndarray, records: np.ndarray,
+                      tie_order: Optional[np.ndarray] = None) -> 'ConversionResults':
+        """Ranking with the rows flagged in ``drop`` replaced by ``records``.
+
+        Rows that are kept must already be in ranking order; only the new
+        records are sorted, then merged in with a binary search, so an update
+        touching c of n rows costs O(n + c log c) instead of a full re-sort.
+        ``records`` must use this ranking's code table.
+
+        Equal scores are ordered by ``tie_order[currency id]`` (ascending),
+        which the kept rows must already follow; without it kept rows win
+        ties, as they would in a stable sort of the previous order.
+        """
+        kept = self.records[~drop]
+        kept_keys = -kept['efficiency_score']
+        if tie_order is None:
+            new = records[np.argsort(-records['efficiency_score'], kind='stable')]
+            positions = np.searchsorted(kept_keys, -new['efficiency_score'], side='right')
+            return ConversionResults(np.insert(kept, positions, new), self.codes)
+
+        new = records[np.lexsort((tie_order[records['currency']], -records['efficiency_score']))]
+        new_keys = -new['efficiency_score']
+        first = np.searchsorted(kept_keys, new_keys, side='left')
+        positions = np.searchsorted(kept_keys, new_keys, side='right')
+        kept_ties = tie_order[kept['currency']]
+        new_ties = tie_order[new['currency']]
+        # Only exact score ties need the second key; they are rare, so a loop over them is cheap
+        for i in np.flatnonzero(first < positions):
+            positions[i] = first[i] + np.searchsorted(kept_ties[first[i]:positions[i]], new_ties[i], side='right')
+        return ConversionResults(np.insert(kept, positions, new), self.codes)
+
+
+def rank_changes(old: ConversionResults, new: ConversionResults) -> List[RankChange]:
+    """Currencies whose rank differs between two rankings, biggest moves first"""
+    old_ranks = {currency: rank for rank, currency in enumerate(old.currencies, 1)}
+    changes = []
+    for rank, currency in enumerate(new.currencies, 1):
+        old_rank = old_ranks.pop(currency, None)
+        if old_rank != rank:
+            changes.append(RankChange(currency, old_rank, rank))
+    changes.extend(RankChange(currency, rank, None) for currency, rank in old_ranks.items())
+    changes.sort(key=lambda change: (change.old_rank is not None and change.new_rank is not None,
+                                     -abs(change.delta)))
+    return changes
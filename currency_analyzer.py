@@ -1,135 +1,168 @@
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Optional, Iterator, Iterable, Sequence
+from dataclasses import dataclass, replace
+import heapq
+import math
 import time
+import numpy as np
+from conversion_results import ConversionPath, ConversionResults, RankChange, rank_changes
+from config import BASE_CURRENCY, TARGET_CURRENCY
+from currency_registry import currency_registry
+from deadline import Deadline
 from exchange_rate_api import ExchangeRateAPI
+from rate_matrix import BestIntermediates, RankedPaths, RateMatrix, top_paths
+from path_finder import MultiHopPath, find_best_paths
+from performance_monitor import perf_monitor
 
 @dataclass
-class ConversionPath:
-    intermediate_currency: str
-    cny_to_intermediate_rate: float
-    intermediate_to_usd_rate: float
-    total_usd_amount: float
-    efficiency_score: float
+class RunningStats:
+    """One-pass summary of efficiency scores"""
+    count: int = 0
+    positive: int = 0
+    min_score: float = math.inf
+    max_score: float = -math.inf
+    total_score: float = 0.0
+    
+    def add(self, score: float):
+        self.count += 1
+        self.positive += score > 0
+        self.min_score = min(self.min_score, score)
+        self.max_score = max(self.max_score, score)
+        self.total_score += score
+    
+    def add_array(self, scores: np.ndarray):
+        if not len(scores):
+            return
+        self.count += len(scores)
+        self.positive += int(np.count_nonzero(scores > 0))
+        self.min_score = min(self.min_score, float(scores.min()))
+        self.max_score = max(self.max_score, float(scores.max()))
+        self.total_score += float(scores.sum())
+    
+    @property
+    def mean_score(self) -> float:
+        return self.total_score / self.count if self.count else 0.0
 
 class CurrencyAnalyzer:
-    def __init__(self):
-        self.api = ExchangeRateAPI()
+    def __init__(self, api: Optional[ExchangeRateAPI] = None, source: str = BASE_CURRENCY,
+                 target: str = TARGET_CURRENCY):
+        self.api = api or ExchangeRateAPI()
+        self.source = source
+        self.target = target
         self.bulk_rates = None
+        self.rate_matrix = None
         self.direct_cny_to_usd = None
     
-    def analyze_conversion_paths(self, cny_amount: float, currencies: List[str], use_bulk_processing: bool = True) -> List[ConversionPath]:
+    def reset(self):
+        """Forget the last rate snapshot so the next analysis refetches it"""
+        self.bulk_rates = None
+        self.rate_matrix = None
+        self.direct_cny_to_usd = None
+    
+    @perf_monitor.time_function('CurrencyAnalyzer.analyze_conversion_paths')
+    def analyze_conversion_paths(self, cny_amount: float, currencies: List[str], use_bulk_processing: bool = True) -> Sequence[ConversionPath]:
         """Analyze all possible conversion paths from CNY to USD through intermediate currencies"""
         if use_bulk_processing and len(currencies) > 20:
             return self._analyze_conversion_paths_bulk(cny_amount, currencies)
         else:
             return self._analyze_conversion_paths_sequential(cny_amount, currencies)
     
-    def _analyze_conversion_paths_sequential(self, cny_amount: float, currencies: List[str]) -> List[ConversionPath]:
-        """Sequential processing for small currency lists"""
-        paths = []
+    def analyze_top_paths(self, cny_amount: float, currencies: List[str], top_k: Optional[int] = None,
+                          use_bulk_processing: bool = True,
+                          deadline: Optional[Deadline] = None) -> Tuple[ConversionResults, RunningStats]:
+        """Best top_k paths (all when None) plus statistics over every path.
+        
+        Only the top_k paths are kept: the bulk path selects them with
+        argpartition, the sequential path with a bounded heap over the stream.
+        With a deadline, the result covers whatever was analyzed in time.
+        """
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be a positive integer")
+        stats = RunningStats()
+        if use_bulk_processing and len(currencies) > 20 and self._load_rate_matrix(deadline):
+            scored = self.rate_matrix.score_intermediates(cny_amount, currencies, self.source, self.target)
+            stats.add_array(scored.efficiency_scores)
+            return self._paths_from_ranked(top_paths(scored, top_k)), stats
         
-        for currency in currencies:
-            if currency in ['CNY', 'USD']:
+        paths = self._track(self._iter_paths_sequential(cny_amount, currencies, deadline), stats)
+        if top_k is None:
+            best = sorted(paths, key=lambda x: x.efficiency_score, reverse=True)
+        else:
+            best = heapq.nlargest(top_k, paths, key=lambda x: x.efficiency_score)
+        return ConversionResults.from_paths(best), stats
+    
+    def iter_conversion_paths(self, cny_amount: float, currencies: List[str],
+                              use_bulk_processing: bool = True,
+                              deadline: Optional[Deadline] = None) -> Iterator[ConversionPath]:
+        """Yield paths as they are computed (unsorted) for progressive display"""
+        if use_bulk_processing and len(currencies) > 20 and self._load_rate_matrix(deadline):
+            yield from self._paths_from_ranked(
+                self.rate_matrix.score_intermediates(cny_amount, currencies, self.source, self.target)
+            )
+        else:
+            yield from self._iter_paths_sequential(cny_amount, currencies, deadline)
+    
+    @staticmethod
+    def _track(paths: Iterable[ConversionPath], stats: RunningStats) -> Iterator[ConversionPath]:
+        for path in paths:
+            stats.add(path.efficiency_score)
+            yield path
+    
+    def _iter_paths_sequential(self, cny_amount: float, currencies: List[str],
+                               deadline: Optional[Deadline] = None) -> Iterator[ConversionPath]:
+        for done, currency in enumerate(currencies):
+            if currency in (self.source, self.target):
                 continue
+            if deadline is not None and deadline.expired:
+                print(f"⏱️  时间预算已用完，返回部分结果 (已分析 {done}/{len(currencies)} 种货币)")
+                return
             
-            path = self._calculate_conversion_path(cny_amount, currency)
+            path = self._calculate_conversion_path(cny_amount, currency, deadline)
             if path:
-                paths.append(path)
+                yield path
+    
+    def _analyze_conversion_paths_sequential(self, cny_amount: float, currencies: List[str]) -> List[ConversionPath]:
+        """Sequential processing for small currency lists"""
+        paths = list(self._iter_paths_sequential(cny_amount, currencies))
         
         # Sort by efficiency score (higher is better)
         paths.sort(key=lambda x: x.efficiency_score, reverse=True)
         return paths
     
-    def _analyze_conversion_paths_bulk(self, cny_amount: float, currencies: List[str]) -> List[ConversionPath]:
-        """Optimized bulk processing for large currency lists"""
+    def _load_rate_matrix(self, deadline: Optional[Deadline] = None) -> bool:
+        """Pre-fetch bulk rates into a fresh matrix; False if CNY->USD is unavailable"""
         # Pre-fetch bulk rates to minimize API calls
         print("正在预加载汇率数据...")
         start_time = time.time()
         
-        self.bulk_rates = self.api.get_all_rates_bulk()
-        self.direct_cny_to_usd = self.api.get_conversion_rate_bulk('CNY', 'USD', self.bulk_rates)
+        self.bulk_rates = self.api.get_all_rates_bulk(deadline)
+        self.rate_matrix = RateMatrix.from_bulk_rates(self.bulk_rates)
+        self.direct_cny_to_usd = self.rate_matrix.rate(self.source, self.target)
         
         print(f"预加载完成，耗时 {time.time() - start_time:.2f} 秒")
-        
-        # Filter currencies and process in batches
-        valid_currencies = [c for c in currencies if c not in ['CNY', 'USD']]
-        
-        paths = []
-        batch_size = 50  # Process in batches to show progress
-        
-        for i in range(0, len(valid_currencies), batch_size):
-            batch = valid_currencies[i:i + batch_size]
-            print(f"正在处理第 {i//batch_size + 1} 批货币 ({i+1}-{min(i+batch_size, len(valid_currencies))}/{len(valid_currencies)})")
-            
-            batch_paths = self._process_currency_batch(cny_amount, batch)
-            paths.extend(batch_paths)
-        
-        # Sort by efficiency score (higher is better)
-        paths.sort(key=lambda x: x.efficiency_score, reverse=True)
-        return paths
+        return bool(self.direct_cny_to_usd)
     
-    def _process_currency_batch(self, cny_amount: float, currencies: List[str]) -> List[ConversionPath]:
-        """Process a batch of currencies with threading"""
-        paths = []
-        
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            # Submit all currency calculations
-            future_to_currency = {
-                executor.submit(self._calculate_conversion_path_bulk, cny_amount, currency): currency
-                for currency in currencies
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_currency):
-                path = future.result()
-                if path:
-                    paths.append(path)
+    def _analyze_conversion_paths_bulk(self, cny_amount: float, currencies: List[str]) -> Sequence[ConversionPath]:
+        """Optimized bulk processing for large currency lists"""
+        if not self._load_rate_matrix():
+            return self._analyze_conversion_paths_sequential(cny_amount, currencies)
         
-        return paths
+        # Rank every intermediate currency in one vectorized pass
+        return self._paths_from_ranked(self.rate_matrix.rank_intermediates(cny_amount, currencies, self.source, self.target))
     
-    def _calculate_conversion_path_bulk(self, cny_amount: float, intermediate_currency: str) -> Optional[ConversionPath]:
-        """Fast conversion path calculation using bulk rates"""
-        if not self.bulk_rates or not self.direct_cny_to_usd:
-            return self._calculate_conversion_path(cny_amount, intermediate_currency)
-        
-        # Get CNY to intermediate rate using bulk rates
-        cny_to_intermediate = self.api.get_conversion_rate_bulk('CNY', intermediate_currency, self.bulk_rates)
-        if not cny_to_intermediate:
-            return None
-        
-        # Get intermediate to USD rate using bulk rates
-        intermediate_to_usd = self.api.get_conversion_rate_bulk(intermediate_currency, 'USD', self.bulk_rates)
-        if not intermediate_to_usd:
-            return None
-        
-        # Calculate total USD amount after conversion
-        intermediate_amount = cny_amount * cny_to_intermediate
-        usd_amount = intermediate_amount * intermediate_to_usd
-        
-        # Use cached direct CNY to USD rate
-        direct_usd_amount = cny_amount * self.direct_cny_to_usd
-        
-        # Calculate efficiency score
-        efficiency_score = (usd_amount / direct_usd_amount - 1) * 100 if direct_usd_amount > 0 else 0
-        
-        return ConversionPath(
-            intermediate_currency=intermediate_currency,
-            cny_to_intermediate_rate=cny_to_intermediate,
-            intermediate_to_usd_rate=intermediate_to_usd,
-            total_usd_amount=usd_amount,
-            efficiency_score=efficiency_score
-        )
+    @staticmethod
+    def _paths_from_ranked(ranked: RankedPaths) -> ConversionResults:
+        return ConversionResults.from_ranked(ranked)
     
-    def _calculate_conversion_path(self, cny_amount: float, intermediate_currency: str) -> Optional[ConversionPath]:
+    def _calculate_conversion_path(self, cny_amount: float, intermediate_currency: str,
+                                   deadline: Optional[Deadline] = None) -> Optional[ConversionPath]:
         """Calculate conversion path: CNY -> Intermediate -> USD"""
         # Get CNY to intermediate rate
-        cny_to_intermediate = self.api.get_conversion_rate('CNY', intermediate_currency)
+        cny_to_intermediate = self.api.get_conversion_rate(self.source, intermediate_currency, deadline)
         if not cny_to_intermediate:
             return None
         
         # Get intermediate to USD rate
-        intermediate_to_usd = self.api.get_conversion_rate(intermediate_currency, 'USD')
+        intermediate_to_usd = self.api.get_conversion_rate(intermediate_currency, self.target, deadline)
         if not intermediate_to_usd:
             return None
         
@@ -138,7 +171,7 @@ class CurrencyAnalyzer:
         usd_amount = intermediate_amount * intermediate_to_usd
         
         # Calculate direct CNY to USD for comparison
-        direct_cny_to_usd = self.api.get_conversion_rate('CNY', 'USD')
+        direct_cny_to_usd = self.api.get_conversion_rate(self.source, self.target, deadline)
         if not direct_cny_to_usd:
             return None
         
@@ -155,15 +188,69 @@ class CurrencyAnalyzer:
             efficiency_score=efficiency_score
         )
     
-    def get_direct_conversion(self, cny_amount: float) -> Optional[float]:
+    def find_multi_hop_paths(self, cny_amount: float, currencies: Optional[List[str]] = None,
+                             max_hops: int = 3, top_n: int = 20) -> List[MultiHopPath]:
+        """Find the best CNY -> ... -> USD routes with up to max_hops conversions"""
+        if self.rate_matrix is None:
+            self.bulk_rates = self.api.get_all_rates_bulk()
+            self.rate_matrix = RateMatrix.from_bulk_rates(self.bulk_rates)
+        
+        return find_best_paths(self.rate_matrix, cny_amount, self.source, self.target,
+                               max_hops=max_hops, top_n=top_n, currencies=currencies)
+    
+    def best_intermediates(self, sources: Optional[Sequence[str]] = None,
+                           targets: Optional[Sequence[str]] = None,
+                           currencies: Optional[Sequence[str]] = None,
+                           deadline: Optional[Deadline] = None) -> BestIntermediates:
+        """Best one-hop intermediate for every (source, target) pair in one pass.
+        
+        Rate tables for the listed sources and targets are fetched on top of
+        the bulk snapshot, so their legs use direct quotes rather than USD
+        triangulation. Defaults cover every currency in the snapshot.
+        """
+        if self.rate_matrix is None:
+            self.bulk_rates = self.api.get_all_rates_bulk(deadline)
+            self.rate_matrix = RateMatrix.from_bulk_rates(self.bulk_rates)
+        
+        missing = [c for c in dict.fromkeys([*(sources or ()), *(targets or ())]) if c not in self.bulk_rates]
+        if missing:
+            # The bulk snapshot may be shared with the API's cache; extend a copy
+            self.bulk_rates = dict(self.bulk_rates)
+            for currency in missing:
+                rates = self.api.get_rates(currency, deadline)
+                if rates:
+                    self.bulk_rates[currency] = rates
+            self.rate_matrix = RateMatrix.from_bulk_rates(self.bulk_rates)
+            self.direct_cny_to_usd = self.rate_matrix.rate(self.source, self.target)
+        
+        with perf_monitor.measure('CurrencyAnalyzer.best_intermediates'):
+            return self.rate_matrix.best_intermediates(sources, targets, currencies)
+    
+    def get_direct_conversion(self, cny_amount: float, deadline: Optional[Deadline] = None) -> Optional[float]:
         """Get direct CNY to USD conversion for comparison"""
-        rate = self.api.get_conversion_rate('CNY', 'USD')
+        rate = self.api.get_conversion_rate(self.source, self.target, deadline)
         return cny_amount * rate if rate else None
     
-    def get_best_conversion_recommendation(self, cny_amount: float, currencies: List[str]) -> Dict:
-        """Get the best conversion recommendation with analysis"""
-        paths = self.analyze_conversion_paths(cny_amount, currencies)
-        direct_usd = self.get_direct_conversion(cny_amount)
+    def get_best_conversion_recommendation(self, cny_amount: float, currencies: List[str],
+                                           top_k: Optional[int] = None,
+                                           deadline: Optional[Deadline] = None) -> Dict:
+        """Get the best conversion recommendation with analysis.
+        
+        With top_k only the best top_k paths are kept in 'all_paths'; 'stats'
+        always summarizes every analyzed path. 'deadline_exceeded' marks a
+        result that may be partial or based on stale rates.
+        """
+        with perf_monitor.measure('CurrencyAnalyzer.analyze_top_paths'):
+            paths, stats = self.analyze_top_paths(cny_amount, currencies, top_k, deadline=deadline)
+        return self.build_recommendation(cny_amount, paths, stats, deadline)
+    
+    def build_recommendation(self, cny_amount: float, paths: Sequence[ConversionPath],
+                             stats: Optional[RunningStats] = None,
+                             deadline: Optional[Deadline] = None) -> Dict:
+        """Recommendation dict for already ranked paths (best first)"""
+        if not isinstance(paths, ConversionResults):
+            paths = ConversionResults.from_paths(paths)
+        direct_usd = self.get_direct_conversion(cny_amount, deadline)
         
         if not paths:
             return {
@@ -178,7 +265,175 @@ class CurrencyAnalyzer:
             'cny_amount': cny_amount,
             'direct_usd_amount': direct_usd,
             'best_path': best_path,
-            'all_paths': paths,  # All paths for comprehensive analysis
+            'all_paths': paths,  # All paths (or the top_k) for comprehensive analysis
+            'stats': stats,
+            'savings': best_path.total_usd_amount - direct_usd if direct_usd else 0,
+            'savings_percentage': best_path.efficiency_score,
+            'deadline_exceeded': deadline is not None and deadline.expired
+        }
+    
+    def refresh_recommendation(self, analysis: Dict, currencies: List[str], top_k: Optional[int] = None,
+                               deadline: Optional[Deadline] = None,
+                               cny_amount: Optional[float] = None) -> Tuple[Dict, List[RankChange]]:
+        """Re-rank against the current rates and report which currencies moved.
+        
+        When the previous analysis holds a complete vectorized ranking, only
+        currencies whose CNY or USD leg changed are rescored and merged back
+        into the existing order; otherwise the analysis is recomputed. Both
+        ways order equal scores by position in ``currencies``, so they agree
+        even on ties (assuming the previous ranking used the same list). A
+        failed previous analysis carries no amount, so ``cny_amount`` is
+        used for the recomputation.
+        """
+        previous = analysis.get('all_paths') if analysis.get('status') == 'success' else None
+        if not isinstance(previous, ConversionResults):
+            previous = None
+        cny_amount = analysis.get('cny_amount', cny_amount)
+        if cny_amount is None:
+            raise ValueError("cny_amount is required to refresh a failed analysis")
+        stats = analysis.get('stats')
+        complete = previous is not None and stats is not None and stats.count == len(previous)
+        
+        if complete and top_k is None and len(currencies) > 20 and self._load_rate_matrix(deadline):
+            with perf_monitor.measure('CurrencyAnalyzer.refresh_recommendation'):
+                paths, changed = self._rerank_incremental(previous, cny_amount, currencies)
+                stats = RunningStats()
+                stats.add_array(paths.column('efficiency_score'))
+            print(f"增量更新: {changed} 种货币的汇率有变化")
+            refreshed = self.build_recommendation(cny_amount, paths, stats, deadline)
+        else:
+            refreshed = self.get_best_conversion_recommendation(cny_amount, currencies, top_k, deadline)
+        
+        new_paths = refreshed.get('all_paths')
+        changes = rank_changes(previous, new_paths) if previous is not None and isinstance(new_paths, ConversionResults) else []
+        return refreshed, changes
+    
+    def _rerank_incremental(self, previous: ConversionResults, cny_amount: float,
+                            currencies: List[str]) -> Tuple[ConversionResults, int]:
+        """Repair a previous ranking using the freshly loaded rate matrix"""
+        matrix = self.rate_matrix
+        source, target = matrix.index[self.source], matrix.index[self.target]
+        records = previous.records.copy()
+        if previous.codes is not currency_registry.codes:
+            # Built with a private code table: move it onto registry ids
+            records['currency'] = currency_registry.register(previous.currencies)
+        
+        # Registry id -> matrix row, and registry id -> wanted, as plain array lookups
+        endpoints = currency_registry.register([self.source, self.target])
+        wanted = currency_registry.mask(currencies)
+        wanted[endpoints] = False
+        ids = currency_registry.positions(matrix.currencies)[records['currency']]
+        present = ids >= 0
+        to_intermediate = np.full(len(ids), np.nan)
+        to_target = np.full(len(ids), np.nan)
+        to_intermediate[present] = matrix.matrix[source, ids[present]]
+        to_target[present] = matrix.matrix[ids[present], target]
+        
+        changed = ~((to_intermediate == records['cny_to_intermediate_rate'])
+                    & (to_target == records['intermediate_to_usd_rate']))
+        changed |= ~wanted[records['currency']]
+        
+        # Unchanged rows keep their order; the direct rate only rescales their scores
+        direct_amount = cny_amount * self.direct_cny_to_usd
+        records['efficiency_score'] = (records['total_usd_amount'] / direct_amount - 1) * 100
+        
+        ranked_before = np.zeros(len(wanted), dtype=bool)
+        ranked_before[records['currency']] = True
+        new = wanted & ~ranked_before
+        # Keep the caller's order for newly added currencies
+        added = [c for c in dict.fromkeys(currencies) if new[currency_registry.ids[c]]]
+        rescore_ids = records['currency'][changed & wanted[records['currency']]]
+        rescore = currency_registry.codes_of(rescore_ids) + added
+        
+        scored = matrix.score_intermediates(cny_amount, rescore, self.source, self.target)
+        updates = ConversionResults.from_ranked(scored).records
+        # Break score ties by position in the caller's list, as the full recompute's stable sort does
+        tie_order = currency_registry.positions(list(dict.fromkeys(currencies)))
+        return (ConversionResults(records, currency_registry.codes).with_replaced(changed, updates, tie_order),
+                int(np.count_nonzero(changed)) + len(added))
+    
+    def recommendation_for_amount(self, analysis: Dict, cny_amount: float) -> Dict:
+        """Rescale an existing recommendation to a new amount without re-analyzing.
+        
+        Rankings are scale-invariant, so only the USD amounts and savings change.
+        """
+        if analysis.get('status') != 'success':
+            return analysis
+        
+        paths = analysis['all_paths']
+        if isinstance(paths, ConversionResults):
+            paths = paths.rescaled(cny_amount)
+        else:
+            paths = [
+                replace(path, total_usd_amount=cny_amount * path.cny_to_intermediate_rate * path.intermediate_to_usd_rate)
+                for path in paths
+            ]
+        direct_usd = None
+        if analysis['direct_usd_amount']:
+            direct_usd = cny_amount * (analysis['direct_usd_amount'] / analysis['cny_amount'])
+        best_path = paths[0]
+        
+        return {
+            **analysis,
+            'cny_amount': cny_amount,
+            'direct_usd_amount': direct_usd,
+            'best_path': best_path,
+            'all_paths': paths,
             'savings': best_path.total_usd_amount - direct_usd if direct_usd else 0,
+        }
+    
+    def get_batch_recommendations(self, cny_amounts, currencies: List[str], top_n: int = 0,
+                                  deadline: Optional[Deadline] = None) -> Dict:
+        """Best path and savings for many CNY amounts from a single ranking.
+        
+        The ranking is computed once; USD amounts for every input amount are
+        vectorized products, so cost grows with the number of amounts only
+        through array arithmetic. With top_n > 0 the result also holds a
+        (len(amounts), top_n) matrix of USD amounts for the top_n paths.
+        """
+        amounts = np.asarray(cny_amounts, dtype=np.float64)
+        
+        # Reuse a matrix loaded by any earlier analysis, but always derive the direct rate from it
+        if self.rate_matrix is None:
+            self._load_rate_matrix(deadline)
+        direct_rate = self.rate_matrix.rate(self.source, self.target)
+        if not direct_rate:
+            return {
+                'status': 'error',
+                'message': f'No {self.source} -> {self.target} rate available'
+            }
+        self.direct_cny_to_usd = direct_rate
+        
+        ranked = self.rate_matrix.rank_intermediates(1.0, currencies, self.source, self.target)
+        if ranked is None or not ranked.currencies:
+            return {
+                'status': 'error',
+                'message': 'No conversion paths available'
+            }
+        
+        direct_usd = amounts * direct_rate
+        best_usd = amounts * ranked.source_to_intermediate[0] * ranked.intermediate_to_target[0]
+        best_path = ConversionPath(
+            intermediate_currency=ranked.currencies[0],
+            cny_to_intermediate_rate=float(ranked.source_to_intermediate[0]),
+            intermediate_to_usd_rate=float(ranked.intermediate_to_target[0]),
+            total_usd_amount=float(ranked.total_amounts[0]),
+            efficiency_score=float(ranked.efficiency_scores[0])
+        )
+        
+        result = {
+            'status': 'success',
+            'cny_amounts': amounts,
+            'direct_usd_amounts': direct_usd,
+            'best_path': best_path,  # Same for every amount; total_usd_amount is per 1 CNY
+            'best_usd_amounts': best_usd,
+            'savings': best_usd - direct_usd,
             'savings_percentage': best_path.efficiency_score
-        }
\ No newline at end of file
+        }
+        
+        if top_n > 0:
+            top_rates = ranked.source_to_intermediate[:top_n] * ranked.intermediate_to_target[:top_n]
+            result['top_currencies'] = ranked.currencies[:top_n]
+            result['top_usd_amounts'] = np.outer(amounts, top_rates)
+        
+        return result
@@ -0,0 +1,115 @@
+"""
+货币代码注册表
+Currency Code Registry
+
+全局唯一的ISO货币代码表：每个代码只驻留(intern)一次并分配一个稠密整数ID，
+供API、离线模式、分析器和显示层共享，使货币集合的校验和按货币存储的数组
+都可以用整数索引完成
+"""
+
+import sys
+import threading
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import BASE_CURRENCY, DEFAULT_CURRENCIES, POPULAR_CURRENCIES, TARGET_CURRENCY
+
+
+class CurrencyRegistry:
+    """Append-only table of currency codes and their dense integer ids.
+
+    Ids are assigned in registration order and never change or get reused,
+    so arrays indexed by id (and ``codes`` itself, shared as a code table)
+    stay valid as new currencies appear. Reads are lock-free; registration
+    is serialized.
+    """
+
+    def __init__(self, codes: Iterable[str] = ()):
+        self.codes: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.register(codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.codes)
+
+    def __repr__(self) -> str:
+        return f"CurrencyRegistry({len(self)} currencies)"
+
+    def intern(self, code: str) -> int:
+        """Id of ``code``, registering it first if it is new"""
+        currency_id = self.ids.get(code)
+        if currency_id is None:
+            with self._lock:
+                currency_id = self.ids.get(code)
+                if currency_id is None:
+                    code = sys.intern(code)
+                    currency_id = len(self.codes)
+                    self.codes.append(code)
+                    self.ids[code] = currency_id
+        return currency_id
+
+    def register(self, codes: Iterable[str]) -> np.ndarray:
+        """Ids of ``codes`` (in order), registering new ones"""
+        ids = self.ids
+        return np.array([ids[code] if code in ids else self.intern(code) for code in codes], dtype=np.int32)
+
+    def id_of(self, code: str) -> Optional[int]:
+        return self.ids.get(code)
+
+    def lookup(self, codes: Iterable[str]) -> np.ndarray:
+        """Ids of ``codes`` without registering anything; -1 for unknown codes"""
+        get = self.ids.get
+        return np.array([get(code, -1) for code in codes], dtype=np.int32)
+
+    def codes_of(self, ids: Iterable[int]) -> List[str]:
+        codes = self.codes
+        return [codes[i] for i in ids]
+
+    def mask(self, codes: Iterable[str]) -> np.ndarray:
+        """Boolean array over every registered id, True for ``codes``"""
+        ids = self.register(codes)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def positions(self, codes: Sequence[str]) -> np.ndarray:
+        """Array mapping every registered id to its index in ``codes`` (-1 if absent).
+
+        Translates registry ids into the row/column numbers of a structure
+        with its own ordering, such as ``RateMatrix.currencies``.
+        """
+        ids = self.register(codes)
+        positions = np.full(len(self), -1, dtype=np.intp)
+        positions[ids] = np.arange(len(ids))
+        return positions
+
+    def filter_valid(self, requested: Iterable[str], available: Collection[str]) -> List[str]:
+        """Requested codes that are available, deduplicated, in first-seen order.
+
+        ``available`` is used directly when it already supports O(1)
+        membership (a set, dict or registry); any other collection is turned
+        into a set once, so the check is O(n + m) rather than O(n * m).
+        """
+        if not isinstance(available, (set, frozenset, dict, CurrencyRegistry)):
+            available = set(available)
+        return [code for code in dict.fromkeys(requested) if code in available]
+
+    @staticmethod
+    def normalize(code: str) -> str:
+        return code.strip().upper()
+
+    def parse(self, text: str) -> List[str]:
+        """Comma-separated user input -> normalized codes, deduplicated, in order"""
+        return list(dict.fromkeys(code for code in map(self.normalize, text.split(',')) if code))
+
+
+# Shared by ExchangeRateAPI, OfflineExchangeAPI, CurrencyAnalyzer and the display layer
+currency_registry = CurrencyRegistry([BASE_CURRENCY, TARGET_CURRENCY, *POPULAR_CURRENCIES, *DEFAULT_CURRENCIES])
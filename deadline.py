@@ -0,0 +1,84 @@
+"""
+截止时间预算
+Deadline Budget
+
+一次分析的总耗时预算：从CLI或服务一路传递到每个HTTP请求，超时和重试
+按剩余时间收缩，预算耗尽时返回部分结果或缓存中的旧汇率
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+# An attempt with less time than this left is not worth starting
+MIN_ATTEMPT_SECONDS = 0.05
+
+
+class Deadline:
+    """A point in time (monotonic clock) by which a run must finish"""
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> Optional['Deadline']:
+        """Deadline ``seconds`` from now; None (no deadline) for None or <= 0"""
+        return cls(seconds) if seconds and seconds > 0 else None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() < MIN_ATTEMPT_SECONDS
+
+    def timeout(self, limit: float) -> float:
+        """``limit`` shrunk to the remaining budget"""
+        return min(limit, self.remaining())
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.remaining():.3f}s left)"
+
+
+_scope = threading.local()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline], attempt_timeout: float) -> Iterator[None]:
+    """Make ``deadline`` visible to DeadlineRetry for requests sent by this thread.
+
+    ``attempt_timeout`` is the per-attempt timeout of those requests; a retry
+    is only made when the backoff plus one more such attempt still fits.
+    """
+    previous = getattr(_scope, 'value', None)
+    _scope.value = (deadline, attempt_timeout) if deadline is not None else None
+    try:
+        yield
+    finally:
+        _scope.value = previous
+
+
+class DeadlineRetry(Retry):
+    """urllib3 Retry that only retries when another full attempt fits the deadline.
+
+    The adapter's retry policy is shared by every thread, so the deadline
+    comes from the calling thread's ``deadline_scope``; outside a scope it
+    behaves exactly like Retry.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        scope = getattr(_scope, 'value', None)
+        if scope is not None:
+            deadline, attempt_timeout = scope
+            backoff = new_retry.get_backoff_time()
+            if deadline.remaining() < backoff + attempt_timeout:
+                # Give up the way exhausted retries do, so requests maps the reason to its usual exception
+                raise MaxRetryError(_pool, url, error or ResponseError('deadline exceeded before retry')) from error
+        return new_retry
@@ -1,160 +1,521 @@
+import queue
 import requests
+import sqlite3
 import time
 import ssl
-from urllib3.util.retry import Retry
+import threading
 from requests.adapters import HTTPAdapter
-from typing import Dict, Optional, List
-from config import EXCHANGE_API_KEY, API_URLS, CACHE_DURATION_MINUTES
+from urllib3.exceptions import ReadTimeoutError
+from typing import Dict, Optional, List, Tuple
+from config import (EXCHANGE_API_KEY, API_URLS, CACHE_DURATION_MINUTES, FETCH_MODE,
+                    HEDGE_DELAY_SECONDS, REQUEST_TIMEOUT_SECONDS, PERSISTENT_CACHE_ENABLED,
+                    PERSISTENT_CACHE_PATH, HTTP_KEEP_ALIVE, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE,
+                    HTTP_POOL_MAXSIZE_PER_HOST, STALE_WHILE_REVALIDATE, MAX_STALENESS_MINUTES,
+                    MEMORY_CACHE_MAX_ENTRIES, MEMORY_CACHE_MAX_BYTES, BULK_BASE_CURRENCIES,
+                    BULK_MODE, BULK_CONSISTENCY_CHECK, BULK_CONSISTENCY_BASE,
+                    RATE_HISTORY_ENABLED, RATE_HISTORY_PATH, PROVIDER_ADAPTIVE_ORDER,
+                    PROVIDER_FAILURE_THRESHOLD, PROVIDER_COOL_DOWN_SECONDS, PROVIDER_HEALTH_WINDOW)
+from background_refresh import BackgroundRefresher
+from currency_registry import currency_registry
+from deadline import Deadline, DeadlineRetry, deadline_scope
+from http_transport import PooledHTTPAdapter
+from performance_monitor import perf_monitor
+from provider_health import ProviderSelector
+from memory_cache import TTLCache, rates_size
+from rate_cache import PersistentRateCache
+from rate_history import RateHistory
+from rate_parsing import RateParseError, parse_rates
+
+def _paid_response_ok(data: Dict) -> bool:
+    return data.get('result') == 'success'
+
+def _alternative_response_ok(data: Dict) -> bool:
+    return data.get('success', True)
+
+def _free_response_ok(data: Dict) -> bool:
+    return True
 
 class ExchangeRateAPI:
-    def __init__(self):
-        self.cache = {}
-        self.cache_timestamps = {}
+    def __init__(self, api_urls: Optional[Dict[str, str]] = None, fetch_mode: Optional[str] = None,
+                 hedge_delay: Optional[float] = None, use_persistent_cache: Optional[bool] = None,
+                 keep_alive: Optional[bool] = None, stale_while_revalidate: Optional[bool] = None,
+                 bulk_mode: Optional[str] = None, record_history: Optional[bool] = None):
+        # Bounded LRU of {base: rates}; loads are single-flight per base
+        self.cache = TTLCache(CACHE_DURATION_MINUTES * 60, max_entries=MEMORY_CACHE_MAX_ENTRIES,
+                              max_bytes=MEMORY_CACHE_MAX_BYTES, sizeof=rates_size, monitor=perf_monitor)
+        self.api_urls = api_urls or API_URLS
+        self.fetch_mode = fetch_mode or FETCH_MODE
+        self.hedge_delay = HEDGE_DELAY_SECONDS if hedge_delay is None else hedge_delay
+        self._local = threading.local()
+        # 'multi' fetches every bulk base; 'single' derives them all from one USD table
+        self.bulk_mode = bulk_mode or BULK_MODE
+        self.bulk_consistency_check = BULK_CONSISTENCY_CHECK
+        self.last_consistency = None
+        self._derived_bulk = None
+        self._cleared_at = 0.0  # Last clear_cache(); older on-disk snapshots are refetched
+        self.recorder = None  # Optional rate_fixtures.RateRecorder capturing provider responses
+        self.providers = [api for api in self._build_providers() if api['enabled']]
+        self._providers_by_key = {api['key']: api for api in self.providers}
+        # Rolling health per provider: adaptive ordering plus circuit breakers
+        self.provider_selector = ProviderSelector(
+            [api['key'] for api in self.providers], adaptive=PROVIDER_ADAPTIVE_ORDER,
+            window=PROVIDER_HEALTH_WINDOW, failure_threshold=PROVIDER_FAILURE_THRESHOLD,
+            cool_down=PROVIDER_COOL_DOWN_SECONDS, failure_cost=REQUEST_TIMEOUT_SECONDS
+        )
+        self.keep_alive = HTTP_KEEP_ALIVE if keep_alive is None else keep_alive
+        self.persistent_cache = self._open_persistent_cache(
+            PERSISTENT_CACHE_ENABLED if use_persistent_cache is None else use_persistent_cache
+        )
         self.session = self._create_session()
+        self.history = self._open_history(RATE_HISTORY_ENABLED if record_history is None else record_history)
+        
+        # Stale-while-revalidate: serve expired entries and refresh them in the background
+        self.stale_while_revalidate = (STALE_WHILE_REVALIDATE if stale_while_revalidate is None
+                                       else stale_while_revalidate)
+        self.refresher = None
+        if self.stale_while_revalidate:
+            self.refresher = BackgroundRefresher(self._refresh_in_background, self._is_too_stale)
+    
+    @property
+    def last_fetch_info(self) -> Optional[Dict]:
+        """Provider and elapsed time of the calling thread's most recent fetch"""
+        return getattr(self._local, 'fetch_info', None)
+    
+    @last_fetch_info.setter
+    def last_fetch_info(self, info: Optional[Dict]):
+        self._local.fetch_info = info
+    
+    def _open_persistent_cache(self, enabled: bool) -> Optional[PersistentRateCache]:
+        """Open the shared on-disk cache, falling back to memory only on failure"""
+        if not enabled:
+            return None
+        try:
+            return PersistentRateCache(PERSISTENT_CACHE_PATH)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  无法打开持久化缓存，仅使用内存缓存: {str(e)[:100]}")
+            return None
+    
+    def _open_history(self, enabled: bool) -> Optional[RateHistory]:
+        """Open the append-only rate history, disabling it on failure"""
+        if not enabled:
+            return None
+        try:
+            return RateHistory(RATE_HISTORY_PATH)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  无法打开汇率历史库: {str(e)[:100]}")
+            return None
     
     def _create_session(self):
         """Create a requests session with retry logic and SSL configuration"""
         session = requests.Session()
         
-        # Configure retry strategy
-        retry_strategy = Retry(
+        # Configure retry strategy; retries are skipped when they would overrun a caller's deadline
+        retry_strategy = DeadlineRetry(
             total=3,
             backoff_factor=1,
             status_forcelist=[429, 500, 502, 503, 504],
         )
         
-        # Configure adapter with retry
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
+        # Configure pooled adapter with retry; it also counts opened/reused connections
+        self.adapter = PooledHTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            host_maxsize=HTTP_POOL_MAXSIZE_PER_HOST
+        )
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
         
         # Set headers
         session.headers.update({
             'User-Agent': 'ExchangeRateRanking/1.0',
             'Accept': 'application/json',
-            'Connection': 'close'  # Prevent connection pooling issues
+            # Keep-alive reuses TCP/TLS connections across bases; 'close' is the legacy mode
+            'Connection': 'keep-alive' if self.keep_alive else 'close'
         })
         
         return session
     
+    def connection_stats(self) -> Dict[str, int]:
+        """Connections opened versus reused by this API's session"""
+        return self.adapter.stats.snapshot()
+    
+    def provider_stats(self) -> List[Dict]:
+        """Rolling success rate, latency and breaker state of each provider"""
+        stats = self.provider_selector.snapshot()
+        for entry in stats:
+            entry['name'] = self._providers_by_key[entry['provider']]['name']
+        return stats
+    
     def clear_cache(self):
-        """Clear all cached data"""
+        """Clear this process's cached rates and refetch them on next use.
+        
+        The shared on-disk cache is left alone (other processes and the
+        service rely on it); snapshots stored before this call are simply no
+        longer served to this process.
+        """
         self.cache.clear()
-        self.cache_timestamps.clear()
+        self._cleared_at = time.time()
         print("🔄 缓存已清空")
     
+    def close(self):
+        """Stop the background refresher, flush the rate history and close HTTP connections"""
+        if self.refresher:
+            self.refresher.close()
+        if self.history:
+            self.history.close()
+        self.session.close()
+    
     def _is_cache_valid(self, currency: str) -> bool:
         """Check if cached data is still valid"""
-        if currency not in self.cache_timestamps:
-            return False
-        
-        cache_age = time.time() - self.cache_timestamps[currency]
-        return cache_age < (CACHE_DURATION_MINUTES * 60)
+        return self.cache.age(currency) < self.cache.ttl
+    
+    def _is_too_stale(self, currency: str) -> bool:
+        """True once an entry is past the hard staleness limit (or missing)"""
+        return self.cache.age(currency) >= MAX_STALENESS_MINUTES * 60
     
-    def get_rates(self, base_currency: str = 'USD') -> Optional[Dict[str, float]]:
-        """Fetch exchange rates with caching"""
-        if self._is_cache_valid(base_currency):
-            return self.cache[base_currency]
+    def _refresh_in_background(self, base_currency: str) -> bool:
+        """Re-fetch one base for the background refresher (through the fetch lease, like a miss)"""
+        with perf_monitor.measure('ExchangeRateAPI.load.revalidate'):
+            return self.cache.refresh(base_currency, lambda: self._load_rates(base_currency)) is not None
+    
+    def _max_fetch_seconds(self) -> float:
+        """Worst case for one _fetch_rates: every provider, every retry and every backoff"""
+        retry = self.adapter.max_retries
+        retries = retry.total or 0
+        # urllib3 sleeps backoff_factor * 2**(n-1) before the n-th consecutive retry, none before the first
+        backoff = sum(min(retry.backoff_factor * 2 ** (n - 1), retry.backoff_max) for n in range(2, retries + 1))
+        return len(self.providers) * ((retries + 1) * REQUEST_TIMEOUT_SECONDS + backoff)
+    
+    @perf_monitor.time_function('ExchangeRateAPI.get_rates')
+    def get_rates(self, base_currency: str = 'USD', deadline: Optional[Deadline] = None) -> Optional[Dict[str, float]]:
+        """Fetch exchange rates with caching.
+        
+        With a deadline, the fetch shrinks to the remaining budget; if it runs
+        out (or every provider fails) rates up to MAX_STALENESS old are served
+        from the memory or on-disk cache instead.
+        """
+        rates = self.cache.get(base_currency)
+        if rates is not None:
+            return rates
         
-        rates = self._fetch_rates(base_currency)
-        if rates:
-            self.cache[base_currency] = rates
-            self.cache_timestamps[base_currency] = time.time()
+        if self.refresher:
+            # Serve an expired entry now and revalidate it off the request path
+            rates = self.cache.get(base_currency, max_age=MAX_STALENESS_MINUTES * 60)
+            if rates is not None:
+                self.refresher.schedule(base_currency)
+                return rates
         
+        if deadline is not None and deadline.expired:
+            return self._stale_rates(base_currency)
+        
+        # Concurrent misses for the same base wait on a single upstream fetch
+        with perf_monitor.measure('ExchangeRateAPI.load.miss'):
+            rates = self.cache.get_or_load(base_currency, lambda: self._load_rates(base_currency, deadline))
+        if rates is None and deadline is not None:
+            rates = self._stale_rates(base_currency)
         return rates
     
-    def _fetch_rates(self, base_currency: str) -> Optional[Dict[str, float]]:
-        """Fetch rates from API with fallback - following official examples"""
-        # API endpoints to try in order
-        apis = [
+    def _stale_rates(self, base_currency: str) -> Optional[Dict[str, float]]:
+        """Expired rates within MAX_STALENESS, from memory first and then disk"""
+        max_age = MAX_STALENESS_MINUTES * 60
+        rates = self.cache.get(base_currency, max_age=max_age)
+        if rates is None and self.persistent_cache:
+            try:
+                snapshot = self.persistent_cache.get(base_currency, max_age)
+            except sqlite3.Error:
+                snapshot = None
+            rates = snapshot.rates if snapshot else None
+        if rates is not None:
+            print(f"⏱️  时间预算不足，使用缓存的旧汇率 ({base_currency})")
+        return rates
+    
+    def _load_rates(self, base_currency: str,
+                    deadline: Optional[Deadline] = None) -> Optional[Tuple[Dict[str, float], float]]:
+        """Cache-miss and revalidation path; returns (rates, fetched_at) for the memory cache.
+        
+        Callers go through the memory cache's single-flight, so one thread
+        per process loads a base and the on-disk lease then picks one
+        process among those.
+        """
+        if self.persistent_cache:
+            return self._get_rates_shared(base_currency, deadline)
+        
+        rates = self._fetch_rates(base_currency, deadline)
+        return (rates, time.time()) if rates else None
+    
+    def _get_rates_shared(self, base_currency: str,
+                          deadline: Optional[Deadline] = None) -> Optional[Tuple[Dict[str, float], float]]:
+        """Serve from the on-disk cache; only the lease holder fetches per TTL window"""
+        # Snapshots stored before the last clear_cache() are not fresh for this process
+        max_age = min(CACHE_DURATION_MINUTES * 60, time.time() - self._cleared_at)
+        # Long enough that a slow but live holder (all providers, all retries) keeps its lease
+        lease_seconds = self._max_fetch_seconds()
+        cache = self.persistent_cache
+        leased = False
+        try:
+            snapshot = cache.get(base_currency, max_age)
+            while snapshot is None:
+                leased = cache.acquire_fetch_lease(base_currency, lease_seconds)
+                if leased:
+                    break
+                # Another process (or thread) is fetching this base; wait for its snapshot
+                wait_seconds = deadline.timeout(lease_seconds) if deadline else lease_seconds
+                snapshot = cache.wait_for_snapshot(base_currency, max_age, wait_seconds)
+                if snapshot is None and (cache.lease_active(base_currency)
+                                         or (deadline is not None and deadline.expired)):
+                    # Out of time while the holder is still working: don't join the herd,
+                    # serve its last snapshot within MAX_STALENESS (if any) instead
+                    snapshot = cache.get(base_currency, MAX_STALENESS_MINUTES * 60)
+                    if snapshot is None:
+                        return None
+                # Otherwise the holder gave up without a snapshot: loop to take over its lease
+        except sqlite3.Error:
+            snapshot = None
+        
+        if snapshot is not None:
+            return snapshot.rates, snapshot.fetched_at
+        
+        try:
+            rates = self._fetch_rates(base_currency, deadline)
+            fetched_at = time.time()
+            if rates:
+                try:
+                    cache.put(base_currency, self.last_fetch_info['provider'], rates, fetched_at)
+                except sqlite3.Error:
+                    pass
+        finally:
+            # Released even if the fetch raised, so waiters stop polling; never someone else's lease
+            if leased:
+                try:
+                    cache.release_fetch_lease(base_currency)
+                except sqlite3.Error:
+                    pass
+        
+        return (rates, fetched_at) if rates else None
+    
+    def _build_providers(self) -> List[Dict]:
+        """Provider definitions in configured priority order; URLs are templates over {base}"""
+        return [
             # Try paid API first if key is available
             {
                 'name': 'Paid API',
-                'url': f"https://v6.exchangerate-api.com/v6/{EXCHANGE_API_KEY}/latest/{base_currency}",
+                'key': 'paid',
+                'url': self.api_urls['paid'].replace('{api_key}', EXCHANGE_API_KEY),
                 'enabled': bool(EXCHANGE_API_KEY),
                 'data_key': 'conversion_rates',
-                'success_check': lambda data: data.get('result') == 'success'
+                'success_check': _paid_response_ok
             },
             # Alternative free API (often more stable)
             {
                 'name': 'Alternative API',
-                'url': f"https://api.exchangerate.host/latest?base={base_currency}",
+                'key': 'alternative',
+                'url': self.api_urls['alternative'],
                 'enabled': True,
                 'data_key': 'rates',
-                'success_check': lambda data: data.get('success', True)
+                'success_check': _alternative_response_ok
             },
             # Original free API
             {
                 'name': 'Free API',
-                'url': f"https://api.exchangerate-api.com/v4/latest/{base_currency}",
+                'key': 'free_v4',
+                'url': self.api_urls['free_v4'],
                 'enabled': True,
                 'data_key': 'rates',
-                'success_check': lambda data: True
+                'success_check': _free_response_ok
             }
         ]
+    
+    def _fetch_rates(self, base_currency: str, deadline: Optional[Deadline] = None) -> Optional[Dict[str, float]]:
+        """Fetch rates from API with fallback - following official examples.
         
-        for api in apis:
-            if not api['enabled']:
-                continue
-                
+        With a deadline, providers not reached before it expires are skipped
+        and each sequential attempt gets at most an equal share of the budget
+        left, so a hanging provider cannot starve the fallbacks.
+        """
+        # Healthiest providers first; providers with an open circuit breaker are skipped
+        providers = [self._providers_by_key[key]
+                     for key in self.provider_selector.order([api['key'] for api in self.providers])]
+        start_time = time.time()
+        
+        if not providers:
+            provider, rates = None, None
+        elif self.fetch_mode == 'hedged':
+            provider, rates = self._fetch_rates_hedged(providers, base_currency, deadline)
+        else:
+            provider, rates = None, None
+            for position, api in enumerate(providers):
+                if deadline is not None and deadline.expired:
+                    break
+                timeout = REQUEST_TIMEOUT_SECONDS
+                if deadline is not None:
+                    timeout = min(timeout, deadline.remaining() / (len(providers) - position))
+                rates = self._fetch_from_provider(api, base_currency, timeout=timeout, deadline=deadline)
+                if rates:
+                    provider = api['name']
+                    break
+        
+        self.last_fetch_info = {
+            'base': base_currency,
+            'provider': provider,
+            'elapsed': time.time() - start_time,
+        }
+        
+        if not providers and self.providers:
+            print("❌ 所有API都处于熔断冷却中，暂不请求")
+        elif not rates and deadline is not None and deadline.expired:
+            print(f"⏱️  时间预算已用完，未能获取 {base_currency} 汇率")
+        elif not rates:
+            print("❌ 所有API都无法访问")
+        elif self.history:
             try:
-                print(f"尝试 {api['name']}...")
+                self.history.append(base_currency, rates)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  汇率历史写入失败: {str(e)[:100]}")
+        return rates
+    
+    def _fetch_rates_hedged(self, providers: List[Dict], base_currency: str,
+                            deadline: Optional[Deadline] = None) -> Tuple[Optional[str], Optional[Dict[str, float]]]:
+        """Race providers, starting the next one whenever the hedge delay passes.
+        
+        A provider that fails starts the next one immediately. The first valid
+        response wins; providers not yet started are never started and
+        in-flight ones are abandoned with their results discarded. Each
+        request runs on a daemon thread, so an abandoned one never delays
+        interpreter exit. With a deadline the race is abandoned as soon as it
+        expires.
+        """
+        if not providers:
+            return None, None
+        
+        cancelled = threading.Event()
+        results: 'queue.Queue[Tuple[str, Optional[Dict[str, float]]]]' = queue.Queue()
+        remaining = list(providers)
+        in_flight = 0
+        
+        def race(api: Dict, request_timeout: float):
+            rates = None
+            try:
+                rates = self._fetch_from_provider(api, base_currency, cancelled, request_timeout, deadline)
+            finally:
+                results.put((api['name'], rates))
+        
+        try:
+            while remaining or in_flight:
+                if deadline is not None and deadline.expired:
+                    return None, None
+                if remaining:
+                    api = remaining.pop(0)
+                    request_timeout = deadline.timeout(REQUEST_TIMEOUT_SECONDS) if deadline else REQUEST_TIMEOUT_SECONDS
+                    threading.Thread(target=race, args=(api, request_timeout),
+                                     name=f"hedge-{api['key']}", daemon=True).start()
+                    in_flight += 1
+                
+                timeout = self.hedge_delay if remaining else None
+                if deadline is not None:
+                    timeout = deadline.remaining() if timeout is None else deadline.timeout(timeout)
+                try:
+                    name, rates = results.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                in_flight -= 1
+                if rates:
+                    return name, rates
+            return None, None
+        finally:
+            cancelled.set()
+    
+    def _fetch_from_provider(self, api: Dict, base_currency: str, cancelled: Optional[threading.Event] = None,
+                             timeout: float = REQUEST_TIMEOUT_SECONDS,
+                             deadline: Optional[Deadline] = None) -> Optional[Dict[str, float]]:
+        """Fetch and validate rates from a single provider, recording the outcome in its health.
+        
+        ``timeout`` applies per attempt; with a deadline, urllib3 retries are
+        only made while another attempt still fits in the budget.
+        """
+        def report(message: str):
+            # Losing hedged requests finish quietly
+            if cancelled is None or not cancelled.is_set():
+                print(message)
+        
+        # Another thread may have tripped the breaker or claimed the half-open trial meanwhile
+        if not self.provider_selector.begin(api['key']):
+            return None
+        
+        failure = 'invalid'
+        # A timeout cut short by the caller's budget says little about the provider's health
+        timeout_failure = 'timeout' if timeout >= REQUEST_TIMEOUT_SECONDS else 'deadline'
+        request_start = time.time()
+        try:
+            report(f"尝试 {api['name']}...")
+            perf_monitor.record_api_call()
+            with perf_monitor.measure(f"provider.{api['key']}"), deadline_scope(deadline, timeout):
                 response = self.session.get(
-                    api['url'], 
-                    timeout=20,
+                    api['url'].format(base=base_currency),
+                    timeout=timeout,
                     verify=True  # Enable SSL verification
                 )
+            
+            if self.recorder is not None:
+                self.recorder.record(api['key'], base_currency, response.status_code, response.content)
+            
+            if response.status_code == 200:
+                rates = parse_rates(response.content, api['data_key'], api['success_check'], base_currency)
+                elapsed = time.time() - request_start
+                self.provider_selector.record_success(api['key'], elapsed)
+                report(f"✅ {api['name']} 成功 ({elapsed:.2f}秒)")
+                return rates
+            else:
+                failure = 'http'
+                report(f"❌ {api['name']} HTTP错误: {response.status_code}")
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    if api['success_check'](data):
-                        rates = data.get(api['data_key'], {})
-                        if rates and len(rates) > 10:  # Validate response
-                            print(f"✅ {api['name']} 成功")
-                            return rates
-                        else:
-                            print(f"⚠️  {api['name']} 返回数据不完整")
-                    else:
-                        print(f"❌ {api['name']} 返回错误: {data.get('error-type', 'Unknown')}")
-                else:
-                    print(f"❌ {api['name']} HTTP错误: {response.status_code}")
-                    
-            except requests.exceptions.SSLError as e:
-                print(f"❌ {api['name']} SSL错误: {str(e)[:100]}...")
-                continue
-            except requests.exceptions.ConnectionError as e:
-                print(f"❌ {api['name']} 连接错误: {str(e)[:100]}...")
-                continue
-            except requests.exceptions.Timeout as e:
-                print(f"❌ {api['name']} 超时错误")
-                continue
-            except requests.RequestException as e:
-                print(f"❌ {api['name']} 请求异常: {str(e)[:100]}...")
-                continue
-            except Exception as e:
-                print(f"❌ {api['name']} 未知错误: {str(e)[:100]}...")
-                continue
+        except RateParseError as e:
+            report(f"⚠️  {api['name']} 返回数据无效: {e}")
+        except requests.exceptions.SSLError as e:
+            failure = 'ssl'
+            report(f"❌ {api['name']} SSL错误: {str(e)[:100]}...")
+        except requests.exceptions.Timeout as e:
+            failure = timeout_failure
+            report(f"❌ {api['name']} 超时错误")
+        except requests.exceptions.ConnectionError as e:
+            # Read timeouts that exhaust the retries (or the deadline) arrive wrapped in MaxRetryError
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            if isinstance(reason, ReadTimeoutError):
+                failure = timeout_failure
+                report(f"❌ {api['name']} 超时错误")
+            else:
+                failure = 'connection'
+                report(f"❌ {api['name']} 连接错误: {str(e)[:100]}...")
+        except requests.exceptions.RetryError as e:
+            failure = 'http'
+            report(f"❌ {api['name']} 重试后仍失败: {str(e)[:100]}...")
+        except requests.RequestException as e:
+            failure = 'connection'
+            report(f"❌ {api['name']} 请求异常: {str(e)[:100]}...")
+        except Exception as e:
+            report(f"❌ {api['name']} 未知错误: {str(e)[:100]}...")
         
-        print("❌ 所有API都无法访问")
+        self.provider_selector.record_failure(api['key'], failure, time.time() - request_start)
         return None
     
-    def get_conversion_rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+    def get_conversion_rate(self, from_currency: str, to_currency: str,
+                            deadline: Optional[Deadline] = None) -> Optional[float]:
         """Get specific conversion rate between two currencies"""
         if from_currency == to_currency:
             return 1.0
         
         # Try direct conversion
-        rates = self.get_rates(from_currency)
+        rates = self.get_rates(from_currency, deadline)
         if rates and to_currency in rates:
             return rates[to_currency]
         
         # Try reverse conversion
-        rates = self.get_rates(to_currency)
+        rates = self.get_rates(to_currency, deadline)
         if rates and from_currency in rates:
             return 1.0 / rates[from_currency]
         
         # Try USD as intermediate
-        usd_rates = self.get_rates('USD')
+        usd_rates = self.get_rates('USD', deadline)
         if usd_rates and from_currency in usd_rates and to_currency in usd_rates:
             from_to_usd = 1.0 / usd_rates[from_currency]
             usd_to_target = usd_rates[to_currency]
@@ -162,20 +523,81 @@ class ExchangeRateAPI:
         
         return None
     
-    def get_all_rates_bulk(self) -> Dict[str, Dict[str, float]]:
-        """Pre-fetch all major currency rates for bulk processing"""
-        bulk_rates = {}
+    def get_all_rates_bulk(self, deadline: Optional[Deadline] = None) -> Dict[str, Dict[str, float]]:
+        """Pre-fetch all major currency rates for bulk processing.
         
-        # Key currencies to fetch rates for bulk processing
-        key_currencies = ['USD', 'CNY', 'EUR', 'GBP', 'JPY']
+        Once the deadline expires the remaining bases come from the cache
+        (possibly stale) or are left out, so the snapshot may be partial.
+        """
+        if self.bulk_mode == 'single':
+            bulk_rates = self._single_snapshot_bulk(deadline)
+            if bulk_rates:
+                return bulk_rates
         
-        for currency in key_currencies:
-            rates = self.get_rates(currency)
+        bulk_rates = {}
+        for currency in BULK_BASE_CURRENCIES:
+            rates = self.get_rates(currency, deadline)
             if rates:
                 bulk_rates[currency] = rates
         
+        if deadline is not None and len(bulk_rates) < len(BULK_BASE_CURRENCIES):
+            missing = [c for c in BULK_BASE_CURRENCIES if c not in bulk_rates]
+            print(f"⏱️  时间预算内未能获取: {', '.join(missing)}，使用部分汇率数据")
         return bulk_rates
     
+    def _single_snapshot_bulk(self, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Dict[str, float]]]:
+        """Derive every bulk base from one USD table (one request, one point in time).
+        
+        Cross rates triangulated through a single table are arbitrage-free by
+        construction, so every one-hop path scores the same as the direct
+        rate; the optional consistency check measures how far a real second
+        base deviates from the derived one.
+        """
+        usd_rates = self.get_rates('USD', deadline)
+        if not usd_rates:
+            return None
+        
+        # Reuse derived tables while the USD table is unchanged so callers can detect new snapshots by identity
+        cached = self._derived_bulk
+        if cached is not None and cached[0] is usd_rates:
+            return cached[1]
+        
+        bulk_rates = {'USD': usd_rates}
+        for base in BULK_BASE_CURRENCIES:
+            base_rate = usd_rates.get(base)
+            if base == 'USD' or not base_rate or base_rate <= 0:
+                continue
+            derived = {currency: rate / base_rate for currency, rate in usd_rates.items()}
+            derived['USD'] = 1.0 / base_rate
+            derived.pop(base, None)
+            bulk_rates[base] = derived
+        
+        self._derived_bulk = (usd_rates, bulk_rates)
+        if self.bulk_consistency_check:
+            self.last_consistency = self.check_triangulation(bulk_rates, deadline=deadline)
+        return bulk_rates
+    
+    def check_triangulation(self, bulk_rates: Dict[str, Dict[str, float]],
+                            base_currency: str = BULK_CONSISTENCY_BASE,
+                            deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Fetch base_currency directly and report its largest relative deviation from the derived table"""
+        derived = bulk_rates.get(base_currency)
+        fetched = self.get_rates(base_currency, deadline)
+        if not derived or not fetched:
+            return None
+        
+        worst_currency, worst = None, 0.0
+        for currency, rate in fetched.items():
+            expected = derived.get(currency)
+            if not expected or not rate or rate <= 0:
+                continue
+            discrepancy = abs(rate / expected - 1.0)
+            if discrepancy > worst:
+                worst_currency, worst = currency, discrepancy
+        
+        print(f"📐 三角换算一致性 ({base_currency}): 最大偏差 {worst:.4%} ({worst_currency or '-'})")
+        return {'base': base_currency, 'currency': worst_currency, 'max_discrepancy': worst}
+    
     def get_conversion_rate_bulk(self, from_currency: str, to_currency: str, bulk_rates: Dict[str, Dict[str, float]]) -> Optional[float]:
         """Fast conversion rate lookup using pre-fetched bulk rates"""
         if from_currency == to_currency:
@@ -200,16 +622,18 @@ class ExchangeRateAPI:
         # Fallback to regular API call
         return self.get_conversion_rate(from_currency, to_currency)
     
-    def get_available_currencies(self) -> List[str]:
+    def get_available_currencies(self, deadline: Optional[Deadline] = None) -> List[str]:
         """Get list of available currencies from the API with fallback"""
         # Try USD first (most common base)
-        rates = self.get_rates('USD')
+        rates = self.get_rates('USD', deadline)
         if rates and len(rates) > 10:  # Valid response should have many currencies
+            currency_registry.register(rates)
             return list(rates.keys())
         
         # Try EUR as fallback
-        rates = self.get_rates('EUR')
+        rates = self.get_rates('EUR', deadline)
         if rates and len(rates) > 10:
+            currency_registry.register(rates)
             return list(rates.keys())
         
         # If API fails, return our comprehensive default list as fallback
@@ -217,12 +641,11 @@ class ExchangeRateAPI:
         print("⚠️  无法从API获取货币列表，使用内置货币列表")
         return DEFAULT_CURRENCIES
     
-    def filter_valid_currencies(self, currency_list: List[str]) -> List[str]:
+    def filter_valid_currencies(self, currency_list: List[str], deadline: Optional[Deadline] = None) -> List[str]:
         """Filter currency list to only include currencies available from the API"""
-        available = self.get_available_currencies()
+        available = self.get_available_currencies(deadline)
         if not available:
             return currency_list  # Return original list if we can't get available currencies
         
-        # Filter currencies that are available in the API
-        valid_currencies = [currency for currency in currency_list if currency in available]
-        return valid_currencies
\ No newline at end of file
+        # Filter currencies that are available in the API (set lookup, duplicates dropped)
+        return currency_registry.filter_valid(currency_list, available)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+连接池传输层
+Pooled HTTP Transport
+
+支持Keep-Alive的连接池适配器，按主机配置连接池大小，并统计新建与复用的连接数
+"""
+
+import threading
+from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class ConnectionStats:
+    """Thread-safe counters for connections opened and requests sent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+
+    def record_open(self):
+        with self._lock:
+            self.opened += 1
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.opened, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'opened': self.opened,
+                'reused': max(self.requests - self.opened, 0),
+                'requests': self.requests,
+            }
+
+
+def _counting_pool_class(base_class, stats: ConnectionStats, host_maxsize: Dict[str, int]):
+    """Subclass a urllib3 pool so it reports to ``stats`` and honours per-host sizes"""
+
+    class CountingConnection(base_class.ConnectionCls):
+        # Called for every new socket, including reconnects of a dropped connection
+        def connect(self):
+            stats.record_open()
+            return super().connect()
+
+    class CountingConnectionPool(base_class):
+        ConnectionCls = CountingConnection
+
+        def __init__(self, host, *args, **kwargs):
+            if host in host_maxsize:
+                kwargs['maxsize'] = host_maxsize[host]
+            super().__init__(host, *args, **kwargs)
+
+        def _make_request(self, *args, **kwargs):
+            stats.record_request()
+            return super()._make_request(*args, **kwargs)
+
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that counts opened versus reused connections.
+
+    ``pool_maxsize`` caps the kept-alive connections per host and
+    ``host_maxsize`` overrides it for individual hosts.
+    """
+
+    def __init__(self, *args, host_maxsize: Optional[Dict[str, int]] = None, **kwargs):
+        self.stats = ConnectionStats()
+        self.host_maxsize = dict(host_maxsize or {})
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self.stats, self.host_maxsize),
+            'https': _counting_pool_class(HTTPSConnectionPool, self.stats, self.host_maxsize),
+        }
+
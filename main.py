@@ -7,13 +7,27 @@ Exchange Rate Ranking Analysis Tool
 Real-time global exchange rate analysis for optimal CNY to USD conversion paths
 """
 
+import sys
+
 import click
-from rich.console import Console
-from rich.prompt import Prompt, FloatPrompt
-from currency_analyzer import CurrencyAnalyzer
-from utils import display_conversion_analysis, display_loading, display_error, console
-from config import DEFAULT_CURRENCIES, POPULAR_CURRENCIES
-from offline_mode import OfflineExchangeAPI, get_offline_demo_message, is_network_available
+from config import ANALYSIS_DEADLINE_SECONDS, DEFAULT_CURRENCIES, POPULAR_CURRENCIES, TARGET_CURRENCY
+from connectivity import start_network_probe
+
+def _parse_amounts(value):
+    """--amounts: comma-separated CNY amounts, or @FILE with one amount per line"""
+    if value is None:
+        return None
+    try:
+        if value.startswith('@'):
+            with open(value[1:], encoding='utf-8') as f:
+                amounts = [float(line) for line in f if line.strip()]
+        else:
+            amounts = [float(part) for part in value.split(',') if part.strip()]
+    except (OSError, ValueError) as e:
+        raise click.BadParameter(str(e))
+    if not amounts or min(amounts) <= 0:
+        raise click.BadParameter('amounts must be positive numbers')
+    return amounts
 
 @click.command()
 @click.option('--amount', '-a', type=float, help='CNY amount to convert')
@@ -21,42 +35,84 @@ from offline_mode import OfflineExchangeAPI, get_offline_demo_message, is_networ
 @click.option('--all-currencies', is_flag=True, help='Use all available currencies from API')
 @click.option('--popular', is_flag=True, help='Use popular currencies only')
 @click.option('--offline', is_flag=True, help='Force offline demo mode')
+@click.option('--synthetic', type=click.IntRange(2, 26 ** 3), help='Offline mode with a synthetic market of N currencies (load testing)')
+@click.option('--max-hops', type=click.IntRange(2, 6), default=2, help='Also search routes with up to N conversions')
+@click.option('--sources', help='Comma-separated source currencies: also show the best intermediate for every source -> target pair')
+@click.option('--targets', help='Comma-separated target currencies for --sources (default: TARGET_CURRENCY)')
+@click.option('--metrics-out', type=click.Path(dir_okay=False), help='Write performance metrics on exit (.json, or .prom for Prometheus text)')
+@click.option('--single-snapshot', is_flag=True, help='Fetch one USD table and derive the other bulk bases from it')
+@click.option('--top', type=click.IntRange(1), help='Keep only the best N paths (constant memory for large currency lists)')
+@click.option('--live', is_flag=True, help='Show the ranking progressively while paths are computed')
+@click.option('--deadline', type=click.FloatRange(0), default=ANALYSIS_DEADLINE_SECONDS,
+              help='Time budget in seconds per analysis; returns partial or cached results when it runs out (0 = none)')
+@click.option('--amounts', callback=lambda ctx, param, value: _parse_amounts(value),
+              help='Also rank once for many CNY amounts: comma-separated, or @FILE with one amount per line')
+@click.option('--batch', is_flag=True, help='Non-interactive: no prompts, exit after the first result')
 @click.option('--debug', is_flag=True, help='Enable debug mode')
-def main(amount, currencies, all_currencies, popular, offline, debug):
+def main(amount, currencies, all_currencies, popular, offline, synthetic, max_hops, sources, targets, metrics_out, single_snapshot, top, live, deadline, amounts, batch, debug):
     """
     汇率兑换排行分析工具
     
     分析人民币通过不同中间货币兑换美元的效率，帮助找到最具性价比的兑换路径。
     """
+    offline = offline or bool(synthetic)
+    # Probe connectivity in the background while the heavier modules load
+    network_probe = None if offline else start_network_probe()
+    
+    # Deferred imports: rich, requests and numpy load only once the CLI actually runs
+    from rich.prompt import Prompt, FloatPrompt
+    from currency_analyzer import CurrencyAnalyzer
+    from utils import (display_batch_recommendations, display_best_intermediates, display_conversion_analysis,
+                       display_live_ranking, display_multi_hop_paths, display_rank_changes, display_loading,
+                       display_error, console)
+    from performance_monitor import perf_monitor
+    from currency_registry import currency_registry
+    from deadline import Deadline
+    from offline_mode import OfflineExchangeAPI, SyntheticMarket, default_market, get_offline_demo_message
+    
     console.print("[bold blue]🌍 汇率兑换排行分析工具[/bold blue]")
     console.print("[dim]Exchange Rate Ranking Analysis Tool[/dim]\n")
     
     try:
         # Get CNY amount
         if not amount:
-            amount = FloatPrompt.ask("请输入人民币金额 (Enter CNY amount)", default=10000.0)
+            amount = 10000.0 if batch else FloatPrompt.ask("请输入人民币金额 (Enter CNY amount)", default=10000.0)
         
         if amount <= 0:
             display_error("金额必须大于0")
             return
         
         # Check network and initialize analyzer
-        use_offline_mode = offline or not is_network_available()
+        network_available = offline or network_probe.result()
+        if batch and not network_available:
+            # A negative probe result may be cached from an earlier run; re-check before failing
+            network_available = start_network_probe(use_cache=False).result()
+        use_offline_mode = not network_available
+        
+        if use_offline_mode and batch and not offline:
+            # Scripted runs must never pass demo rates off as real ones
+            display_error("无法连接汇率API；批处理模式不会自动切换到离线演示数据（需要时请显式使用 --offline）")
+            sys.exit(1)
         
         if use_offline_mode:
             console.print(get_offline_demo_message())
-            if not click.confirm("是否继续使用离线演示模式?", default=True):
+            if not batch and not click.confirm("是否继续使用离线演示模式?", default=True):
                 return
             
             # Create offline analyzer
-            analyzer = CurrencyAnalyzer()
-            analyzer.api = OfflineExchangeAPI()  # Replace with offline API
+            market = default_market()
+            if synthetic:
+                market = SyntheticMarket(size=synthetic, seed=market.seed, volatility=market.volatility,
+                                         quote_noise=market.quote_noise, noise=market.noise)
+            analyzer = CurrencyAnalyzer(OfflineExchangeAPI(market))
         else:
             analyzer = CurrencyAnalyzer()
+            if single_snapshot:
+                analyzer.api.bulk_mode = 'single'
         
         # Get currencies list
         if currencies:
-            currency_list = [c.strip().upper() for c in currencies.split(',')]
+            currency_list = currency_registry.parse(currencies)
         elif all_currencies:
             console.print("[yellow]获取API支持的所有货币列表...[/yellow]")
             try:
@@ -77,7 +133,7 @@ def main(amount, currencies, all_currencies, popular, offline, debug):
         elif popular:
             currency_list = POPULAR_CURRENCIES
         else:
-            currency_choice = Prompt.ask(
+            currency_choice = '1' if batch else Prompt.ask(
                 "选择货币列表 (Choose currency list)",
                 choices=['1', '2', '3', '4'],
                 default='1'
@@ -113,14 +169,17 @@ def main(amount, currencies, all_currencies, popular, offline, debug):
                     "请输入货币代码，用逗号分隔 (Enter currency codes, comma-separated)",
                     default='EUR,GBP,JPY,KRW,HKD'
                 )
-                currency_list = [c.strip().upper() for c in custom_currencies.split(',')]
+                currency_list = currency_registry.parse(custom_currencies)
+        
+        # The time budget covers validation and analysis, not the prompts above
+        run_deadline = Deadline.after(deadline)
         
         # Filter to only valid currencies available from API
         console.print("[yellow]验证货币有效性...[/yellow]")
-        valid_currencies = analyzer.api.filter_valid_currencies(currency_list)
+        valid_currencies = analyzer.api.filter_valid_currencies(currency_list, run_deadline)
         
-        if len(valid_currencies) < len(currency_list):
-            invalid_currencies = set(currency_list) - set(valid_currencies)
+        invalid_currencies = currency_registry.filter_valid(currency_list, set(currency_list) - set(valid_currencies))
+        if invalid_currencies:
             console.print(f"[yellow]以下货币不可用: {', '.join(invalid_currencies)}[/yellow]")
         
         if not valid_currencies:
@@ -132,13 +191,48 @@ def main(amount, currencies, all_currencies, popular, offline, debug):
         # Perform analysis
         display_loading()
         
-        analysis = analyzer.get_best_conversion_recommendation(amount, valid_currencies)
+        if live:
+            paths, stats = display_live_ranking(
+                analyzer.iter_conversion_paths(amount, valid_currencies, deadline=run_deadline), top or 50
+            )
+            analysis = analyzer.build_recommendation(amount, paths, stats, run_deadline)
+        else:
+            analysis = analyzer.get_best_conversion_recommendation(amount, valid_currencies, top_k=top,
+                                                                   deadline=run_deadline)
         
         # Display results
         display_conversion_analysis(analysis)
         
+        if debug and hasattr(analyzer.api, 'connection_stats'):
+            stats = analyzer.api.connection_stats()
+            console.print(f"[dim]HTTP连接: 新建 {stats['opened']} / 复用 {stats['reused']}[/dim]")
+            for provider in analyzer.api.provider_stats():
+                success_rate = provider['success_rate']
+                console.print(f"[dim]{provider['name']}: {provider['state']}, "
+                              f"成功率 {'-' if success_rate is None else f'{success_rate:.0%}'}, "
+                              f"预期耗时 {provider['expected_latency']:.2f}秒[/dim]")
+        
+        if max_hops > 2:
+            display_multi_hop_paths(
+                analyzer.find_multi_hop_paths(amount, valid_currencies, max_hops=max_hops),
+                amount
+            )
+        
+        if sources:
+            source_list = currency_registry.parse(sources)
+            target_list = currency_registry.parse(targets or TARGET_CURRENCY)
+            display_best_intermediates(
+                analyzer.best_intermediates(source_list, target_list, valid_currencies, run_deadline)
+            )
+        
+        if amounts is not None:
+            # One ranking, vectorized over every amount
+            display_batch_recommendations(
+                analyzer.get_batch_recommendations(amounts, valid_currencies, deadline=run_deadline)
+            )
+        
         # Interactive mode
-        while True:
+        while not batch:
             action = Prompt.ask(
                 "\n选择操作 (Choose action)",
                 choices=['r', 'n', 'q'],
@@ -149,18 +243,17 @@ def main(amount, currencies, all_currencies, popular, offline, debug):
                 # Refresh analysis
                 console.print("[yellow]🔄 刷新汇率数据...[/yellow]")
                 try:
-                    # Clear cache and create new analyzer
+                    # Clear cached rates but keep the analyzer and its pooled session alive
                     analyzer.api.clear_cache()
-                    
-                    if use_offline_mode:
-                        analyzer = CurrencyAnalyzer()
-                        analyzer.api = OfflineExchangeAPI()
-                    else:
-                        analyzer = CurrencyAnalyzer()
+                    analyzer.reset()
                     
                     display_loading()
-                    analysis = analyzer.get_best_conversion_recommendation(amount, valid_currencies)
-                    display_conversion_analysis(analysis)
+                    # Only currencies whose rates changed are re-ranked
+                    analysis, rank_changes = analyzer.refresh_recommendation(
+                        analysis, valid_currencies, top_k=top, deadline=Deadline.after(deadline), cny_amount=amount
+                    )
+                    display_conversion_analysis(analysis, metric='display.refresh')
+                    display_rank_changes(rank_changes)
                 except Exception as e:
                     display_error(f"刷新时发生错误: {str(e)}")
                     if not use_offline_mode:
@@ -168,9 +261,16 @@ def main(amount, currencies, all_currencies, popular, offline, debug):
             elif action == 'n':
                 # New analysis
                 amount = FloatPrompt.ask("请输入新的人民币金额", default=amount)
-                display_loading()
-                analysis = analyzer.get_best_conversion_recommendation(amount, valid_currencies)
-                display_conversion_analysis(analysis)
+                if analysis.get('status') == 'success':
+                    # Rankings don't depend on the amount; rescale the last analysis
+                    analysis = analyzer.recommendation_for_amount(analysis, amount)
+                else:
+                    # Nothing to rescale after a failure: retry the analysis
+                    display_loading()
+                    analysis = analyzer.get_best_conversion_recommendation(
+                        amount, valid_currencies, top_k=top, deadline=Deadline.after(deadline)
+                    )
+                display_conversion_analysis(analysis, metric='display.new_amount')
             else:
                 break
         
@@ -183,6 +283,9 @@ def main(amount, currencies, all_currencies, popular, offline, debug):
             console.print_exception()
         else:
             display_error(f"发生错误: {str(e)}")
+    finally:
+        if metrics_out:
+            perf_monitor.export(metrics_out)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+内存缓存
+Bounded In-Memory Cache
+
+线程安全的TTL + LRU缓存：限制条目数和近似字节数，支持原子化的get-or-load，
+并将命中/未命中/淘汰统计上报给PerformanceMonitor
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from singleflight import SingleFlight
+
+
+def rates_size(rates: Dict[str, float]) -> int:
+    """Approximate memory footprint of a {currency: rate} table in bytes"""
+    if not rates:
+        return sys.getsizeof(rates)
+    key, value = next(iter(rates.items()))
+    return sys.getsizeof(rates) + len(rates) * (sys.getsizeof(key) + sys.getsizeof(value))
+
+
+class CacheStats:
+    __slots__ = ('hits', 'misses', 'evictions', 'coalesced')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TTLCache:
+    """LRU cache whose entries are fresh for ``ttl`` seconds.
+
+    Expired entries are kept (until evicted) so callers can still serve them
+    stale via ``get(key, max_age=...)``. ``max_entries`` and ``max_bytes``
+    (measured with ``sizeof``) bound the cache; the least recently used
+    entries are evicted first. ``monitor`` is an optional PerformanceMonitor
+    that receives hit, miss, eviction and coalesced-wait counts. ``clock``
+    returns the current time in the same units as ``stored_at`` (wall-clock
+    seconds by default).
+    """
+
+    def __init__(self, ttl: float, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = sys.getsizeof, monitor=None,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.monitor = monitor
+        self.clock = clock
+        self.stats = CacheStats()
+        self.total_bytes = 0
+        # key -> (value, stored_at, size); order is least to most recently used
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Hashable, max_age: Optional[float] = None):
+        """Value for key if younger than max_age (default: the TTL), else None.
+
+        A returned value counts as a hit; misses are counted by get_or_load
+        when the value actually has to be loaded.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() - entry[1] >= max_age:
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+        if self.monitor:
+            self.monitor.record_cache_hit()
+        return entry[0]
+
+    def age(self, key: Hashable) -> float:
+        """Seconds since key was stored; infinity if absent"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return self.clock() - entry[1] if entry else float('inf')
+
+    def set(self, key: Hashable, value, stored_at: Optional[float] = None):
+        size = self.sizeof(value)
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self._entries[key] = (value, self.clock() if stored_at is None else stored_at, size)
+            self.total_bytes += size
+            # Always keep the newest entry, even if it alone exceeds max_bytes
+            while len(self._entries) > 1 and self._over_limit():
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                evicted += 1
+            self.stats.evictions += evicted
+        if self.monitor and evicted:
+            self.monitor.record_cache_eviction(evicted)
+
+    def _over_limit(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Optional[Tuple[Any, float]]]):
+        """Fresh value for key, running loader at most once per key concurrently.
+
+        ``loader`` returns ``(value, stored_at)`` or None when nothing could be
+        loaded; concurrent callers for the same key wait for its result.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value, shared = self._inflight.do(key, lambda: self._load(key, loader))
+        if shared:
+            with self._lock:
+                self.stats.coalesced += 1
+            if self.monitor:
+                self.monitor.record_coalesced_wait()
+        return value
+
+    def refresh(self, key: Hashable, loader: Callable[[], Optional[Tuple[Any, float]]]):
+        """Reload key even if it is still cached, sharing the flight with get_or_load"""
+        value, _ = self._inflight.do(key, lambda: self._store(key, loader()))
+        return value
+
+    def _store(self, key: Hashable, loaded: Optional[Tuple[Any, float]]):
+        if loaded is None or loaded[0] is None:
+            return None
+        value, stored_at = loaded
+        self.set(key, value, stored_at)
+        return value
+
+    def _load(self, key: Hashable, loader):
+        # A load for this key may have finished between the check and taking the flight
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            self.stats.misses += 1
+        if self.monitor:
+            self.monitor.record_cache_miss()
+        return self._store(key, loader())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
@@ -5,104 +5,183 @@ Offline Mode and Demo Data
 当网络连接有问题时，使用模拟数据进行演示
 """
 
-from typing import Dict
+import itertools
+import string
 import time
-import random
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (BULK_BASE_CURRENCIES, CACHE_DURATION_MINUTES, MEMORY_CACHE_MAX_BYTES, MEMORY_CACHE_MAX_ENTRIES,
+                    OFFLINE_MARKET_SIZE, OFFLINE_NOISE, OFFLINE_QUOTE_NOISE, OFFLINE_SEED, OFFLINE_VOLATILITY)
+from connectivity import is_network_available  # noqa: F401
+from currency_registry import currency_registry
+from deadline import Deadline
+from memory_cache import TTLCache, rates_size
+from performance_monitor import perf_monitor
+
+# 模拟汇率锚点 (基于真实汇率的近似值，每美元可兑换的数量)
+DEMO_USD_RATES = {
+    'USD': 1.0,
+    'CNY': 7.2345, 'EUR': 0.8234, 'GBP': 0.7123, 'JPY': 149.56,
+    'KRW': 1324.45, 'HKD': 7.8123, 'SGD': 1.3456, 'AUD': 1.5234,
+    'CAD': 1.3567, 'CHF': 0.8945, 'TWD': 31.234, 'THB': 35.67,
+    'MYR': 4.6789, 'INR': 83.234, 'AED': 3.6725, 'SAR': 3.7501,
+    'NOK': 10.567, 'SEK': 10.234, 'DKK': 6.8901, 'RUB': 91.234,
+    'ZAR': 18.567, 'MXN': 17.234, 'BRL': 4.9876, 'ARS': 865.23,
+    'TRY': 27.345, 'PLN': 4.0567, 'CZK': 22.345, 'HUF': 356.78,
+    'ILS': 3.6789, 'NZD': 1.6234
+}
+
+NOISE_MODELS = ('uniform', 'normal', 'student_t')
+MAX_MARKET_SIZE = 26 ** 3  # Every three-letter code
+
+# Seed stream tags, so anchors, epoch moves and quotes never share random numbers
+_ANCHORS, _MOVES, _QUOTES = 0, 1, 2
+
+
+class SyntheticMarket:
+    """Seeded, vectorized generator of consistent rate tables.
+
+    Every currency has a USD value (units per USD): the demo anchors above,
+    plus log-uniform anchors for generated three-letter codes when ``size``
+    exceeds the demo set. Each epoch moves all values by a common-to-all-
+    tables random factor (``volatility``), so mid cross rates are exactly
+    consistent. Each base table then gets its own per-quote deviation
+    (``quote_noise``, drawn from the ``noise`` distribution), standing in
+    for provider spreads; set it to 0 for an arbitrage-free market.
+
+    Tables depend only on (seed, epoch, base), so any epoch can be
+    regenerated in any order.
+    """
+
+    def __init__(self, size: int = 0, seed: int = 0, volatility: float = 0.002,
+                 quote_noise: float = 0.005, noise: str = 'uniform'):
+        if noise not in NOISE_MODELS:
+            raise ValueError(f"noise must be one of {', '.join(NOISE_MODELS)}, got {noise!r}")
+        if size > MAX_MARKET_SIZE:
+            raise ValueError(f"synthetic market supports at most {MAX_MARKET_SIZE} currencies")
+        self.seed = seed
+        self.volatility = volatility
+        self.quote_noise = quote_noise
+        self.noise = noise
+        self.epoch = 0
+
+        codes = list(DEMO_USD_RATES)
+        anchors = list(DEMO_USD_RATES.values())
+        if size > len(codes):
+            extra = size - len(codes)
+            known = set(codes)
+            codes.extend(itertools.islice(
+                (code for code in map(''.join, itertools.product(string.ascii_uppercase, repeat=3))
+                 if code not in known),
+                extra
+            ))
+            anchors.extend(10 ** self._rng(_ANCHORS).uniform(-1, 4, extra))
+        self.currencies: List[str] = codes
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(codes)}
+        self.anchors = np.array(anchors, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.currencies)
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self.index
+
+    def _rng(self, *stream: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, *stream])
+
+    def advance(self, epochs: int = 1) -> int:
+        """Move to a later epoch and return it"""
+        self.epoch += epochs
+        return self.epoch
+
+    def usd_values(self, epoch: Optional[int] = None) -> np.ndarray:
+        """Mid value of every currency in units per USD at an epoch"""
+        epoch = self.epoch if epoch is None else epoch
+        if not self.volatility:
+            return self.anchors
+        moves = self._rng(_MOVES, epoch).normal(0.0, self.volatility, len(self.anchors))
+        moves[self.index['USD']] = 0.0
+        return self.anchors * np.exp(moves)
+
+    def _quote_deviation(self, base_id: int, epoch: int) -> np.ndarray:
+        size = len(self.anchors)
+        if not self.quote_noise:
+            return np.zeros(size)
+        rng = self._rng(_QUOTES, epoch, base_id)
+        if self.noise == 'uniform':
+            return rng.uniform(-self.quote_noise, self.quote_noise, size)
+        if self.noise == 'normal':
+            return rng.normal(0.0, self.quote_noise, size)
+        # Heavy tails: occasional large mispricings; clipped so rates stay positive
+        return np.clip(rng.standard_t(3, size) * self.quote_noise, -0.5, 0.5)
+
+    def rate_array(self, base: str, epoch: Optional[int] = None) -> np.ndarray:
+        """Quotes of every currency in ``base`` units, aligned to ``currencies``"""
+        epoch = self.epoch if epoch is None else epoch
+        base_id = self.index[base]
+        values = self.usd_values(epoch)
+        rates = values / values[base_id] * (1 + self._quote_deviation(base_id, epoch))
+        rates[base_id] = 1.0
+        return rates
+
+    def rates(self, base: str, epoch: Optional[int] = None) -> Dict[str, float]:
+        """{currency: rate} table for a base, shaped like a provider response"""
+        return dict(zip(self.currencies, self.rate_array(base, epoch).tolist()))
+
+
+def default_market() -> SyntheticMarket:
+    """Market configured by the OFFLINE_* settings"""
+    return SyntheticMarket(size=OFFLINE_MARKET_SIZE, seed=OFFLINE_SEED, volatility=OFFLINE_VOLATILITY,
+                           quote_noise=OFFLINE_QUOTE_NOISE, noise=OFFLINE_NOISE)
+
 
 class OfflineExchangeAPI:
     """离线模式的汇率API模拟"""
     
-    def __init__(self):
-        self.cache = {}
-        self.cache_timestamps = {}
-        
-        # 模拟汇率数据 (基于真实汇率的近似值)
-        self.demo_rates = {
-            'USD': {
-                'CNY': 7.2345, 'EUR': 0.8234, 'GBP': 0.7123, 'JPY': 149.56,
-                'KRW': 1324.45, 'HKD': 7.8123, 'SGD': 1.3456, 'AUD': 1.5234,
-                'CAD': 1.3567, 'CHF': 0.8945, 'TWD': 31.234, 'THB': 35.67,
-                'MYR': 4.6789, 'INR': 83.234, 'AED': 3.6725, 'SAR': 3.7501,
-                'NOK': 10.567, 'SEK': 10.234, 'DKK': 6.8901, 'RUB': 91.234,
-                'ZAR': 18.567, 'MXN': 17.234, 'BRL': 4.9876, 'ARS': 865.23,
-                'TRY': 27.345, 'PLN': 4.0567, 'CZK': 22.345, 'HUF': 356.78,
-                'ILS': 3.6789, 'NZD': 1.6234
-            }
-        }
-        
-        # 计算反向汇率
-        for base in list(self.demo_rates.keys()):
-            for target, rate in self.demo_rates[base].items():
-                if target not in self.demo_rates:
-                    self.demo_rates[target] = {}
-                self.demo_rates[target][base] = 1.0 / rate
-        
-        # 添加CNY基准汇率
-        self.demo_rates['CNY'] = {}
-        for currency, rate in self.demo_rates['USD'].items():
-            if currency != 'CNY':
-                cny_rate = rate / self.demo_rates['USD']['CNY']
-                self.demo_rates['CNY'][currency] = cny_rate
-        
-        self.demo_rates['CNY']['USD'] = 1.0 / self.demo_rates['USD']['CNY']
+    def __init__(self, market: Optional[SyntheticMarket] = None):
+        self.market = market or default_market()
+        currency_registry.register(self.market.currencies)
+        # 每个基准货币的模拟数据在同一轮行情(epoch)内保持不变，保证一次分析内汇率一致
+        self.cache = TTLCache(CACHE_DURATION_MINUTES * 60, max_entries=MEMORY_CACHE_MAX_ENTRIES,
+                              max_bytes=MEMORY_CACHE_MAX_BYTES, sizeof=rates_size, monitor=perf_monitor)
     
-    def get_rates(self, base_currency: str = 'USD') -> Dict[str, float]:
-        """获取模拟汇率数据"""
-        if base_currency in self.demo_rates:
-            # 添加少量随机波动来模拟实时数据
-            rates = {}
-            for currency, rate in self.demo_rates[base_currency].items():
-                # 添加±0.5%的随机波动
-                variation = random.uniform(-0.005, 0.005)
-                rates[currency] = rate * (1 + variation)
-            
-            print(f"📱 使用离线模式数据 ({base_currency} 基准)")
-            return rates
-        else:
-            print(f"⚠️  离线模式不支持 {base_currency} 基准货币")
-            return {}
+    def get_rates(self, base_currency: str = 'USD', deadline: Optional[Deadline] = None) -> Dict[str, float]:
+        """获取模拟汇率数据（本地生成，不受截止时间影响）"""
+        if base_currency in self.market:
+            return self.cache.get_or_load(base_currency, lambda: (self.market.rates(base_currency), time.time()))
+        print(f"⚠️  离线模式不支持 {base_currency} 基准货币")
+        return {}
     
-    def get_conversion_rate(self, from_currency: str, to_currency: str) -> float:
-        """获取特定货币转换率"""
+    def get_conversion_rate(self, from_currency: str, to_currency: str,
+                            deadline: Optional[Deadline] = None) -> Optional[float]:
+        """获取特定货币转换率（不支持的货币返回None）"""
         if from_currency == to_currency:
             return 1.0
         
-        # 尝试直接转换
-        from_rates = self.get_rates(from_currency)
-        if to_currency in from_rates:
-            return from_rates[to_currency]
-        
-        # 通过USD中转
-        usd_rates = self.get_rates('USD')
-        if from_currency in usd_rates and to_currency in usd_rates:
-            from_to_usd = 1.0 / usd_rates[from_currency]
-            usd_to_target = usd_rates[to_currency]
-            return from_to_usd * usd_to_target
-        
-        return None
+        # 每个基准货币都有完整的汇率表
+        return self.get_rates(from_currency).get(to_currency)
     
-    def get_available_currencies(self):
+    def get_all_rates_bulk(self, deadline: Optional[Deadline] = None) -> Dict[str, Dict[str, float]]:
+        """获取批量汇率数据（与ExchangeRateAPI接口一致）"""
+        return {currency: self.get_rates(currency) for currency in BULK_BASE_CURRENCIES}
+    
+    def get_available_currencies(self, deadline: Optional[Deadline] = None):
         """获取可用货币列表"""
-        all_currencies = set()
-        for base_rates in self.demo_rates.values():
-            all_currencies.update(base_rates.keys())
-        all_currencies.update(self.demo_rates.keys())
-        
-        print(f"📱 离线模式支持 {len(all_currencies)} 种货币")
-        return list(all_currencies)
+        return list(self.market.currencies)
+    
+    def filter_valid_currencies(self, currency_list, deadline: Optional[Deadline] = None):
+        """过滤出离线模式支持的货币"""
+        return currency_registry.filter_valid(currency_list, self.market.index)
     
     def clear_cache(self):
-        """清空缓存（离线模式无需实际清空）"""
-        print("📱 离线模式 - 缓存已清空")
-
-def is_network_available() -> bool:
-    """检测网络是否可用"""
-    import requests
-    try:
-        response = requests.get("https://httpbin.org/get", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+        """清空缓存并进入下一轮模拟行情"""
+        self.cache.clear()
+        self.market.advance()
+    
+    def close(self):
+        """无后台线程或连接需要释放（与ExchangeRateAPI接口一致）"""
 
 def get_offline_demo_message():
     """获取离线模式说明"""
@@ -113,8 +192,8 @@ def get_offline_demo_message():
 
 特点:
 • 使用模拟汇率数据（基于真实汇率）
-• 支持30+种主要货币
-• 每次查询会有小幅波动模拟实时性
+• 支持30+种主要货币 (OFFLINE_MARKET_SIZE 可生成多达上万种模拟货币)
+• 每次刷新会生成新一轮带小幅波动的行情，同一轮内汇率保持一致
 • 所有功能正常工作，仅数据为演示数据
 
 注意: 这些数据仅用于演示程序功能，不能用于实际交易！
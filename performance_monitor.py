@@ -1,80 +1,225 @@
 import time
+import json
+import math
+import threading
 import functools
-from typing import Dict, Any
-from rich.console import Console
+from contextlib import contextmanager
+from typing import Dict, Any, List
 
-console = Console()
+class LatencyHistogram:
+    """Fixed-memory latency histogram with log-spaced buckets.
+
+    Buckets grow by ``growth`` from ``min_value`` seconds, so percentile
+    estimates are within one bucket width (about 5% by default) no matter how
+    many samples are recorded.
+    """
+
+    def __init__(self, min_value: float = 1e-6, max_value: float = 1e3, growth: float = 1.05):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.bucket_count = int(math.ceil(math.log(max_value / min_value) / self._log_growth)) + 1
+        self.buckets = [0] * (self.bucket_count + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _bucket_index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        index = int(math.log(value / self.min_value) / self._log_growth) + 1
+        return min(index, self.bucket_count)
+
+    def _bucket_upper_bound(self, index: int) -> float:
+        return self.min_value * self.growth ** index
+
+    def record(self, value: float):
+        self.buckets[self._bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Estimate a percentile (0-100) from the bucket counts"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(max(self._bucket_upper_bound(index), self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.mean,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
 
 class PerformanceMonitor:
     def __init__(self):
-        self.timings = {}
+        self._lock = threading.Lock()
+        self.timings: Dict[str, LatencyHistogram] = {}
         self.api_calls = 0
         self.cache_hits = 0
         self.cache_misses = 0
-    
+        self.cache_evictions = 0
+        self.coalesced_waits = 0
+
     def time_function(self, func_name: str):
         """Decorator to time function execution"""
         def decorator(func):
             @functools.wraps(func)
             def wrapper(*args, **kwargs):
-                start_time = time.time()
-                result = func(*args, **kwargs)
-                end_time = time.time()
-                
-                execution_time = end_time - start_time
-                if func_name not in self.timings:
-                    self.timings[func_name] = []
-                self.timings[func_name].append(execution_time)
-                
-                return result
+                with self.measure(func_name):
+                    return func(*args, **kwargs)
             return wrapper
         return decorator
-    
+
+    @contextmanager
+    def measure(self, name: str):
+        """Time a block of code under the given metric name"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_timing(name, time.perf_counter() - start_time)
+
+    def record_timing(self, name: str, seconds: float):
+        """Record one duration sample"""
+        with self._lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = LatencyHistogram()
+            histogram.record(seconds)
+
     def record_api_call(self):
         """Record an API call"""
-        self.api_calls += 1
-    
+        with self._lock:
+            self.api_calls += 1
+
     def record_cache_hit(self):
         """Record a cache hit"""
-        self.cache_hits += 1
-    
+        with self._lock:
+            self.cache_hits += 1
+
     def record_cache_miss(self):
         """Record a cache miss"""
-        self.cache_misses += 1
-    
+        with self._lock:
+            self.cache_misses += 1
+
+    def record_cache_eviction(self, count: int = 1):
+        """Record entries evicted from a bounded cache"""
+        with self._lock:
+            self.cache_evictions += count
+
+    def record_coalesced_wait(self):
+        """Record a caller that waited on another thread's in-flight fetch"""
+        with self._lock:
+            self.coalesced_waits += 1
+
+    def reset(self):
+        """Drop all recorded metrics"""
+        with self._lock:
+            self.timings.clear()
+            self.api_calls = 0
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cache_evictions = 0
+            self.coalesced_waits = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot of all counters and timing summaries"""
+        with self._lock:
+            return {
+                'api_calls': self.api_calls,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'cache_evictions': self.cache_evictions,
+                'coalesced_waits': self.coalesced_waits,
+                'timings': {name: histogram.summary() for name, histogram in self.timings.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = 'era') -> str:
+        """Render metrics in the Prometheus text exposition format"""
+        data = self.to_dict()
+        lines: List[str] = []
+        for counter in ('api_calls', 'cache_hits', 'cache_misses', 'cache_evictions', 'coalesced_waits'):
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {data[counter]}")
+
+        metric = f"{prefix}_duration_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for name, summary in sorted(data['timings'].items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+                lines.append(f'{metric}{{name="{label}",quantile="{quantile}"}} {summary[key]:.9f}')
+            lines.append(f'{metric}_sum{{name="{label}"}} {summary["sum"]:.9f}')
+            lines.append(f'{metric}_count{{name="{label}"}} {summary["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Write metrics to path; '.prom' or '.txt' selects Prometheus text, anything else JSON"""
+        content = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
     def print_performance_report(self):
         """Print detailed performance report"""
+        from rich.console import Console  # Deferred so API-only imports stay light
+        console = Console()
         console.print("\n[bold blue]🔍 性能分析报告 (Performance Analysis Report)[/bold blue]")
         console.print("=" * 60)
-        
+
+        data = self.to_dict()
+
         # API statistics
-        total_cache_operations = self.cache_hits + self.cache_misses
-        cache_hit_rate = (self.cache_hits / total_cache_operations * 100) if total_cache_operations > 0 else 0
-        
-        console.print(f"API调用次数: {self.api_calls}")
-        console.print(f"缓存命中率: {cache_hit_rate:.1f}% ({self.cache_hits}/{total_cache_operations})")
-        
+        total_cache_operations = data['cache_hits'] + data['cache_misses']
+        cache_hit_rate = (data['cache_hits'] / total_cache_operations * 100) if total_cache_operations > 0 else 0
+
+        console.print(f"API调用次数: {data['api_calls']}")
+        console.print(f"缓存命中率: {cache_hit_rate:.1f}% ({data['cache_hits']}/{total_cache_operations})")
+        if data['cache_evictions']:
+            console.print(f"缓存淘汰条目: {data['cache_evictions']}")
+        if data['coalesced_waits']:
+            console.print(f"合并等待的并发请求: {data['coalesced_waits']}")
+
         # Function timing statistics
-        if self.timings:
+        if data['timings']:
             console.print("\n[bold]函数执行时间统计:[/bold]")
-            for func_name, times in self.timings.items():
-                avg_time = sum(times) / len(times)
-                total_time = sum(times)
+            for func_name, summary in data['timings'].items():
                 console.print(f"  {func_name}:")
-                console.print(f"    平均: {avg_time:.3f}秒")
-                console.print(f"    总计: {total_time:.3f}秒")
-                console.print(f"    调用: {len(times)}次")
-        
+                console.print(f"    平均: {summary['mean']:.3f}秒")
+                console.print(f"    总计: {summary['sum']:.3f}秒")
+                console.print(f"    调用: {summary['count']}次")
+                console.print(f"    p50/p95/p99: {summary['p50']:.3f} / {summary['p95']:.3f} / {summary['p99']:.3f}秒")
+
         # Performance recommendations
         console.print(f"\n[bold]性能建议:[/bold]")
-        if self.api_calls > 50:
+        if data['api_calls'] > 50:
             console.print("  ⚠️  API调用次数较多，建议使用批量模式")
         if cache_hit_rate < 50:
             console.print("  ⚠️  缓存命中率较低，考虑优化缓存策略")
         if cache_hit_rate > 80:
             console.print("  ✅ 缓存效率良好")
-        
+
         console.print("=" * 60)
 
 # Global performance monitor instance
-perf_monitor = PerformanceMonitor()
\ No newline at end of file
+perf_monitor = PerformanceMonitor()
@@ -0,0 +1,169 @@
+"""
+数据源健康度
+Provider Health
+
+记录每个汇率数据源最近的成功率和延迟，按预期耗时自动排序，并在连续出现
+SSL、超时、连接、HTTP错误或无效响应后熔断该数据源一段冷却时间
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+# Failure kinds that count toward opening a provider's circuit breaker. 'invalid'
+# (bad JSON or an unusable rate table) counts: a provider that keeps answering
+# garbage is as useless as one that is down. 'deadline' (a timeout shortened by the
+# caller's time budget) says nothing about the provider and only lowers the success rate
+BREAKER_FAILURES = frozenset({'ssl', 'timeout', 'connection', 'http', 'invalid'})
+
+
+class ProviderHealth:
+    """Rolling outcome window and circuit breaker for one provider.
+
+    The breaker opens after ``failure_threshold`` consecutive breaker
+    failures and stays open for ``cool_down`` seconds. Once that passes a
+    single trial request is let through (half-open): success closes the
+    breaker, failure reopens it with the cool-down doubled up to
+    ``max_cool_down``.
+    """
+
+    def __init__(self, name: str, window: int = 20, failure_threshold: int = 3,
+                 cool_down: float = 60.0, max_cool_down: float = 600.0, failure_cost: float = 20.0):
+        self.name = name
+        self.failure_cost = failure_cost
+        self.failure_threshold = failure_threshold
+        self.base_cool_down = cool_down
+        self.max_cool_down = max_cool_down
+        self.outcomes: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.last_failure: Optional[str] = None
+        self.cool_down = cool_down
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.trips = 0
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(ok for ok, _ in self.outcomes) / len(self.outcomes)
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return sum(latency for _, latency in self.outcomes) / len(self.outcomes)
+
+    def expected_latency(self) -> float:
+        """Expected seconds until this provider yields usable rates.
+
+        Every attempt costs the mean attempt time, and every failure also
+        costs ``failure_cost`` (the fallback to another provider, up to a full
+        request timeout), so a provider that fails fast is not mistaken for a
+        fast one. Both are scaled by the expected number of attempts per
+        success. Providers without history score 0 so they get tried and
+        measured.
+        """
+        if not self.outcomes:
+            return 0.0
+        success_rate = self.success_rate
+        attempts = 1 / max(success_rate, 0.05)
+        return attempts * (self.mean_latency + (1 - success_rate) * self.failure_cost)
+
+    def state(self, now: float) -> str:
+        if self.open_until > now:
+            return 'open'
+        return 'half-open' if self.open_until else 'closed'
+
+    def available(self, now: float) -> bool:
+        """Closed, or past its cool-down with no trial request running"""
+        return self.open_until <= now and not self.trial_in_flight
+
+    def begin(self, now: float) -> bool:
+        """Claim a request slot; only one trial request runs while half-open"""
+        if not self.available(now):
+            return False
+        if self.open_until:
+            self.trial_in_flight = True
+        return True
+
+    def record_success(self, latency: float):
+        self.outcomes.append((True, latency))
+        self.consecutive_failures = 0
+        self.cool_down = self.base_cool_down
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    def record_failure(self, kind: str, latency: float, now: float):
+        self.outcomes.append((False, latency))
+        self.last_failure = kind
+        if kind not in BREAKER_FAILURES:
+            self.trial_in_flight = False
+            return
+        self.consecutive_failures += 1
+        if self.open_until:
+            # Half-open trial failed: back off harder
+            self.cool_down = min(self.cool_down * 2, self.max_cool_down)
+            self._trip(now)
+        elif self.consecutive_failures >= self.failure_threshold:
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self.open_until = now + self.cool_down
+        self.trial_in_flight = False
+        self.trips += 1
+
+    def snapshot(self, now: float) -> Dict:
+        return {
+            'provider': self.name,
+            'state': self.state(now),
+            'success_rate': self.success_rate,
+            'mean_latency': self.mean_latency,
+            'expected_latency': self.expected_latency(),
+            'consecutive_failures': self.consecutive_failures,
+            'last_failure': self.last_failure,
+            'open_for': max(0.0, self.open_until - now),
+            'trips': self.trips,
+        }
+
+
+class ProviderSelector:
+    """Health tracking for a fixed set of providers, shared across threads"""
+
+    def __init__(self, names: Sequence[str], adaptive: bool = True, **health_options):
+        self.adaptive = adaptive
+        self.health: Dict[str, ProviderHealth] = {name: ProviderHealth(name, **health_options) for name in names}
+        self._priority = {name: i for i, name in enumerate(names)}
+        self._lock = threading.Lock()
+
+    def order(self, names: Sequence[str]) -> List[str]:
+        """Providers worth trying now, lowest expected latency first.
+
+        Providers whose breaker is open are skipped. Ties (including
+        providers with no history yet) keep the configured priority.
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [name for name in names if self.health[name].available(now)]
+            if self.adaptive:
+                available.sort(key=lambda name: (self.health[name].expected_latency(), self._priority[name]))
+            return available
+
+    def begin(self, name: str) -> bool:
+        """Call right before requesting; False if the provider must be skipped after all"""
+        with self._lock:
+            return self.health[name].begin(time.monotonic())
+
+    def record_success(self, name: str, latency: float):
+        with self._lock:
+            self.health[name].record_success(latency)
+
+    def record_failure(self, name: str, kind: str, latency: float):
+        with self._lock:
+            self.health[name].record_failure(kind, latency, time.monotonic())
+
+    def snapshot(self) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [health.snapshot(now) for health in self.health.values()]
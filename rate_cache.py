@@ -0,0 +1,167 @@
+"""
+持久化汇率缓存
+Persistent Rate Cache
+
+基于SQLite的磁盘缓存，多个进程共享同一份汇率快照，TTL窗口内只请求一次网络
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional, Set
+
+
+class RateSnapshot(NamedTuple):
+    base: str
+    provider: str
+    fetched_at: float
+    rates: Dict[str, float]
+
+
+class PersistentRateCache:
+    """SQLite-backed snapshot store keyed by base currency and provider.
+
+    Every operation opens a short-lived connection, so the cache is safe to
+    share between threads and between processes on one host (WAL journal plus
+    a busy timeout). Fetch leases let one caller refresh a base while the
+    others wait for its snapshot instead of hitting the network themselves;
+    a lease is exclusive between processes and between threads sharing one
+    cache instance.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 10.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Bases whose lease a thread of this instance currently holds (the owner id is shared)
+        self._held: Set[str] = set()
+        self._held_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshots ('
+                'base TEXT NOT NULL, provider TEXT NOT NULL, fetched_at REAL NOT NULL, '
+                'rates TEXT NOT NULL, PRIMARY KEY (base, provider))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS fetch_leases ('
+                'base TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit mode; explicit transactions only where a lease is taken
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, base: str, max_age: float) -> Optional[RateSnapshot]:
+        """Return the newest snapshot for base if it is younger than max_age seconds"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT provider, fetched_at, rates FROM snapshots WHERE base = ? '
+                'ORDER BY fetched_at DESC LIMIT 1',
+                (base,)
+            ).fetchone()
+
+        if row is None or time.time() - row[1] >= max_age:
+            return None
+        return RateSnapshot(base, row[0], row[1], json.loads(row[2]))
+
+    def put(self, base: str, provider: str, rates: Dict[str, float],
+            fetched_at: Optional[float] = None):
+        """Store a snapshot, replacing the previous one from the same provider"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO snapshots (base, provider, fetched_at, rates) '
+                'VALUES (?, ?, ?, ?)',
+                (base, provider, fetched_at, json.dumps(rates))
+            )
+
+    def acquire_fetch_lease(self, base: str, lease_seconds: float) -> bool:
+        """Try to become the caller that refreshes base; False if another holds the lease"""
+        with self._held_lock:
+            if base in self._held:
+                return False
+            self._held.add(base)
+        acquired = False
+        try:
+            acquired = self._acquire_lease_row(base, lease_seconds)
+        finally:
+            if not acquired:
+                with self._held_lock:
+                    self._held.discard(base)
+        return acquired
+
+    def _acquire_lease_row(self, base: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT owner, expires_at FROM fetch_leases WHERE base = ?', (base,)
+                ).fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now:
+                    conn.execute('ROLLBACK')
+                    return False
+                conn.execute(
+                    'INSERT OR REPLACE INTO fetch_leases (base, owner, expires_at) VALUES (?, ?, ?)',
+                    (base, self.owner, now + lease_seconds)
+                )
+                conn.execute('COMMIT')
+                return True
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+
+    def release_fetch_lease(self, base: str):
+        """Release a lease held by this instance"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'DELETE FROM fetch_leases WHERE base = ? AND owner = ?', (base, self.owner)
+                )
+        finally:
+            with self._held_lock:
+                self._held.discard(base)
+
+    def wait_for_snapshot(self, base: str, max_age: float, timeout: float,
+                          poll_interval: float = 0.2) -> Optional[RateSnapshot]:
+        """Poll until the lease holder stores a fresh snapshot, or gives up"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            snapshot = self.get(base, max_age)
+            if snapshot is not None:
+                return snapshot
+            if not self.lease_active(base):
+                return None
+            time.sleep(poll_interval)
+        return None
+
+    def lease_active(self, base: str) -> bool:
+        """True while some caller holds an unexpired fetch lease for base"""
+        # A thread of this instance may hold the lease before its row is committed
+        if base in self._held:
+            return True
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT expires_at FROM fetch_leases WHERE base = ?', (base,)
+            ).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def clear(self):
+        """Drop every stored snapshot"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM snapshots')
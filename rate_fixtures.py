@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+汇率数据录制与回放
+Rate Fixture Record/Replay
+
+录制 _fetch_rates 看到的API响应，并通过本地模拟服务器回放，支持注入延迟和错误
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import click
+
+
+class RateRecorder:
+    """Capture provider responses seen by ExchangeRateAPI._fetch_rates.
+
+    Fixtures are stored as ``{provider_key: {base: {"status": int, "body": ...}}}``
+    where ``provider_key`` is one of the ``config.API_URLS`` keys.
+    """
+
+    def __init__(self):
+        self.fixtures: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider_key: str, base: str, status: int, content: bytes):
+        try:
+            body = json.loads(content)
+        except ValueError:
+            body = content.decode('utf-8', errors='replace')
+        with self._lock:
+            self.fixtures.setdefault(provider_key, {})[base] = {'status': status, 'body': body}
+
+    def save(self, path: str):
+        with self._lock:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.fixtures, f, ensure_ascii=False, indent=1)
+
+
+def load_fixtures(path: str) -> Dict[str, Dict[str, Dict]]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def render_provider_body(provider_key: str, base: str, rates: Dict[str, float]) -> Dict:
+    """Shape a rate table the way the given provider would return it"""
+    if provider_key == 'paid':
+        return {'result': 'success', 'base_code': base, 'conversion_rates': rates}
+    return {'success': True, 'base': base, 'rates': rates}
+
+
+def _extract_rates(provider_key: str, body) -> Optional[Dict[str, float]]:
+    if not isinstance(body, dict):
+        return None
+    return body.get('conversion_rates' if provider_key == 'paid' else 'rates')
+
+
+def fixtures_from_offline(seed: int = 0) -> Dict[str, Dict[str, Dict]]:
+    """Build fixtures from the offline demo market so replay works with no recording"""
+    from offline_mode import SyntheticMarket
+
+    market = SyntheticMarket(seed=seed)
+    fixtures: Dict[str, Dict[str, Dict]] = {key: {} for key in ('paid', 'alternative', 'free_v4')}
+    for base in market.currencies:
+        rates = market.rates(base)
+        for key in fixtures:
+            fixtures[key][base] = {'status': 200, 'body': render_provider_body(key, base, rates)}
+    return fixtures
+
+
+class ReplayProviderServer:
+    """Local stdlib HTTP server that mimics the three provider URL shapes.
+
+    Responses come from recorded fixtures. A base recorded for one provider is
+    re-shaped for the others unless ``strict`` is set. ``latency`` (seconds,
+    optionally per provider key) and a seeded ``error_rate`` make runs
+    reproducible on an air-gapped box.
+    """
+
+    def __init__(self, fixtures: Dict[str, Dict[str, Dict]], latency: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0, strict: bool = False,
+                 provider_latency: Optional[Dict[str, float]] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.provider_latency = dict(provider_latency or {})
+        self.error_rate = error_rate
+        self.strict = strict
+        self.requests_served = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_urls(self) -> Dict[str, str]:
+        """URL templates to pass to ExchangeRateAPI(api_urls=...)"""
+        return {
+            'paid': self.root_url + '/v6/{api_key}/latest/{base}',
+            'free_v4': self.root_url + '/v4/latest/{base}',
+            'alternative': self.root_url + '/latest?base={base}',
+        }
+
+    def start(self) -> 'ReplayProviderServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'ReplayProviderServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _route(self, path: str):
+        """Map a request path to (provider_key, base)"""
+        url = urlparse(path)
+        parts = [p for p in url.path.split('/') if p]
+        if len(parts) == 4 and parts[0] == 'v6' and parts[2] == 'latest':
+            return 'paid', parts[3]
+        if len(parts) == 3 and parts[0] == 'v4' and parts[1] == 'latest':
+            return 'free_v4', parts[2]
+        if parts == ['latest']:
+            return 'alternative', parse_qs(url.query).get('base', ['USD'])[0]
+        return None, None
+
+    def _respond(self, provider_key: str, base: str):
+        """Return (status, body) for a request, applying error injection"""
+        with self._lock:
+            self.requests_served += 1
+            inject_error = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if inject_error:
+            return 503, {'error-type': 'injected-failure'}
+
+        fixture = self.fixtures.get(provider_key, {}).get(base)
+        if fixture is not None:
+            return fixture['status'], fixture['body']
+
+        if not self.strict:
+            for other_key, bases in self.fixtures.items():
+                other = bases.get(base)
+                rates = _extract_rates(other_key, other['body']) if other else None
+                if other and other['status'] == 200 and rates:
+                    return 200, render_provider_body(provider_key, base, rates)
+
+        return 404, {'error-type': 'unsupported-code'}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                provider_key, base = server._route(self.path)
+                if provider_key is None:
+                    status, body = 404, {'error-type': 'not-found'}
+                else:
+                    delay = server.provider_latency.get(provider_key, server.latency)
+                    if delay > 0:
+                        time.sleep(delay)
+                    status, body = server._respond(provider_key, base)
+
+                payload = (json.dumps(body) if not isinstance(body, str) else body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@click.command()
+@click.argument('fixture_path')
+@click.option('--from-offline', is_flag=True, help='Write fixtures generated from offline demo rates')
+@click.option('--serve', is_flag=True, help='Serve FIXTURE_PATH until interrupted')
+@click.option('--port', type=int, default=8765, help='Port for --serve')
+@click.option('--latency', type=float, default=0.0, help='Artificial latency per request (seconds)')
+@click.option('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 503')
+@click.option('--seed', type=int, default=0, help='Seed for noise and error injection')
+def main(fixture_path, from_offline, serve, port, latency, error_rate, seed):
+    """Generate or serve rate fixtures for reproducible benchmarks"""
+    if from_offline:
+        with open(fixture_path, 'w', encoding='utf-8') as f:
+            json.dump(fixtures_from_offline(seed), f, ensure_ascii=False, indent=1)
+        print(f"✅ 已生成离线汇率录制文件: {fixture_path}")
+
+    if serve:
+        server = ReplayProviderServer(load_fixtures(fixture_path), latency=latency,
+                                      error_rate=error_rate, seed=seed, port=port)
+        with server:
+            print(f"🔁 回放服务器运行中: {server.root_url} (Ctrl+C 退出)")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
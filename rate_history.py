@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+汇率历史存储
+Rate History Store
+
+只追加的内存映射历史库：每个基准货币按时间分段，时间戳与按货币列存储的汇率
+分别保存，范围查询只读取所需的页面
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import click
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process writes only
+    fcntl = None
+
+SEGMENT_ROWS = 44640  # 31 days of per-minute snapshots
+COLUMN_HEADROOM = 32  # Spare columns so newly listed currencies rarely force a new segment
+
+
+class HistoryFrame(NamedTuple):
+    """Rates for one base over a time window; ``values[i, t]`` is currencies[i] at timestamps[t]"""
+    base: str
+    timestamps: np.ndarray
+    currencies: List[str]
+    values: np.ndarray
+
+
+class RateHistory:
+    """Append-only store of fetched rate tables.
+
+    Layout under ``path``::
+
+        index.json                    currency code table and segment list
+        <BASE>-<n>.ts                 float64 timestamps, one per snapshot
+        <BASE>-<n>.f64                float64 rates, shape (columns, capacity)
+
+    Rates are stored column-major, so one currency's series within a
+    segment is contiguous on disk. Columns follow the global currency table;
+    segments reserve spare columns, and a new segment starts when they run
+    out or the segment's row capacity is reached.
+    Missing quotes are NaN.
+    """
+
+    def __init__(self, path: str, segment_rows: int = SEGMENT_ROWS):
+        self.path = path
+        self.segment_rows = segment_rows
+        self._lock = threading.Lock()
+        self._index_version = None
+        self._maps: Dict[str, Tuple[np.memmap, np.memmap]] = {}
+        os.makedirs(path, exist_ok=True)
+        self.currencies: List[str] = []
+        self.segments: List[Dict] = []
+        self._column: Dict[str, int] = {}
+        self._load_index()
+
+    # -- index -----------------------------------------------------------------
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.path, 'index.json')
+
+    def _load_index(self):
+        try:
+            version = _file_version(self._index_path)
+        except FileNotFoundError:
+            return
+        if version == self._index_version:
+            return
+        with open(self._index_path, encoding='utf-8') as f:
+            index = json.load(f)
+        self.currencies = index['currencies']
+        self.segments = index['segments']
+        self._column = {code: i for i, code in enumerate(self.currencies)}
+        self._index_version = version
+
+    def _save_index(self):
+        temp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'currencies': self.currencies, 'segments': self.segments}, f)
+        os.replace(temp_path, self._index_path)
+        self._index_version = _file_version(self._index_path)
+
+    def _open_segment(self, segment: Dict, mode: str = 'r') -> Tuple[np.memmap, np.memmap]:
+        name = segment['file']
+        maps = self._maps.get(name)
+        if maps is None or (mode != 'r' and maps[0].mode == 'r'):
+            stem = os.path.join(self.path, name)
+            timestamps = np.memmap(stem + '.ts', dtype=np.float64, mode=mode, shape=(segment['capacity'],))
+            values = np.memmap(stem + '.f64', dtype=np.float64, mode=mode,
+                               shape=(segment['columns'], segment['capacity']))
+            maps = self._maps[name] = (timestamps, values)
+        return maps
+
+    # -- writes ----------------------------------------------------------------
+
+    def append(self, base: str, rates: Dict[str, float], timestamp: Optional[float] = None):
+        """Append one rate table; timestamps per base must not go backwards.
+
+        The default timestamp is taken once both locks are held (and never
+        before the base's last one), so concurrent writers append in the
+        order of their timestamps.
+        """
+        with self._lock, self._file_lock():
+            self._load_index()
+            if timestamp is None:
+                last = self._last_segment(base)
+                timestamp = time.time()
+                if last is not None and last['end'] is not None:
+                    timestamp = max(timestamp, last['end'])
+            for currency in rates:
+                if currency not in self._column:
+                    self._column[currency] = len(self.currencies)
+                    self.currencies.append(currency)
+
+            segment = self._writable_segment(base, timestamp)
+            timestamps, values = self._open_segment(segment, 'r+')
+            row = segment['rows']
+            columns = np.fromiter((self._column[c] for c in rates), dtype=np.intp, count=len(rates))
+            values[:, row] = np.nan
+            values[columns, row] = np.fromiter(rates.values(), dtype=np.float64, count=len(rates))
+            timestamps[row] = timestamp
+
+            segment['rows'] = row + 1
+            segment['start'] = segment['start'] if row else timestamp
+            segment['end'] = timestamp
+            self._save_index()
+
+    def _last_segment(self, base: str) -> Optional[Dict]:
+        last = None
+        for segment in self.segments:
+            if segment['base'] == base:
+                last = segment
+        return last
+
+    def _writable_segment(self, base: str, timestamp: float) -> Dict:
+        last = self._last_segment(base)
+        if last is not None and last['end'] is not None and timestamp < last['end']:
+            raise ValueError(f"history for {base} is append-only: {timestamp} < {last['end']}")
+        if (last is not None and last['rows'] < last['capacity']
+                and last['columns'] >= len(self.currencies)):
+            return last
+
+        number = sum(1 for segment in self.segments if segment['base'] == base)
+        segment = {'base': base, 'file': f"{base}-{number:06d}", 'columns': len(self.currencies) + COLUMN_HEADROOM,
+                   'capacity': self.segment_rows, 'rows': 0, 'start': None, 'end': None}
+        self._open_segment(segment, 'w+')
+        self.segments.append(segment)
+        return segment
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.path, 'write.lock'))
+
+    # -- reads -----------------------------------------------------------------
+
+    def bases(self) -> List[str]:
+        self._load_index()
+        return sorted({segment['base'] for segment in self.segments})
+
+    def range(self, base: str, start: Optional[float] = None, end: Optional[float] = None,
+              currencies: Optional[Sequence[str]] = None) -> HistoryFrame:
+        """Snapshots of base with start <= timestamp < end, limited to the given currencies.
+
+        Segments outside the window are skipped using the index; inside a
+        segment the window is located with a binary search over the
+        timestamp file, and only the requested currency columns are read.
+        """
+        with self._lock:
+            self._load_index()
+            codes = list(currencies) if currencies is not None else list(self.currencies)
+            columns = [self._column.get(code) for code in codes]
+            start = -np.inf if start is None else start
+            end = np.inf if end is None else end
+
+            stamp_parts, value_parts = [], []
+            for segment in self.segments:
+                if segment['base'] != base or not segment['rows']:
+                    continue
+                if segment['end'] < start or segment['start'] >= end:
+                    continue
+                timestamps, values = self._open_segment(segment)
+                stored = timestamps[:segment['rows']]
+                lo, hi = np.searchsorted(stored, [start, end], side='left')
+                if lo == hi:
+                    continue
+                block = np.full((len(codes), hi - lo), np.nan)
+                for i, column in enumerate(columns):
+                    if column is not None and column < segment['columns']:
+                        block[i] = values[column, lo:hi]
+                stamp_parts.append(np.array(stored[lo:hi]))
+                value_parts.append(block)
+
+        if not stamp_parts:
+            return HistoryFrame(base, np.empty(0), codes, np.empty((len(codes), 0)))
+        return HistoryFrame(base, np.concatenate(stamp_parts), codes, np.concatenate(value_parts, axis=1))
+
+    def series(self, base: str, currency: str, start: Optional[float] = None,
+               end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, rates) for one base -> currency quote"""
+        frame = self.range(base, start, end, [currency])
+        return frame.timestamps, frame.values[0]
+
+    def efficiency_series(self, currency: str, start: Optional[float] = None, end: Optional[float] = None,
+                          source: str = 'CNY', target: str = 'USD') -> Tuple[np.ndarray, np.ndarray]:
+        """Efficiency score of source -> currency -> target at every stored source snapshot.
+
+        Legs follow the analyzer's lookup order: source -> currency and
+        source -> target come from the source table, currency -> target is
+        the reverse of the target table's quote taken as of the same moment.
+        """
+        source_frame = self.range(source, start, end, [currency, target])
+        target_frame = self.range(target, None, end, [currency])
+        timestamps = source_frame.timestamps
+        if not len(timestamps) or not len(target_frame.timestamps):
+            return timestamps, np.full(len(timestamps), np.nan)
+
+        # As-of join: latest target snapshot at or before each source snapshot
+        position = np.searchsorted(target_frame.timestamps, timestamps, side='right') - 1
+        to_intermediate, direct = source_frame.values
+        target_quote = np.where(position >= 0, target_frame.values[0][np.maximum(position, 0)], np.nan)
+        scores = (to_intermediate / target_quote / direct - 1) * 100
+        return timestamps, scores
+
+    def close(self):
+        with self._lock:
+            for timestamps, values in self._maps.values():
+                if timestamps.mode != 'r':
+                    timestamps.flush()
+                    values.flush()
+            self._maps.clear()
+
+
+def _file_version(path: str) -> Tuple[int, int]:
+    # os.replace gives every saved index a new inode, so this changes even within one mtime tick
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class _FileLock:
+    """Exclusive advisory lock so several processes can append safely"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+@click.command()
+@click.argument('currency')
+@click.option('--path', default=None, help='History directory (default: RATE_HISTORY_PATH)')
+@click.option('--hours', type=float, default=24.0, help='Look back this many hours')
+def main(currency, path, hours):
+    """Print the efficiency score history of CNY -> CURRENCY -> USD"""
+    from config import RATE_HISTORY_PATH
+
+    history = RateHistory(path or RATE_HISTORY_PATH)
+    timestamps, scores = history.efficiency_series(currency.upper(), start=time.time() - hours * 3600)
+    if not len(timestamps):
+        print(f"⚠️  最近 {hours:g} 小时内没有 {currency.upper()} 的历史数据")
+        return
+    for timestamp, score in zip(timestamps, scores):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}  {score:+.4f}%")
+    valid = scores[np.isfinite(scores)]
+    if len(valid):
+        print(f"共 {len(scores)} 条记录，收益率范围 {valid.min():+.4f}% ~ {valid.max():+.4f}%")
+
+
+if __name__ == '__main__':
+    main()
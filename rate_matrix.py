@@ -0,0 +1,276 @@
+"""
+向量化交叉汇率矩阵
+Vectorized Cross-Rate Matrix
+
+将批量汇率快照转换为稠密的NumPy交叉汇率矩阵，一次性计算所有中间货币路径，
+以及任意(源货币, 目标货币)组合的最佳单跳中间货币
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+from rate_parsing import rates_to_array
+
+
+class RankedPaths(NamedTuple):
+    """Column arrays for source -> intermediate -> target paths, best first"""
+    currencies: List[str]
+    source_to_intermediate: np.ndarray
+    intermediate_to_target: np.ndarray
+    total_amounts: np.ndarray
+    efficiency_scores: np.ndarray
+
+
+class BestIntermediate(NamedTuple):
+    """Best one-hop route for a single (source, target) pair"""
+    source: str
+    target: str
+    intermediate: str
+    source_to_intermediate: float
+    intermediate_to_target: float
+    direct_rate: Optional[float]
+    efficiency_score: Optional[float]
+
+    @property
+    def rate(self) -> float:
+        return self.source_to_intermediate * self.intermediate_to_target
+
+
+class BestIntermediates:
+    """Best intermediate for every (source, target) pair, precomputed.
+
+    ``intermediate[s, t]`` is the matrix index of the best currency for
+    sources[s] -> targets[t] (-1 when no route exists), ``best_rate[s, t]``
+    the product of its two legs and ``efficiency_scores[s, t]`` the gain in
+    percent over the direct rate (NaN when that is unknown). ``lookup`` is a
+    pair of dictionary lookups plus array indexing.
+    """
+
+    def __init__(self, rate_matrix: 'RateMatrix', sources: List[str], targets: List[str],
+                 intermediate: np.ndarray, best_rate: np.ndarray, direct: np.ndarray):
+        self.rate_matrix = rate_matrix
+        self.sources = sources
+        self.targets = targets
+        self.source_index = {currency: i for i, currency in enumerate(sources)}
+        self.target_index = {currency: i for i, currency in enumerate(targets)}
+        self.intermediate = intermediate
+        self.best_rate = best_rate
+        self.direct = direct
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.efficiency_scores = (best_rate / direct - 1) * 100
+
+    def lookup(self, source: str, target: str) -> Optional[BestIntermediate]:
+        """Best route for one pair, or None when the pair is unknown or has no route"""
+        s = self.source_index.get(source)
+        t = self.target_index.get(target)
+        if s is None or t is None or self.intermediate[s, t] < 0:
+            return None
+        k = int(self.intermediate[s, t])
+        matrix = self.rate_matrix
+        direct = float(self.direct[s, t])
+        score = float(self.efficiency_scores[s, t])
+        return BestIntermediate(
+            source=source,
+            target=target,
+            intermediate=matrix.currencies[k],
+            source_to_intermediate=float(matrix.matrix[matrix.index[source], k]),
+            intermediate_to_target=float(matrix.matrix[k, matrix.index[target]]),
+            direct_rate=direct if np.isfinite(direct) else None,
+            efficiency_score=score if np.isfinite(score) else None,
+        )
+
+    def best_pairs(self, limit: Optional[int] = None) -> List[BestIntermediate]:
+        """Routes for every pair with a known gain, largest gain first (round trips excluded)"""
+        same = np.array(self.sources, dtype=object)[:, np.newaxis] == np.array(self.targets, dtype=object)
+        usable = np.isfinite(self.efficiency_scores) & (self.intermediate >= 0) & ~same
+        scores = np.where(usable, self.efficiency_scores, -np.inf).ravel()
+        order = np.argsort(-scores, kind='stable')[:np.count_nonzero(np.isfinite(scores))]
+        if limit is not None:
+            order = order[:limit]
+        columns = len(self.targets)
+        return [self.lookup(self.sources[i // columns], self.targets[i % columns]) for i in order]
+
+
+class RateMatrix:
+    """Dense cross-rate matrix over a currency index.
+
+    ``matrix[i, j]`` is the amount of currency ``j`` received for one unit of
+    currency ``i``; missing pairs are NaN.
+    """
+
+    def __init__(self, currencies: List[str], matrix: np.ndarray):
+        self.currencies = currencies
+        self.index = {currency: i for i, currency in enumerate(currencies)}
+        self.matrix = matrix
+
+    @classmethod
+    def from_bulk_rates(cls, bulk_rates: Dict[str, Dict[str, float]]) -> 'RateMatrix':
+        """Build the matrix from a ``get_all_rates_bulk`` snapshot.
+
+        Lookup priority matches ``ExchangeRateAPI.get_conversion_rate_bulk``:
+        direct quotes win over reverse quotes, which win over USD triangulation.
+        """
+        currencies: List[str] = []
+        index: Dict[str, int] = {}
+        for base, rates in bulk_rates.items():
+            for currency in [base, *rates.keys()]:
+                if currency not in index:
+                    index[currency] = len(currencies)
+                    currencies.append(currency)
+
+        n = len(currencies)
+        matrix = np.full((n, n), np.nan)
+
+        # One float64 row per base, aligned to the matrix index (NaN = no usable quote)
+        bases = list(bulk_rates)
+        base_ids = np.array([index[base] for base in bases], dtype=np.intp)
+        quotes = np.empty((len(bases), n))
+        for row, rates in zip(quotes, bulk_rates.values()):
+            rates_to_array(rates, index, out=row)
+        quotes[~(np.isfinite(quotes) & (quotes > 0))] = np.nan
+
+        # Lowest priority first: triangulate every pair through the USD table
+        if 'USD' in bulk_rates:
+            usd = quotes[bases.index('USD')].copy()
+            usd[index['USD']] = 1.0
+            matrix = usd[np.newaxis, :] / usd[:, np.newaxis]
+
+        # Reverse quotes: rates[base][q] gives q -> base as 1 / rate
+        reverse = 1.0 / quotes.T
+        matrix[:, base_ids] = np.where(np.isnan(reverse), matrix[:, base_ids], reverse)
+
+        # Direct quotes override everything else
+        matrix[base_ids, :] = np.where(np.isnan(quotes), matrix[base_ids, :], quotes)
+
+        np.fill_diagonal(matrix, 1.0)
+        return cls(currencies, matrix)
+
+    def __len__(self) -> int:
+        return len(self.currencies)
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self.index
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        """Look up a single conversion rate, or None when it is unknown"""
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        value = float(self.matrix[i, j])
+        return value if np.isfinite(value) else None
+
+    def score_intermediates(self, amount: float, intermediates: Sequence[str],
+                            source: str = 'CNY', target: str = 'USD') -> Optional[RankedPaths]:
+        """Score every source -> X -> target path in a single vectorized pass, unsorted.
+
+        Intermediates without both legs are dropped. Returns None when the
+        direct source -> target rate is unknown.
+        """
+        direct_rate = self.rate(source, target)
+        if not direct_rate:
+            return None
+
+        codes = [c for c in intermediates if c in self.index and c not in (source, target)]
+        ids = np.fromiter((self.index[c] for c in codes), dtype=np.intp, count=len(codes))
+
+        to_intermediate = self.matrix[self.index[source], ids]
+        to_target = self.matrix[ids, self.index[target]]
+        valid = np.isfinite(to_intermediate) & np.isfinite(to_target)
+        valid &= (to_intermediate > 0) & (to_target > 0)
+
+        to_intermediate = to_intermediate[valid]
+        to_target = to_target[valid]
+        total_amounts = amount * to_intermediate * to_target
+        direct_amount = amount * direct_rate
+        return RankedPaths(
+            currencies=[code for code, ok in zip(codes, valid) if ok],
+            source_to_intermediate=to_intermediate,
+            intermediate_to_target=to_target,
+            total_amounts=total_amounts,
+            efficiency_scores=(total_amounts / direct_amount - 1) * 100,
+        )
+
+    def rank_intermediates(self, amount: float, intermediates: Sequence[str],
+                           source: str = 'CNY', target: str = 'USD',
+                           top_k: Optional[int] = None) -> Optional[RankedPaths]:
+        """Rank every source -> X -> target path, best first (see score_intermediates).
+
+        With ``top_k`` only the best k paths are selected and sorted.
+        """
+        scored = self.score_intermediates(amount, intermediates, source, target)
+        return None if scored is None else top_paths(scored, top_k)
+
+    def best_intermediates(self, sources: Optional[Sequence[str]] = None,
+                           targets: Optional[Sequence[str]] = None,
+                           intermediates: Optional[Sequence[str]] = None,
+                           block_elements: int = 1 << 22) -> BestIntermediates:
+        """Best one-hop intermediate for every source -> target pair at once.
+
+        A max-product over the cross-rate matrix: for each pair the best k
+        maximizes ``matrix[s, k] * matrix[k, t]``, with k never equal to s
+        or t. Sources are processed in blocks so the (sources, intermediates,
+        targets) product array stays under ``block_elements`` values. Each
+        argument defaults to every currency in the matrix; unknown codes are
+        dropped. Ties go to the earliest intermediate, as in rank_intermediates.
+        """
+        sources = [c for c in (self.currencies if sources is None else sources) if c in self.index]
+        targets = [c for c in (self.currencies if targets is None else targets) if c in self.index]
+        candidates = self.currencies if intermediates is None else intermediates
+        candidates = list(dict.fromkeys(c for c in candidates if c in self.index))
+        source_ids = np.fromiter((self.index[c] for c in sources), dtype=np.intp, count=len(sources))
+        target_ids = np.fromiter((self.index[c] for c in targets), dtype=np.intp, count=len(targets))
+        via_ids = np.fromiter((self.index[c] for c in candidates), dtype=np.intp, count=len(candidates))
+
+        # Unusable legs become 0 so they can never win the max; a best product of 0 means no route
+        with np.errstate(invalid='ignore'):
+            legs = np.where(np.isfinite(self.matrix) & (self.matrix > 0), self.matrix, 0.0)
+        second = legs[np.ix_(via_ids, target_ids)]
+        second[via_ids[:, np.newaxis] == target_ids[np.newaxis, :]] = 0.0
+
+        intermediate = np.full((len(sources), len(targets)), -1, dtype=np.intp)
+        best_rate = np.full((len(sources), len(targets)), np.nan)
+        block = max(1, block_elements // max(1, len(via_ids) * len(target_ids)))
+        for start in range(0, len(source_ids) if len(via_ids) else 0, block):
+            ids = source_ids[start:start + block]
+            first = legs[np.ix_(ids, via_ids)]
+            first[ids[:, np.newaxis] == via_ids[np.newaxis, :]] = 0.0
+            products = first[:, :, np.newaxis] * second[np.newaxis, :, :]
+            best = products.argmax(axis=1)
+            rates = np.take_along_axis(products, best[:, np.newaxis, :], axis=1)[:, 0, :]
+            found = rates > 0
+            intermediate[start:start + block] = np.where(found, via_ids[best], -1)
+            best_rate[start:start + block] = np.where(found, rates, np.nan)
+
+        direct = self.matrix[np.ix_(source_ids, target_ids)]
+        return BestIntermediates(self, sources, targets, intermediate, best_rate, direct)
+
+
+def top_paths(scored: RankedPaths, top_k: Optional[int] = None) -> RankedPaths:
+    """Sort scored paths best first, keeping only the top_k when given.
+
+    Selection partitions around the k-th best score, so only k elements are
+    fully sorted. Ties are broken by original position in both cases, so
+    ``top_paths(scored, k)`` is always the first k of ``top_paths(scored)``.
+    NaN scores sort last.
+    """
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be a positive integer")
+    scores = scored.efficiency_scores
+    keys = np.where(np.isnan(scores), np.inf, -scores)
+    if top_k is not None and top_k < len(scores):
+        kth = np.partition(keys, top_k - 1)[top_k - 1]
+        better = np.flatnonzero(keys < kth)
+        # argpartition picks arbitrary members of a tie at the boundary; take the earliest instead
+        tied = np.flatnonzero(keys == kth)[:top_k - len(better)]
+        selected = np.concatenate((better, tied))
+        order = selected[np.lexsort((selected, keys[selected]))]
+    else:
+        order = np.argsort(keys, kind='stable')
+    return RankedPaths(
+        currencies=[scored.currencies[i] for i in order],
+        source_to_intermediate=scored.source_to_intermediate[order],
+        intermediate_to_target=scored.intermediate_to_target[order],
+        total_amounts=scored.total_amounts[order],
+        efficiency_scores=scores[order],
+    )
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+汇率排行常驻服务
+Rate Ranking Service
+
+常驻HTTP服务：共享一个线程安全的汇率缓存，每个汇率快照只计算一次排行，
+之后的查询都是内存查找
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import click
+import numpy as np
+
+from config import ANALYSIS_DEADLINE_SECONDS, BASE_CURRENCY, CACHE_DURATION_MINUTES, TARGET_CURRENCY
+from currency_registry import currency_registry
+from deadline import Deadline
+from performance_monitor import perf_monitor
+from rate_matrix import BestIntermediates, RankedPaths, RateMatrix
+
+SNAPSHOT_CHECK_SECONDS = 5.0
+
+# Paths served by RankingRequestHandler; anything else is timed as 'service/unknown'
+ROUTES = frozenset({'/ranking', '/convert', '/best', '/currencies', '/health', '/metrics'})
+
+# Rankings kept per snapshot for client-chosen currency sets (least recently used dropped first)
+MAX_CACHED_RANKINGS = 64
+
+
+class RateSnapshot:
+    """One immutable bulk-rate snapshot plus the rankings computed from it"""
+
+    def __init__(self, version: int, rate_matrix: RateMatrix):
+        self.version = version
+        self.fetched_at = time.time()
+        self.rate_matrix = rate_matrix
+        self.rankings: 'OrderedDict[Optional[Tuple[str, ...]], Optional[RankedPaths]]' = OrderedDict()
+        self._best: Optional[BestIntermediates] = None
+        self.lock = threading.Lock()
+
+    def ranking(self, currencies: Optional[Tuple[str, ...]]) -> Optional[RankedPaths]:
+        """Ranking for a currency set, computed once per snapshot.
+
+        Rankings are scale-invariant, so they are stored for an amount of 1
+        and scaled per request. At most MAX_CACHED_RANKINGS currency sets are
+        kept, least recently used evicted first.
+        """
+        with self.lock:
+            if currencies in self.rankings:
+                self.rankings.move_to_end(currencies)
+                return self.rankings[currencies]
+            intermediates = currencies if currencies is not None else self.rate_matrix.currencies
+            ranked = self.rankings[currencies] = self.rate_matrix.rank_intermediates(
+                1.0, intermediates, BASE_CURRENCY, TARGET_CURRENCY
+            )
+            if len(self.rankings) > MAX_CACHED_RANKINGS:
+                self.rankings.popitem(last=False)
+            return ranked
+
+    def best_intermediates(self) -> BestIntermediates:
+        """Best intermediate for every currency pair, computed once per snapshot"""
+        with self.lock:
+            if self._best is None:
+                self._best = self.rate_matrix.best_intermediates()
+            return self._best
+
+
+class RankingService:
+    """Shared state behind the HTTP handlers"""
+
+    def __init__(self, api, ttl_seconds: float = CACHE_DURATION_MINUTES * 60,
+                 deadline_seconds: Optional[float] = None):
+        self.api = api
+        self.ttl_seconds = ttl_seconds
+        # Budget for each snapshot refresh; past it the API serves cached or partial tables
+        self.deadline_seconds = deadline_seconds
+        self._snapshot: Optional[RateSnapshot] = None
+        # The rate table objects the snapshot was built from; held so identity comparisons stay valid
+        self._source_tables: Tuple[Dict[str, float], ...] = ()
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def snapshot(self) -> Optional[RateSnapshot]:
+        """Current snapshot, re-checked against the API once the TTL has passed.
+
+        The matrix is only rebuilt when the API hands back different rate
+        table objects (the cache returns the same dicts until they are
+        re-fetched), so a check against a warm (or stale-while-revalidate)
+        cache is a few identity comparisons. While one thread rebuilds, the
+        others keep serving the previous snapshot instead of queueing on the
+        lock.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.time() - self._checked_at < self.ttl_seconds:
+            return snapshot
+
+        if not self._refresh_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            # Another thread may have refreshed while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is not None and time.time() - self._checked_at < self.ttl_seconds:
+                return snapshot
+
+            bulk_rates = self.api.get_all_rates_bulk(Deadline.after(self.deadline_seconds))
+            self._checked_at = time.time()
+            if bulk_rates:
+                source_tables = tuple(bulk_rates.values())
+                if snapshot is None or not _same_objects(source_tables, self._source_tables):
+                    version = snapshot.version + 1 if snapshot else 1
+                    self._snapshot = RateSnapshot(version, RateMatrix.from_bulk_rates(bulk_rates))
+                    self._source_tables = source_tables
+            return self._snapshot
+        finally:
+            self._refresh_lock.release()
+
+    def ranking(self, amount: float, currencies: Optional[Tuple[str, ...]], top: int) -> Optional[Dict]:
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+        ranked = snapshot.ranking(currencies)
+        direct_rate = snapshot.rate_matrix.rate(BASE_CURRENCY, TARGET_CURRENCY)
+        if ranked is None or not direct_rate:
+            return None
+
+        top = min(top, len(ranked.currencies))  # top >= 1 is checked by the handler
+        total_amounts = amount * ranked.source_to_intermediate[:top] * ranked.intermediate_to_target[:top]
+        direct_amount = amount * direct_rate
+        paths = [
+            {
+                'intermediate_currency': currency,
+                'cny_to_intermediate_rate': float(to_intermediate),
+                'intermediate_to_usd_rate': float(to_target),
+                'total_usd_amount': float(total_amount),
+                'efficiency_score': float(score),
+            }
+            for currency, to_intermediate, to_target, total_amount, score in zip(
+                ranked.currencies, ranked.source_to_intermediate, ranked.intermediate_to_target,
+                total_amounts, ranked.efficiency_scores
+            )
+        ]
+        best = paths[0] if paths else None
+        return {
+            'snapshot_version': snapshot.version,
+            'snapshot_age': time.time() - snapshot.fetched_at,
+            'cny_amount': amount,
+            'direct_usd_amount': direct_amount,
+            'best_path': best,
+            'savings': best['total_usd_amount'] - direct_amount if best else 0,
+            'total_paths': len(ranked.currencies),
+            'paths': paths,
+        }
+
+    def best(self, from_currency: str, to_currency: str, amount: float) -> Optional[Dict]:
+        snapshot = self.snapshot()
+        pair = snapshot.best_intermediates().lookup(from_currency, to_currency) if snapshot else None
+        if pair is None:
+            return None
+        return {
+            'snapshot_version': snapshot.version,
+            'from': pair.source,
+            'to': pair.target,
+            'intermediate_currency': pair.intermediate,
+            'to_intermediate_rate': pair.source_to_intermediate,
+            'intermediate_to_target_rate': pair.intermediate_to_target,
+            'amount': amount,
+            'converted_amount': amount * pair.rate,
+            'direct_amount': amount * pair.direct_rate if pair.direct_rate else None,
+            'efficiency_score': pair.efficiency_score,
+        }
+
+    def convert(self, from_currency: str, to_currency: str, amount: float) -> Optional[Dict]:
+        snapshot = self.snapshot()
+        rate = snapshot.rate_matrix.rate(from_currency, to_currency) if snapshot else None
+        if rate is None:
+            return None
+        return {'from': from_currency, 'to': to_currency, 'rate': rate,
+                'amount': amount, 'converted_amount': amount * rate}
+
+    def currencies(self) -> Optional[Dict]:
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+        return {'snapshot_version': snapshot.version,
+                'currencies': sorted(snapshot.rate_matrix.currencies)}
+
+    def health(self) -> Dict:
+        snapshot = self._snapshot
+        health = {
+            'status': 'ok' if snapshot else 'cold',
+            'snapshot_version': snapshot.version if snapshot else None,
+            'snapshot_age': time.time() - snapshot.fetched_at if snapshot else None,
+        }
+        if hasattr(self.api, 'provider_stats'):
+            health['providers'] = self.api.provider_stats()
+        return health
+
+
+class RankingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    service: RankingService  # Set on the subclass built by make_server
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        # One metric per route, so arbitrary request paths can't create unbounded metric names
+        route = url.path if url.path in ROUTES else '/unknown'
+        with perf_monitor.measure(f"service{route}"):
+            try:
+                status, body = self._dispatch(url.path, params)
+            except ValueError as e:
+                status, body = 400, {'error': str(e)}
+
+        if isinstance(body, str):
+            payload, content_type = body.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            payload, content_type = json.dumps(body, ensure_ascii=False).encode('utf-8'), 'application/json'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, path: str, params: Dict[str, str]):
+        if path == '/ranking':
+            amount = _positive_float(params.get('amount', '10000'), 'amount')
+            top = _positive_int(params.get('top', '50'), 'top')
+            currencies = None
+            if params.get('currencies'):
+                currencies = tuple(sorted(currency_registry.parse(params['currencies'])))
+            result = self.service.ranking(amount, currencies, top)
+            return (200, result) if result else (503, {'error': 'no rate snapshot available'})
+
+        if path == '/convert':
+            from_currency = params.get('from', BASE_CURRENCY).upper()
+            to_currency = params.get('to', TARGET_CURRENCY).upper()
+            amount = _positive_float(params.get('amount', '1'), 'amount')
+            result = self.service.convert(from_currency, to_currency, amount)
+            return (200, result) if result else (404, {'error': f'no rate for {from_currency}->{to_currency}'})
+
+        if path == '/best':
+            from_currency = params.get('from', BASE_CURRENCY).upper()
+            to_currency = params.get('to', TARGET_CURRENCY).upper()
+            amount = _positive_float(params.get('amount', '1'), 'amount')
+            result = self.service.best(from_currency, to_currency, amount)
+            return (200, result) if result else (404, {'error': f'no route for {from_currency}->{to_currency}'})
+
+        if path == '/currencies':
+            result = self.service.currencies()
+            return (200, result) if result else (503, {'error': 'no rate snapshot available'})
+
+        if path == '/health':
+            return 200, self.service.health()
+
+        if path == '/metrics':
+            return 200, perf_monitor.to_prometheus()
+
+        return 404, {'error': 'not found'}
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _same_objects(a: Sequence, b: Sequence) -> bool:
+    return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+
+
+def _positive_int(value: str, name: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return number
+
+
+def _positive_float(value: str, name: str) -> float:
+    number = float(value)
+    if not np.isfinite(number) or number <= 0:
+        raise ValueError(f"{name} must be a positive number")
+    return number
+
+
+def make_server(service: RankingService, host: str = '127.0.0.1', port: int = 8080) -> ThreadingHTTPServer:
+    """Build a threaded HTTP server bound to the given service"""
+    handler = type('BoundRankingRequestHandler', (RankingRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Address to bind')
+@click.option('--port', type=int, default=8080, help='Port to listen on')
+@click.option('--offline', is_flag=True, help='Serve offline demo data')
+@click.option('--deadline', type=click.FloatRange(0), default=ANALYSIS_DEADLINE_SECONDS,
+              help='Time budget in seconds for each rate refresh (0 = none)')
+def main(host, port, offline, deadline):
+    """Run the rate ranking service"""
+    if offline:
+        from offline_mode import OfflineExchangeAPI
+        api = OfflineExchangeAPI()
+    else:
+        from exchange_rate_api import ExchangeRateAPI
+        api = ExchangeRateAPI(stale_while_revalidate=True)
+
+    # Rebuilds happen only when the API's tables change, so re-check often
+    service = RankingService(api, ttl_seconds=SNAPSHOT_CHECK_SECONDS, deadline_seconds=deadline)
+    server = make_server(service, host, port)
+    print("正在预热汇率快照...")
+    service.snapshot()
+    print(f"🚀 汇率排行服务已启动: http://{host}:{server.server_address[1]}")
+    print("   接口: /ranking /best /convert /currencies /health /metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
+        api.close()
+
+
+if __name__ == '__main__':
+    main()
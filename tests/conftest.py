@@ -0,0 +1,60 @@
+"""Shared fixtures: replay provider servers and ExchangeRateAPI instances pointed at them"""
+
+import pytest
+
+from exchange_rate_api import ExchangeRateAPI
+from provider_health import ProviderSelector
+from rate_fixtures import ReplayProviderServer, fixtures_from_offline
+
+
+@pytest.fixture(scope='session')
+def offline_fixtures():
+    return fixtures_from_offline(seed=0)
+
+
+@pytest.fixture
+def replay_server(offline_fixtures):
+    """Factory for started replay servers; all are stopped at teardown"""
+    servers = []
+
+    def start(fixtures=None, **options):
+        server = ReplayProviderServer(offline_fixtures if fixtures is None else fixtures, **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def make_api():
+    """Factory for isolated ExchangeRateAPI instances (no disk cache, history or background refresh).
+
+    Providers are tried in fixed priority order unless ``adaptive`` is set.
+    """
+    apis = []
+
+    def build(api_urls, cool_down=60.0, failure_threshold=3, adaptive=False, **options):
+        options.setdefault('use_persistent_cache', False)
+        api = ExchangeRateAPI(api_urls=api_urls, stale_while_revalidate=False, record_history=False, **options)
+        api.provider_selector = ProviderSelector([p['key'] for p in api.providers],
+                                                 adaptive=adaptive, cool_down=cool_down,
+                                                 failure_threshold=failure_threshold)
+        apis.append(api)
+        return api
+
+    yield build
+    for api in apis:
+        api.close()
+
+
+@pytest.fixture
+def dead_api_urls():
+    """Provider URLs on loopback port 9, where connections are refused immediately"""
+    return {
+        'paid': 'http://127.0.0.1:9/v6/{api_key}/latest/{base}',
+        'free_v4': 'http://127.0.0.1:9/v4/latest/{base}',
+        'alternative': 'http://127.0.0.1:9/latest?base={base}',
+    }
+
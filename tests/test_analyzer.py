@@ -0,0 +1,91 @@
+"""CurrencyAnalyzer on the offline synthetic market and small hand-built ones"""
+
+import pytest
+
+from config import POPULAR_CURRENCIES
+from currency_analyzer import CurrencyAnalyzer
+from offline_mode import OfflineExchangeAPI, SyntheticMarket
+
+FAILED = {'status': 'error', 'message': 'No conversion paths available'}
+
+
+@pytest.fixture
+def analyzer():
+    return CurrencyAnalyzer(OfflineExchangeAPI(SyntheticMarket(seed=1)))
+
+
+def test_refresh_recovers_from_failed_analysis(analyzer):
+    refreshed, changes = analyzer.refresh_recommendation(FAILED, POPULAR_CURRENCIES, cny_amount=1000.0)
+
+    assert refreshed['status'] == 'success'
+    assert refreshed['cny_amount'] == 1000.0
+    assert changes == []
+
+
+def test_refresh_of_failed_analysis_needs_an_amount(analyzer):
+    with pytest.raises(ValueError):
+        analyzer.refresh_recommendation(FAILED, POPULAR_CURRENCIES)
+
+
+def test_refresh_keeps_previous_amount(analyzer):
+    analysis = analyzer.get_best_conversion_recommendation(500.0, POPULAR_CURRENCIES)
+    analyzer.api.clear_cache()
+    analyzer.reset()
+
+    refreshed, _ = analyzer.refresh_recommendation(analysis, POPULAR_CURRENCIES, cny_amount=1000.0)
+    assert refreshed['cny_amount'] == 500.0
+
+
+def test_batch_after_multi_hop_search(analyzer):
+    # find_multi_hop_paths loads the matrix without setting the direct rate
+    analyzer.find_multi_hop_paths(1000.0, POPULAR_CURRENCIES, max_hops=3)
+    result = analyzer.get_batch_recommendations([100.0, 1000.0], POPULAR_CURRENCIES)
+
+    assert result['status'] == 'success'
+    single = analyzer.get_best_conversion_recommendation(1000.0, POPULAR_CURRENCIES)
+    assert result['best_path'].intermediate_currency == single['best_path'].intermediate_currency
+    assert result['savings'][1] == pytest.approx(single['savings'])
+    assert result['savings'][0] == pytest.approx(single['savings'] / 10)
+
+
+class TiedMarketAPI:
+    """Bulk tables where many paths score exactly the same (all rates are powers of two)"""
+
+    def __init__(self, currencies):
+        self.currencies = currencies
+        self.set_quotes({code: (2.0 ** (i % 5), 1 + i % 2) for i, code in enumerate(currencies)})
+
+    def set_quotes(self, quotes):
+        # CNY -> X is ``scale``; X -> USD is ``gain / 8 / scale``, so the path yields gain/8 USD per CNY
+        self.bulk = {
+            'CNY': {'USD': 0.125, **{code: scale for code, (scale, gain) in quotes.items()}},
+            'USD': {'CNY': 8.0, **{code: scale * 8 / gain for code, (scale, gain) in quotes.items()}},
+        }
+
+    def get_all_rates_bulk(self, deadline=None):
+        return self.bulk
+
+    def get_conversion_rate(self, from_currency, to_currency, deadline=None):
+        return self.bulk[from_currency].get(to_currency)
+
+
+def test_incremental_refresh_matches_full_recompute_on_ties(capsys):
+    currencies = [f"Q{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(30)][::-1]
+    api = TiedMarketAPI(currencies)
+    analyzer = CurrencyAnalyzer(api)
+    analysis = analyzer.get_best_conversion_recommendation(1000.0, currencies)
+
+    # Rescale some legs without changing their products, and move one path between the tie groups
+    api.set_quotes({code: (2.0 ** (i % 5) * (2 if i % 3 == 0 else 1), 2 if i == 7 else 1 + i % 2)
+                    for i, code in enumerate(currencies)})
+    refreshed, _ = analyzer.refresh_recommendation(analysis, currencies)
+    assert '增量更新' in capsys.readouterr().out
+    full = CurrencyAnalyzer(api).get_best_conversion_recommendation(1000.0, currencies)
+
+    assert refreshed['all_paths'].currencies == full['all_paths'].currencies
+
+
+@pytest.mark.parametrize('use_bulk_processing', [True, False])
+def test_top_k_below_one_is_rejected_on_both_paths(analyzer, use_bulk_processing):
+    with pytest.raises(ValueError, match='top_k'):
+        analyzer.analyze_top_paths(1000.0, POPULAR_CURRENCIES, top_k=0, use_bulk_processing=use_bulk_processing)
@@ -0,0 +1,51 @@
+"""Stale-while-revalidate: stale reads return at once and schedule a single refresh"""
+
+import time
+
+from background_refresh import BackgroundRefresher
+from config import CACHE_DURATION_MINUTES
+from exchange_rate_api import ExchangeRateAPI
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stale_read_returns_immediately_and_refreshes_once(replay_server):
+    server = replay_server(latency=0.5)
+    api = ExchangeRateAPI(api_urls=server.api_urls, use_persistent_cache=False,
+                          stale_while_revalidate=True, record_history=False)
+    try:
+        stale = {'CNY': 7.0}
+        api.cache.set('USD', stale, stored_at=time.time() - CACHE_DURATION_MINUTES * 60 - 1)
+
+        start = time.perf_counter()
+        reads = [api.get_rates('USD') for _ in range(5)]
+        assert time.perf_counter() - start < 0.2
+        assert reads == [stale] * 5
+        assert api.refresher.pending() == 1
+
+        assert wait_until(lambda: api.refresher.refreshes == 1)
+        assert server.requests_served == 1
+        assert api.get_rates('USD') != stale
+        assert api.refresher.pending() == 0
+    finally:
+        api.close()
+    assert not api.refresher.running
+
+
+def test_close_drops_pending_refreshes_and_stops_the_thread():
+    refreshed = []
+    refresher = BackgroundRefresher(lambda key: refreshed.append(key) or True, lambda key: False, jitter=60.0)
+    refresher.schedule('USD')
+    assert refresher.pending() == 1
+
+    refresher.close()
+    refresher.schedule('EUR')
+
+    assert not refresher.running
+    assert refresher.pending() == 0
+    assert refreshed == []
@@ -0,0 +1,74 @@
+"""Backtest: history legs match RateMatrix, results don't depend on worker count"""
+
+import numpy as np
+import pytest
+
+from backtest import load_history_snapshots, run_backtest
+from rate_history import RateHistory
+from rate_matrix import RateMatrix
+
+CURRENCIES = ['CNY', 'USD', 'EUR', 'JPY', 'GBP', 'HKD']
+
+
+@pytest.fixture
+def history(tmp_path):
+    """Bases refresh at different times and every table misses some quotes"""
+    rng = np.random.default_rng(3)
+    value = dict(zip(CURRENCIES, [7.1, 1.0, 0.92, 150.0, 0.79, 7.8]))
+    history = RateHistory(str(tmp_path))
+    tables = []
+    for step in range(40):
+        base = CURRENCIES[rng.integers(len(CURRENCIES))] if step > 5 else CURRENCIES[step]
+        rates = {code: value[code] / value[base] * float(np.exp(rng.normal(0, 0.01)))
+                 for code in CURRENCIES if code != base and rng.random() > 0.3}
+        history.append(base, rates, timestamp=float(step))
+        tables.append((float(step), base, rates))
+    return history, tables
+
+
+def test_legs_match_rate_matrix(history):
+    history, tables = history
+    timestamps, currencies, to_intermediate, to_target, direct = load_history_snapshots(history)
+    assert sorted(currencies) == ['EUR', 'GBP', 'HKD', 'JPY']
+
+    for t, timestamp in enumerate(timestamps):
+        latest = {}
+        for stamp, base, rates in tables:
+            if stamp <= timestamp:
+                latest[base] = rates
+        matrix = RateMatrix.from_bulk_rates(latest)
+
+        def rate(a, b):
+            value = matrix.rate(a, b) if a in matrix and b in matrix else None
+            return np.nan if value is None else value
+
+        np.testing.assert_allclose(direct[t], rate('CNY', 'USD'), rtol=1e-12)
+        for i, currency in enumerate(currencies):
+            np.testing.assert_allclose(to_intermediate[t, i], rate('CNY', currency), rtol=1e-12)
+            np.testing.assert_allclose(to_target[t, i], rate(currency, 'USD'), rtol=1e-12)
+
+        ranked = matrix.rank_intermediates(1000.0, currencies)
+        single = run_backtest(currencies, to_intermediate[t:t + 1], to_target[t:t + 1], direct[t:t + 1], workers=1)
+        if ranked is None or not ranked.currencies:
+            assert single.best_counts.sum() == 0
+        else:
+            assert currencies[int(np.argmax(single.best_counts))] == ranked.currencies[0]
+
+
+def test_results_do_not_depend_on_worker_count():
+    rng = np.random.default_rng(7)
+    snapshots, n = 500, 12
+    to_intermediate = np.exp(rng.normal(0, 0.01, (snapshots, n)))
+    to_target = np.exp(rng.normal(0, 0.01, (snapshots, n)))
+    to_target[rng.random((snapshots, n)) < 0.1] = np.nan
+    direct = np.ones(snapshots)
+    currencies = [f"C{i:02d}" for i in range(n)]
+
+    serial = run_backtest(currencies, to_intermediate, to_target, direct, workers=1)
+    for workers, chunk_size in ((2, None), (3, 37)):
+        parallel = run_backtest(currencies, to_intermediate, to_target, direct,
+                                workers=workers, chunk_size=chunk_size)
+        for field in ('rank_counts', 'available', 'positive', 'efficiency_min', 'efficiency_max'):
+            np.testing.assert_array_equal(getattr(parallel, field), getattr(serial, field))
+        np.testing.assert_allclose(parallel.efficiency_sum, serial.efficiency_sum, rtol=1e-12)
+        assert [row['currency'] for row in parallel.summary()] == [row['currency'] for row in serial.summary()]
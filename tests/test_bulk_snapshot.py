@@ -0,0 +1,43 @@
+"""Single-snapshot bulk mode: every base derived from one USD table, per-base fallback"""
+
+import pytest
+
+from config import BULK_BASE_CURRENCIES
+
+
+def test_all_cross_rates_come_from_one_usd_table(replay_server, make_api, offline_fixtures):
+    server = replay_server()
+    api = make_api(server.api_urls, bulk_mode='single')
+
+    bulk_rates = api.get_all_rates_bulk()
+
+    usd = offline_fixtures['alternative']['USD']['body']['rates']
+    assert server.requests_served == 1
+    assert bulk_rates['USD'] == usd
+    assert sorted(bulk_rates) == sorted(BULK_BASE_CURRENCIES)
+    for base, rates in bulk_rates.items():
+        if base == 'USD':
+            continue
+        assert base not in rates
+        assert rates['USD'] == pytest.approx(1 / usd[base], rel=1e-12)
+        for currency, rate in rates.items():
+            if currency != 'USD':
+                assert rate == pytest.approx(usd[currency] / usd[base], rel=1e-12)
+
+    # Unchanged USD table: the same derived snapshot object is returned
+    assert api.get_all_rates_bulk() is bulk_rates
+    assert server.requests_served == 1
+
+
+def test_falls_back_to_per_base_fetches_without_usd_table(replay_server, make_api, offline_fixtures):
+    fixtures = {key: {base: entry for base, entry in bases.items() if base != 'USD'}
+                for key, bases in offline_fixtures.items()}
+    server = replay_server(fixtures, strict=True)
+    api = make_api(server.api_urls, bulk_mode='single')
+
+    bulk_rates = api.get_all_rates_bulk()
+
+    others = [base for base in BULK_BASE_CURRENCIES if base != 'USD']
+    assert sorted(bulk_rates) == sorted(others)
+    for base in others:
+        assert bulk_rates[base] == offline_fixtures['alternative'][base]['body']['rates']
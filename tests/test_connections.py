@@ -0,0 +1,18 @@
+"""HTTP keep-alive: sequential fetches reuse one pooled connection"""
+
+
+def test_sequential_fetches_reuse_the_connection(replay_server, make_api):
+    api = make_api(replay_server().api_urls, keep_alive=True)
+
+    assert api.get_rates('USD') and api.get_rates('EUR')
+
+    assert api.connection_stats() == {'opened': 1, 'reused': 1, 'requests': 2}
+
+
+def test_without_keep_alive_every_fetch_opens_a_connection(replay_server, make_api):
+    api = make_api(replay_server().api_urls, keep_alive=False)
+
+    assert api.get_rates('USD') and api.get_rates('EUR')
+
+    stats = api.connection_stats()
+    assert (stats['opened'], stats['reused']) == (2, 0)
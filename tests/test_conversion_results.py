@@ -0,0 +1,36 @@
+"""ConversionResults.sort_by: stable ties and NaN last in both directions"""
+
+import numpy as np
+import pytest
+
+from conversion_results import ConversionPath, ConversionResults
+
+NAN = float('nan')
+
+
+def results(scores):
+    return ConversionResults.from_paths(
+        ConversionPath(code, 1.0, 1.0, 1.0, score) for code, score in zip(['EUR', 'GBP', 'JPY', 'HKD', 'KRW'], scores)
+    )
+
+
+@pytest.mark.parametrize('descending, expected', [
+    (True, ['JPY', 'GBP', 'KRW', 'EUR', 'HKD']),
+    (False, ['GBP', 'KRW', 'JPY', 'EUR', 'HKD']),
+])
+def test_nan_sorts_last_and_ties_keep_order(descending, expected):
+    ranking = results([NAN, 0.5, 2.0, NAN, 0.5])
+
+    ordered = ranking.sort_by('efficiency_score', descending=descending)
+
+    assert ordered.currencies == expected
+    assert np.isnan(ordered.column('efficiency_score')[-2:]).all()
+
+
+@pytest.mark.parametrize('descending', [True, False])
+def test_currency_column_sorts_by_code(descending):
+    ranking = results([1.0, 2.0, 3.0, 4.0, 5.0])
+
+    ordered = ranking.sort_by('currency', descending=descending)
+
+    assert ordered.currencies == sorted(ranking.currencies, reverse=descending)
@@ -0,0 +1,69 @@
+"""CurrencyRegistry: stable ids, validation and unknown codes"""
+
+import threading
+
+from currency_registry import CurrencyRegistry, currency_registry
+
+
+def test_ids_are_stable_and_never_reused():
+    registry = CurrencyRegistry(['USD', 'CNY'])
+    first = registry.register(['EUR', 'USD', 'JPY', 'EUR'])
+
+    assert first.tolist() == [2, 0, 3, 2]
+    registry.register(['GBP', 'HKD'])
+    assert registry.register(['EUR', 'USD', 'JPY']).tolist() == [2, 0, 3]
+    assert registry.codes == ['USD', 'CNY', 'EUR', 'JPY', 'GBP', 'HKD']
+    assert registry.codes_of(first) == ['EUR', 'USD', 'JPY', 'EUR']
+
+
+def test_concurrent_registration_assigns_one_id_per_code():
+    registry = CurrencyRegistry()
+    codes = [f"X{i:02d}" for i in range(50)]
+    start = threading.Barrier(8)
+    results = {}
+
+    def register(offset):
+        start.wait()
+        results[offset] = registry.register(codes[offset:] + codes[:offset])
+
+    threads = [threading.Thread(target=register, args=(i * 6,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(registry) == 50
+    assert sorted(registry.ids.values()) == list(range(50))
+    for offset, ids in results.items():
+        assert registry.codes_of(ids) == codes[offset:] + codes[:offset]
+
+
+def test_unknown_codes_are_not_registered_by_lookups():
+    registry = CurrencyRegistry(['USD', 'CNY'])
+
+    assert registry.lookup(['CNY', 'XYZ', 'USD']).tolist() == [1, -1, 0]
+    assert registry.id_of('XYZ') is None
+    assert 'XYZ' not in registry
+    assert len(registry) == 2
+
+
+def test_positions_map_ids_to_another_ordering():
+    registry = CurrencyRegistry(['USD', 'CNY', 'EUR'])
+
+    positions = registry.positions(['EUR', 'JPY', 'USD'])
+
+    assert positions.tolist() == [2, -1, 0, 1]    # JPY was registered with id 3
+    assert registry.mask(['CNY']).tolist() == [False, True, False, False]
+
+
+def test_filter_valid_keeps_first_seen_order_without_duplicates():
+    requested = ['EUR', 'XYZ', 'JPY', 'EUR', 'usd', 'USD']
+
+    for available in (['USD', 'EUR', 'JPY'], {'USD', 'EUR', 'JPY'}, {'USD': 0, 'EUR': 1, 'JPY': 2},
+                      CurrencyRegistry(['USD', 'EUR', 'JPY'])):
+        assert currency_registry.filter_valid(requested, available) == ['EUR', 'JPY', 'USD']
+    assert currency_registry.filter_valid([], ['USD']) == []
+
+
+def test_parse_normalizes_user_input():
+    assert currency_registry.parse(' eur, jpy,,EUR , usd ') == ['EUR', 'JPY', 'USD']
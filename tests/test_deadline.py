@@ -0,0 +1,75 @@
+"""Deadline budgets: retries that don't fit are refused and failures keep their real kind"""
+
+import time
+
+import pytest
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ResponseError
+
+from deadline import Deadline, DeadlineRetry, deadline_scope
+
+
+def test_retry_outside_scope_behaves_like_retry():
+    retry = DeadlineRetry(total=3, backoff_factor=1)
+    assert DeadlineRetry.increment(retry, 'GET', '/x', error=NewConnectionError(None, 'refused')).total == 2
+
+
+def test_retry_refused_when_deadline_leaves_no_room():
+    retry = DeadlineRetry(total=3, backoff_factor=1)
+    error = NewConnectionError(None, 'refused')
+    with deadline_scope(Deadline(0.5), attempt_timeout=1.0):
+        with pytest.raises(MaxRetryError) as info:
+            retry.increment('GET', '/x', error=error)
+    assert info.value.reason is error
+    assert info.value.__cause__ is error
+
+
+def test_status_retry_refused_reports_deadline():
+    retry = DeadlineRetry(total=3, backoff_factor=1, status_forcelist=[503])
+    with deadline_scope(Deadline(0.1), attempt_timeout=1.0):
+        with pytest.raises(MaxRetryError) as info:
+            retry.increment('GET', '/x')
+    assert isinstance(info.value.reason, ResponseError)
+
+
+def test_refused_provider_counts_as_connection_failure(make_api, dead_api_urls):
+    api = make_api(dead_api_urls)
+    provider = api.providers[0]
+
+    start = time.monotonic()
+    assert api._fetch_from_provider(provider, 'CNY', timeout=0.5, deadline=Deadline.after(1.0)) is None
+    assert time.monotonic() - start < 1.0
+
+    health = api.provider_selector.health[provider['key']]
+    assert health.last_failure == 'connection'
+    assert health.consecutive_failures == 1
+
+
+def test_dead_providers_trip_breakers_under_deadline(make_api, dead_api_urls):
+    api = make_api(dead_api_urls, failure_threshold=2)
+    for _ in range(2):
+        assert api.get_rates('CNY', Deadline.after(1.0)) is None
+    assert {entry['state'] for entry in api.provider_stats()} == {'open'}
+
+
+def test_timeout_shortened_by_deadline_is_not_a_breaker_failure(replay_server, make_api):
+    api = make_api(replay_server(latency=2.0).api_urls)
+
+    start = time.monotonic()
+    assert api.get_rates('CNY', Deadline.after(0.6)) is None
+    assert time.monotonic() - start < 1.0
+
+    attempted = [entry for entry in api.provider_stats() if entry['last_failure'] is not None]
+    assert attempted
+    assert all(entry['last_failure'] == 'deadline' for entry in attempted)
+    assert all(entry['consecutive_failures'] == 0 for entry in attempted)
+
+
+def test_expired_deadline_serves_stale_rates(replay_server, make_api):
+    server = replay_server()
+    api = make_api(server.api_urls)
+    fresh = api.get_rates('CNY')
+
+    server.latency = 2.0
+    api.cache.ttl = 0.01
+    time.sleep(0.05)
+    assert api.get_rates('CNY', Deadline.after(0.5)) == fresh
@@ -0,0 +1,84 @@
+"""Fetch path against the local replay server: provider fallback and circuit breakers"""
+
+import time
+
+from performance_monitor import perf_monitor
+
+
+def test_fetch_returns_replayed_rates(replay_server, make_api, offline_fixtures):
+    server = replay_server()
+    api = make_api(server.api_urls)
+
+    rates = api.get_rates('CNY')
+
+    assert rates == offline_fixtures['alternative']['CNY']['body']['rates']
+    assert api.last_fetch_info['provider'] == 'Alternative API'
+    assert server.requests_served == 1
+
+
+def test_fetch_falls_back_to_next_provider(replay_server, make_api, offline_fixtures):
+    # Only the free API has fixtures; strict mode makes the alternative API answer 404
+    fixtures = {'free_v4': offline_fixtures['free_v4']}
+    api = make_api(replay_server(fixtures, strict=True).api_urls)
+
+    assert api.get_rates('CNY')
+    assert api.last_fetch_info['provider'] == 'Free API'
+    alternative = {entry['provider']: entry for entry in api.provider_stats()}['alternative']
+    assert alternative['last_failure'] == 'http'
+    assert alternative['consecutive_failures'] == 1
+
+
+def test_breaker_opens_after_threshold_and_skips_provider(replay_server, make_api, offline_fixtures):
+    fixtures = {'free_v4': offline_fixtures['free_v4']}
+    server = replay_server(fixtures, strict=True)
+    api = make_api(server.api_urls, failure_threshold=3)
+
+    for base in ('CNY', 'USD', 'EUR'):
+        assert api.get_rates(base)
+    states = {entry['provider']: entry['state'] for entry in api.provider_stats()}
+    assert states == {'alternative': 'open', 'free_v4': 'closed'}
+
+    # While open the alternative API is not contacted at all
+    served = server.requests_served
+    assert api.get_rates('GBP')
+    assert server.requests_served == served + 1
+
+
+def test_half_open_trial_failure_doubles_cool_down(replay_server, make_api, offline_fixtures):
+    fixtures = {'free_v4': offline_fixtures['free_v4']}
+    api = make_api(replay_server(fixtures, strict=True).api_urls, failure_threshold=1, cool_down=0.2)
+    health = api.provider_selector.health['alternative']
+
+    assert api.get_rates('CNY')
+    assert health.state(time.monotonic()) == 'open'
+
+    time.sleep(0.25)
+    assert health.state(time.monotonic()) == 'half-open'
+    assert api.get_rates('USD')
+    assert health.cool_down == 0.4
+    assert health.trips == 2
+
+
+def test_half_open_trial_success_closes_breaker(replay_server, make_api, offline_fixtures):
+    fixtures = {'free_v4': offline_fixtures['free_v4']}
+    server = replay_server(fixtures, strict=True)
+    api = make_api(server.api_urls, failure_threshold=1, cool_down=0.2)
+    assert api.get_rates('CNY')
+
+    # The alternative API recovers during the cool-down
+    server.fixtures = offline_fixtures
+    time.sleep(0.25)
+    assert api.get_rates('USD')
+    assert api.last_fetch_info['provider'] == 'Alternative API'
+    assert api.provider_selector.health['alternative'].state(time.monotonic()) == 'closed'
+
+
+def test_miss_and_revalidation_are_timed_separately(replay_server, make_api):
+    api = make_api(replay_server().api_urls)
+    perf_monitor.reset()
+
+    assert api.get_rates('CNY')
+    assert api._refresh_in_background('CNY')
+
+    assert perf_monitor.timings['ExchangeRateAPI.load.miss'].count == 1
+    assert perf_monitor.timings['ExchangeRateAPI.load.revalidate'].count == 1
@@ -0,0 +1,54 @@
+"""Hedged fetches against the local replay server: a slow provider and a fast one"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+HEDGE_DELAY = 0.2
+SLOW_LATENCY = 5.0
+FAST_LATENCY = 0.05
+
+
+def slow_first_server(replay_server):
+    # The alternative API is tried first and hangs; the free API answers quickly
+    return replay_server(provider_latency={'alternative': SLOW_LATENCY, 'free_v4': FAST_LATENCY})
+
+
+def test_fast_provider_wins_within_hedge_window(replay_server, make_api, offline_fixtures):
+    api = make_api(slow_first_server(replay_server).api_urls, fetch_mode='hedged', hedge_delay=HEDGE_DELAY)
+
+    started = time.monotonic()
+    rates = api.get_rates('CNY')
+    elapsed = time.monotonic() - started
+
+    assert rates == offline_fixtures['free_v4']['CNY']['body']['rates']
+    assert api.last_fetch_info['provider'] == 'Free API'
+    assert elapsed < HEDGE_DELAY + FAST_LATENCY + 0.5
+
+
+def test_abandoned_request_does_not_delay_exit():
+    script = textwrap.dedent(f"""
+        from exchange_rate_api import ExchangeRateAPI
+        from rate_fixtures import ReplayProviderServer, fixtures_from_offline
+
+        server = ReplayProviderServer(fixtures_from_offline(0), provider_latency={{
+            'alternative': {SLOW_LATENCY}, 'free_v4': {FAST_LATENCY}}}).start()
+        api = ExchangeRateAPI(api_urls=server.api_urls, fetch_mode='hedged', hedge_delay={HEDGE_DELAY},
+                              use_persistent_cache=False, stale_while_revalidate=False,
+                              record_history=False)
+        api.provider_selector.adaptive = False
+        assert api.get_rates('CNY')
+        print(api.last_fetch_info['provider'])
+    """)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.monotonic()
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True,
+                            timeout=SLOW_LATENCY * 3)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith('Free API')
+    # The losing request is still sleeping on the server; exit must not wait for it
+    assert time.monotonic() - started < SLOW_LATENCY
@@ -0,0 +1,138 @@
+"""Fetch leases on the shared on-disk cache, against the local replay server"""
+
+import threading
+import time
+
+import pytest
+
+from config import REQUEST_TIMEOUT_SECONDS
+from deadline import Deadline
+from rate_cache import PersistentRateCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'rates.db')
+
+
+def shared_api(make_api, server, cache_path):
+    api = make_api(server.api_urls)
+    api.persistent_cache = PersistentRateCache(cache_path)
+    return api
+
+
+def run_concurrently(*calls):
+    results = [None] * len(calls)
+
+    def run(i, call):
+        results[i] = call()
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_lease_is_exclusive_between_threads_of_one_instance(cache_path):
+    cache = PersistentRateCache(cache_path)
+
+    assert cache.acquire_fetch_lease('USD', 60)
+    assert not run_concurrently(lambda: cache.acquire_fetch_lease('USD', 60))[0]
+
+    cache.release_fetch_lease('USD')
+    assert run_concurrently(lambda: cache.acquire_fetch_lease('USD', 60))[0]
+
+
+def test_threads_sharing_a_cache_fetch_once(replay_server, make_api, cache_path):
+    server = replay_server(latency=0.5)
+    api = shared_api(make_api, server, cache_path)
+
+    # Bypass the memory cache's single-flight: the lease alone must keep the second thread off the network
+    results = run_concurrently(lambda: api._get_rates_shared('USD'), lambda: api._get_rates_shared('USD'))
+
+    assert results[0] and results[1]
+    assert results[0][0] == results[1][0]
+    assert server.requests_served == 1
+
+
+def test_instances_sharing_a_cache_file_fetch_once(replay_server, make_api, cache_path):
+    server = replay_server(latency=0.5)
+    first, second = shared_api(make_api, server, cache_path), shared_api(make_api, server, cache_path)
+
+    results = run_concurrently(lambda: first.get_rates('USD'), lambda: second.get_rates('USD'))
+
+    assert results[0] and results[0] == results[1]
+    assert server.requests_served == 1
+
+
+def test_background_revalidation_waits_for_the_lease_holder(replay_server, make_api, cache_path, offline_fixtures):
+    server = replay_server()
+    api = shared_api(make_api, server, cache_path)
+    other = PersistentRateCache(cache_path)
+    rates = offline_fixtures['alternative']['USD']['body']['rates']
+    assert other.acquire_fetch_lease('USD', 60)
+
+    def finish_other_fetch():
+        time.sleep(0.3)
+        other.put('USD', 'Alternative API', rates)
+        other.release_fetch_lease('USD')
+
+    holder = threading.Thread(target=finish_other_fetch)
+    holder.start()
+    assert api._refresh_in_background('USD')
+    holder.join()
+
+    assert api.cache.get('USD') == rates
+    assert server.requests_served == 0
+
+
+def test_lease_outlives_a_slow_fetch(make_api, dead_api_urls):
+    api = make_api(dead_api_urls)
+    retry = api.adapter.max_retries
+
+    # Every provider may use every attempt at the full request timeout
+    assert api._max_fetch_seconds() >= len(api.providers) * (retry.total + 1) * REQUEST_TIMEOUT_SECONDS
+
+
+def test_clear_cache_refetches_without_wiping_the_shared_cache(replay_server, make_api, cache_path):
+    server = replay_server()
+    api = shared_api(make_api, server, cache_path)
+    other = shared_api(make_api, server, cache_path)
+    assert api.get_rates('USD')
+
+    api.clear_cache()
+
+    # The snapshot is still there for everyone else...
+    assert api.persistent_cache.get('USD', 3600) is not None
+    assert other.get_rates('USD')
+    assert server.requests_served == 1
+    # ...but this process fetches fresh rates
+    assert api.get_rates('USD')
+    assert server.requests_served == 2
+
+
+def test_waiter_serves_stale_snapshot_when_the_holder_outlasts_its_deadline(
+        replay_server, make_api, cache_path, offline_fixtures):
+    server = replay_server()
+    api = shared_api(make_api, server, cache_path)
+    other = PersistentRateCache(cache_path)
+    rates = offline_fixtures['alternative']['USD']['body']['rates']
+    other.put('USD', 'Alternative API', rates, fetched_at=time.time() - 10 * 60)  # Expired, within MAX_STALENESS
+    assert other.acquire_fetch_lease('USD', 60)
+
+    assert api.get_rates('USD', Deadline.after(0.5)) == rates
+    assert server.requests_served == 0
+
+
+def test_waiter_takes_over_when_the_holder_gives_up(replay_server, make_api, cache_path):
+    server = replay_server()
+    api = shared_api(make_api, server, cache_path)
+    other = PersistentRateCache(cache_path)
+    assert other.acquire_fetch_lease('USD', 60)
+    threading.Timer(0.3, other.release_fetch_lease, args=('USD',)).start()
+
+    assert api.get_rates('USD')
+    assert server.requests_served == 1
+    assert not api.persistent_cache.lease_active('USD')
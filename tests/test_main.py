@@ -0,0 +1,39 @@
+"""CLI behaviour that scripted (--batch) runs rely on"""
+
+import pytest
+from click.testing import CliRunner
+
+import main
+
+
+class DownProbe:
+    def result(self):
+        return False
+
+
+@pytest.fixture
+def network_down(monkeypatch):
+    probes = []
+
+    def start(use_cache=True):
+        probes.append(use_cache)
+        return DownProbe()
+
+    monkeypatch.setattr(main, 'start_network_probe', start)
+    return probes
+
+
+def test_batch_without_network_fails_instead_of_using_demo_rates(network_down):
+    result = CliRunner().invoke(main.main, ['--batch', '--popular', '--amount', '1000'])
+
+    assert result.exit_code == 1
+    assert '离线演示模式' not in result.output
+    # The cached negative result was re-checked before giving up
+    assert network_down == [True, False]
+
+
+def test_batch_with_explicit_offline_runs(network_down):
+    result = CliRunner().invoke(main.main, ['--batch', '--offline', '--popular', '--amount', '1000'])
+
+    assert result.exit_code == 0, result.output
+    assert network_down == []
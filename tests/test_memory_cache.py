@@ -0,0 +1,64 @@
+"""TTLCache: expiry, LRU eviction order and the byte bound"""
+
+from memory_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl_but_stay_available_stale():
+    clock = FakeClock()
+    cache = TTLCache(ttl=60, clock=clock)
+    cache.set('USD', {'CNY': 7.1})
+
+    clock.now += 59.9
+    assert cache.get('USD') == {'CNY': 7.1}
+    clock.now += 0.1
+    assert cache.get('USD') is None
+    assert cache.get('USD', max_age=120) == {'CNY': 7.1}
+    assert cache.age('USD') == 60.0
+
+
+def test_stored_at_sets_the_entry_age():
+    clock = FakeClock()
+    cache = TTLCache(ttl=60, clock=clock)
+    cache.set('USD', 1, stored_at=clock.now - 61)
+
+    assert cache.get('USD') is None
+    assert cache.get_or_load('USD', lambda: (2, clock.now)) == 2
+    assert cache.stats.misses == 1
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = TTLCache(ttl=60, max_entries=3, clock=FakeClock())
+    for key in 'abc':
+        cache.set(key, key)
+    assert cache.get('a') == 'a'     # 'b' is now least recently used
+
+    cache.set('d', 'd')
+    assert 'b' not in cache
+    cache.set('e', 'e')
+    assert 'c' not in cache
+    assert [key for key in 'ade' if key in cache] == ['a', 'd', 'e']
+    assert cache.stats.evictions == 2
+
+
+def test_max_bytes_bounds_the_total_size():
+    cache = TTLCache(ttl=60, max_bytes=100, sizeof=len, clock=FakeClock())
+    cache.set('a', 'x' * 40)
+    cache.set('b', 'x' * 40)
+    cache.set('c', 'x' * 40)
+
+    assert 'a' not in cache and len(cache) == 2
+    assert cache.total_bytes == 80
+
+    # Replacing an entry frees its old size; one oversized entry is still kept on its own
+    cache.set('b', 'x' * 10)
+    assert cache.total_bytes == 50
+    cache.set('big', 'x' * 150)
+    assert len(cache) == 1 and cache.total_bytes == 150
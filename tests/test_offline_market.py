@@ -0,0 +1,45 @@
+"""SyntheticMarket: tables are a pure function of (seed, epoch, base)"""
+
+import numpy as np
+import pytest
+
+from offline_mode import OfflineExchangeAPI, SyntheticMarket
+
+
+@pytest.mark.parametrize('noise', ['uniform', 'normal', 'student_t'])
+def test_same_seed_gives_identical_rates(noise):
+    first = SyntheticMarket(size=200, seed=42, noise=noise)
+    second = SyntheticMarket(size=200, seed=42, noise=noise)
+
+    for epoch in (0, 3):
+        for base in ('USD', 'CNY', first.currencies[-1]):
+            np.testing.assert_array_equal(first.rate_array(base, epoch), second.rate_array(base, epoch))
+    assert first.rates('EUR') == second.rates('EUR')
+
+
+def test_different_seed_gives_different_rates():
+    first = SyntheticMarket(size=200, seed=1)
+    second = SyntheticMarket(size=200, seed=2)
+
+    assert first.currencies == second.currencies
+    assert not np.allclose(first.anchors, second.anchors)
+    for base in ('USD', 'CNY'):
+        assert not np.allclose(first.rate_array(base), second.rate_array(base))
+
+
+def test_epochs_can_be_regenerated_in_any_order():
+    market = SyntheticMarket(seed=7)
+    later = market.rate_array('CNY', epoch=5)
+
+    market.advance(5)
+
+    np.testing.assert_array_equal(market.rate_array('CNY'), later)
+    assert not np.allclose(market.rate_array('CNY', epoch=0), later)
+
+
+def test_unsupported_conversion_rate_is_none():
+    api = OfflineExchangeAPI(SyntheticMarket(seed=0))
+
+    assert api.get_conversion_rate('CNY', 'CNY') == 1.0
+    assert api.get_conversion_rate('CNY', 'USD') > 0
+    assert api.get_conversion_rate('CNY', 'XYZ') is None
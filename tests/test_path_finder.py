@@ -0,0 +1,81 @@
+"""Multi-hop route search against brute-force enumeration on small matrices"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from path_finder import find_best_paths
+from rate_matrix import RateMatrix
+
+
+def random_matrix(n, seed, missing=0.0):
+    rng = np.random.default_rng(seed)
+    matrix = np.exp(rng.normal(0, 0.05, (n, n)))
+    matrix[rng.random((n, n)) < missing] = np.nan
+    np.fill_diagonal(matrix, 1.0)
+    matrix[0, 1] = 1.0  # The direct rate must exist
+    return RateMatrix([f"C{i:02d}" for i in range(n)], matrix)
+
+
+def brute_force(rate_matrix, max_hops):
+    """Every simple C00 -> ... -> C01 route with 2 to max_hops conversions, best first"""
+    matrix = rate_matrix.matrix
+    routes = []
+    for length in range(1, max_hops):
+        for middle in itertools.permutations(range(2, len(rate_matrix)), length):
+            route = [0, *middle, 1]
+            rate = float(np.prod([matrix[a, b] for a, b in zip(route, route[1:])]))
+            if np.isfinite(rate):
+                routes.append((rate, [rate_matrix.currencies[i] for i in route]))
+    return sorted(routes, key=lambda item: item[0], reverse=True)
+
+
+@pytest.mark.parametrize('n, max_hops, top_ns, seeds', [
+    (7, 5, (1, 2, 3), range(60)),
+    (10, 4, (1, 5), range(30)),
+    (8, 4, (15,), range(10)),
+])
+def test_matches_brute_force(n, max_hops, top_ns, seeds):
+    for seed in seeds:
+        rate_matrix = random_matrix(n, seed, missing=0.15)
+        expected = brute_force(rate_matrix, max_hops)
+        for top_n in top_ns:
+            paths = find_best_paths(rate_matrix, 1.0, 'C00', 'C01', max_hops=max_hops, top_n=top_n)
+            assert [p.currencies for p in paths] == [route for _, route in expected[:top_n]], (seed, top_n)
+            assert [p.total_rate for p in paths] == pytest.approx([rate for rate, _ in expected[:top_n]])
+
+
+def test_returns_top_n_simple_routes_when_the_best_layers_revisit():
+    # A strong C02 <-> C03 cycle makes the best 3-hop walks revisit currencies
+    rate_matrix = random_matrix(6, seed=0)
+    rate_matrix.matrix[2, 3] = rate_matrix.matrix[3, 2] = 5.0
+
+    paths = find_best_paths(rate_matrix, 1.0, 'C00', 'C01', max_hops=4, top_n=30)
+
+    assert len(paths) == 30
+    assert all(len(set(p.currencies)) == len(p.currencies) for p in paths)
+
+
+def test_keeps_unit_rate_hops():
+    rate_matrix = random_matrix(6, seed=1)
+    # A 1:1 peg between C02 and C05 is a real conversion, not a self-loop
+    matrix = rate_matrix.matrix
+    matrix[2, 5] = 1.0
+    matrix[0, 2] = matrix[5, 1] = 1.5
+
+    paths = find_best_paths(rate_matrix, 1.0, 'C00', 'C01', max_hops=3, top_n=1)
+
+    assert paths[0].currencies == ['C00', 'C02', 'C05', 'C01']
+
+
+def test_arbitrage_free_matrix_does_not_enumerate_every_route():
+    # Every route ties up to rounding; pruning ties keeps this fast instead of exponential
+    rng = np.random.default_rng(0)
+    values = np.exp(rng.normal(0, 2, 120))
+    rate_matrix = RateMatrix([f"C{i:03d}" for i in range(120)], values[np.newaxis, :] / values[:, np.newaxis])
+
+    paths = find_best_paths(rate_matrix, 1.0, 'C000', 'C001', max_hops=6, top_n=20)
+
+    assert len(paths) == 20
+    assert all(p.efficiency_score == pytest.approx(0, abs=1e-9) for p in paths)
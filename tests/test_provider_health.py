@@ -0,0 +1,56 @@
+"""Provider scoring and circuit breaker accounting"""
+
+import time
+
+import pytest
+
+from provider_health import ProviderHealth, ProviderSelector
+
+
+def test_fast_failing_provider_sorts_after_slow_healthy_one():
+    selector = ProviderSelector(['refusing', 'healthy'], failure_threshold=100, failure_cost=20.0)
+    for _ in range(5):
+        selector.record_failure('refusing', 'connection', 0.004)
+        selector.record_success('healthy', 0.3)
+
+    assert selector.order(['refusing', 'healthy']) == ['healthy', 'refusing']
+    assert selector.health['healthy'].expected_latency() == pytest.approx(0.3)
+
+
+def test_expected_latency_charges_failures_their_fallback_cost():
+    health = ProviderHealth('flaky', failure_threshold=100, failure_cost=10.0)
+    health.record_success(0.2)
+    health.record_failure('timeout', 0.2, time.monotonic())
+    # Two attempts per success, each 0.2 s plus half a fallback
+    assert health.expected_latency() == pytest.approx(2 * (0.2 + 0.5 * 10.0))
+
+
+def test_invalid_responses_trip_the_breaker():
+    health = ProviderHealth('garbage', failure_threshold=3)
+    for _ in range(3):
+        health.record_failure('invalid', 0.01, time.monotonic())
+    assert health.state(time.monotonic()) == 'open'
+
+
+def test_deadline_failures_do_not_trip_the_breaker():
+    health = ProviderHealth('slow', failure_threshold=3)
+    for _ in range(5):
+        health.record_failure('deadline', 0.5, time.monotonic())
+    assert health.state(time.monotonic()) == 'closed'
+    assert health.consecutive_failures == 0
+    assert health.success_rate == 0
+
+
+def test_adaptive_order_prefers_working_provider(replay_server, make_api, offline_fixtures):
+    # The alternative API answers instantly but always with an unusable table
+    fixtures = {key: dict(bases) for key, bases in offline_fixtures.items()}
+    fixtures['alternative'] = {base: {'status': 200, 'body': {'success': True, 'rates': {}}}
+                               for base in offline_fixtures['alternative']}
+    api = make_api(replay_server(fixtures, strict=True, provider_latency={'free_v4': 0.05}).api_urls,
+                   adaptive=True, failure_threshold=100)
+
+    for base in ('CNY', 'USD', 'EUR'):
+        assert api.get_rates(base)
+    assert api.last_fetch_info['provider'] == 'Free API'
+    stats = {entry['provider']: entry for entry in api.provider_stats()}
+    assert stats['free_v4']['expected_latency'] < stats['alternative']['expected_latency']
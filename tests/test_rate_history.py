@@ -0,0 +1,91 @@
+"""RateHistory: append and reload, concurrent writers and segment rollover"""
+
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from rate_history import COLUMN_HEADROOM, RateHistory
+
+
+def append_many(path, count):
+    history = RateHistory(path)
+    for i in range(count):
+        history.append('USD', {'CNY': 7.0 + i, 'EUR': 0.9})
+    history.close()
+
+
+def test_append_and_reload(tmp_path):
+    history = RateHistory(str(tmp_path))
+    history.append('USD', {'CNY': 7.1, 'EUR': 0.91}, timestamp=100.0)
+    history.append('USD', {'CNY': 7.2, 'GBP': 0.78}, timestamp=200.0)
+    history.append('EUR', {'USD': 1.1}, timestamp=150.0)
+    history.close()
+
+    reloaded = RateHistory(str(tmp_path))
+    frame = reloaded.range('USD', currencies=['CNY', 'EUR', 'GBP', 'XYZ'])
+
+    assert reloaded.bases() == ['EUR', 'USD']
+    assert list(frame.timestamps) == [100.0, 200.0]
+    np.testing.assert_array_equal(frame.values, [[7.1, 7.2], [0.91, np.nan], [np.nan, 0.78], [np.nan, np.nan]])
+    assert list(reloaded.range('USD', start=150.0).timestamps) == [200.0]
+
+
+def test_explicit_timestamps_must_not_go_backwards(tmp_path):
+    history = RateHistory(str(tmp_path))
+    history.append('USD', {'CNY': 7.1}, timestamp=200.0)
+
+    with pytest.raises(ValueError):
+        history.append('USD', {'CNY': 7.2}, timestamp=100.0)
+
+
+def test_concurrent_threads_append_in_timestamp_order(tmp_path):
+    history = RateHistory(str(tmp_path))
+    start = threading.Barrier(8)
+
+    def writer():
+        start.wait()
+        for _ in range(25):
+            history.append('USD', {'CNY': 7.0})
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    timestamps = history.range('USD').timestamps
+    assert len(timestamps) == 200
+    assert np.all(np.diff(timestamps) >= 0)
+
+
+def test_concurrent_processes_append(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=append_many, args=(str(tmp_path), 30)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+    timestamps = RateHistory(str(tmp_path)).range('USD').timestamps
+    assert len(timestamps) == 90
+    assert np.all(np.diff(timestamps) >= 0)
+
+
+def test_segments_roll_over_on_rows_and_columns(tmp_path):
+    history = RateHistory(str(tmp_path), segment_rows=4)
+    for i in range(10):
+        history.append('USD', {'CNY': float(i)}, timestamp=float(i))
+    assert len(history.segments) == 3
+
+    # More new currencies than the spare columns force another segment
+    wide = {f"Z{chr(65 + i // 26)}{chr(65 + i % 26)}": 1.0 for i in range(COLUMN_HEADROOM + 1)}
+    history.append('USD', {'CNY': 10.0, **wide}, timestamp=10.0)
+    assert len(history.segments) == 4
+
+    frame = RateHistory(str(tmp_path), segment_rows=4).range('USD', currencies=['CNY', 'ZAA'])
+    assert list(frame.timestamps) == [float(i) for i in range(11)]
+    assert list(frame.values[0]) == [float(i) for i in range(11)]
+    assert np.isnan(frame.values[1][:10]).all() and frame.values[1][10] == 1.0
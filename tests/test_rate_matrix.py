@@ -0,0 +1,89 @@
+"""RateMatrix construction and ranking"""
+
+import numpy as np
+import pytest
+
+from rate_matrix import RankedPaths, RateMatrix, top_paths
+
+
+def test_from_bulk_rates_prefers_direct_then_reverse_then_usd():
+    bulk_rates = {
+        'USD': {'EUR': 0.5, 'GBP': 0.25, 'JPY': 100.0},
+        'EUR': {'USD': 2.1, 'JPY': 201.0, 'BAD': float('nan')},
+    }
+    matrix = RateMatrix.from_bulk_rates(bulk_rates)
+
+    assert matrix.rate('EUR', 'USD') == 2.1             # Direct beats reverse of USD's quote
+    assert matrix.rate('JPY', 'EUR') == 1 / 201.0       # Reverse beats USD triangulation
+    assert matrix.rate('GBP', 'JPY') == 100.0 / 0.25    # Triangulated through USD
+    assert matrix.rate('EUR', 'EUR') == 1.0
+    assert matrix.rate('EUR', 'BAD') is None
+
+
+def ranked(scores):
+    scores = np.asarray(scores, dtype=float)
+    ones = np.ones_like(scores)
+    return RankedPaths([f"C{i:03d}" for i in range(len(scores))], ones, ones, ones, scores)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_top_k_is_a_prefix_of_the_full_ranking_despite_ties(seed):
+    rng = np.random.default_rng(seed)
+    scores = rng.integers(-3, 4, size=60).astype(float)
+    scores[rng.random(60) < 0.1] = np.nan
+    full = top_paths(ranked(scores))
+
+    for k in (1, 5, 17, 30, 59):
+        assert top_paths(ranked(scores), k).currencies == full.currencies[:k]
+
+
+def test_ties_keep_original_order():
+    assert top_paths(ranked([1.0, 2.0, 1.0, 2.0, 1.0]), 3).currencies == ['C001', 'C003', 'C000']
+
+
+def best_by_loops(matrix, sources, targets, intermediates):
+    """Reference max-product: earliest intermediate wins ties, unusable legs never win"""
+    index = matrix.index
+    intermediate = np.full((len(sources), len(targets)), -1)
+    best_rate = np.full((len(sources), len(targets)), np.nan)
+    for s, source in enumerate(sources):
+        for t, target in enumerate(targets):
+            for via in intermediates:
+                if via in (source, target):
+                    continue
+                first = matrix.matrix[index[source], index[via]]
+                second = matrix.matrix[index[via], index[target]]
+                if not (first > 0 and second > 0 and np.isfinite(first) and np.isfinite(second)):
+                    continue
+                if intermediate[s, t] < 0 or first * second > best_rate[s, t]:
+                    intermediate[s, t] = index[via]
+                    best_rate[s, t] = first * second
+    return intermediate, best_rate
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_best_intermediates_matches_triple_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = 9
+    # Few distinct values so ties are common; NaN and 0 quotes must never be chosen
+    values = rng.choice([0.5, 1.0, 2.0, 4.0, 0.0, np.nan], size=(n, n), p=[0.25, 0.2, 0.2, 0.15, 0.1, 0.1])
+    matrix = RateMatrix([f"C{i}" for i in range(n)], values)
+    sources = list(rng.permutation(matrix.currencies)[:6])
+    targets = list(rng.permutation(matrix.currencies)[:7])
+    intermediates = list(rng.permutation(matrix.currencies)[:8])
+
+    best = matrix.best_intermediates(sources, targets, intermediates, block_elements=40)
+    intermediate, best_rate = best_by_loops(matrix, sources, targets, intermediates)
+
+    np.testing.assert_array_equal(best.intermediate, intermediate)
+    np.testing.assert_array_equal(best.best_rate, best_rate)
+
+
+@pytest.mark.parametrize('top_k', [0, -1])
+def test_top_k_below_one_is_rejected(top_k):
+    with pytest.raises(ValueError, match='top_k'):
+        top_paths(ranked([1.0, 2.0]), top_k)
+
+
+def test_top_k_at_least_the_path_count_keeps_everything():
+    assert top_paths(ranked([1.0, 3.0, 2.0]), 5).currencies == ['C001', 'C002', 'C000']
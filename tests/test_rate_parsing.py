@@ -0,0 +1,72 @@
+"""Rate table validation: unusable entries are dropped, bad tables rejected"""
+
+import json
+
+import pytest
+
+from rate_parsing import MIN_QUOTES, RateParseError, parse_rates, validate_rates
+
+
+@pytest.fixture
+def clean():
+    codes = ['USD', 'CNY', 'EUR', 'GBP', 'JPY', 'HKD', 'KRW', 'AUD', 'CAD', 'CHF', 'SGD', 'NZD']
+    return {code: 1.0 + i for i, code in enumerate(codes)}
+
+
+def test_clean_table_is_returned_without_copying(clean):
+    assert validate_rates(clean) is clean
+
+
+@pytest.mark.parametrize('code, value', [
+    ('XAU', 'n/a'),            # Non-numeric
+    ('XAU', None),
+    ('XAU', True),             # bool is not a rate
+    ('XAU', -1.5),             # Negative
+    ('XAU', 0),
+    ('XAU', float('nan')),
+    ('XAU', float('inf')),
+    ('XA', 1.0),               # Wrong-length codes
+    ('XAUU', 1.0),
+    ('xau', 1.0),
+    ('X1U', 1.0),
+    ('ÄÖÜ', 1.0),              # Upper-case letters, but not ASCII
+    (123, 1.0),
+])
+def test_unusable_entries_are_dropped(clean, code, value):
+    rates = dict(clean)
+    rates[code] = value
+
+    usable = validate_rates(rates)
+
+    assert usable == clean
+    assert usable is not rates
+
+
+def test_too_few_quotes_are_rejected(clean):
+    rates = dict(list(clean.items())[:MIN_QUOTES - 1])
+    rates['XAU'] = float('nan')
+
+    with pytest.raises(RateParseError, match='usable quotes'):
+        validate_rates(rates)
+
+
+def test_base_quote_must_be_one(clean):
+    assert validate_rates(clean, base='USD') is clean
+    with pytest.raises(RateParseError, match='base CNY'):
+        validate_rates(clean, base='CNY')
+
+
+@pytest.mark.parametrize('rates', [None, [], 'rates'])
+def test_non_object_rates_are_rejected(rates):
+    with pytest.raises(RateParseError):
+        validate_rates(rates)
+
+
+def test_parse_rates_checks_the_response(clean):
+    body = json.dumps({'result': 'success', 'rates': clean}).encode()
+
+    assert parse_rates(body, 'rates', lambda data: data['result'] == 'success', base='USD') == clean
+    with pytest.raises(RateParseError, match='provider error'):
+        parse_rates(body, 'rates', lambda data: False)
+    with pytest.raises(RateParseError, match='invalid JSON'):
+        parse_rates(b'{', 'rates')
@@ -0,0 +1,92 @@
+"""RankingService snapshots and the HTTP handler, on the offline synthetic market"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import service
+from offline_mode import OfflineExchangeAPI, SyntheticMarket
+from performance_monitor import perf_monitor
+from service import RankingService, make_server
+
+
+@pytest.fixture
+def ranking_service():
+    return RankingService(OfflineExchangeAPI(SyntheticMarket(seed=2)), ttl_seconds=0)
+
+
+@pytest.fixture
+def base_url(ranking_service):
+    server = make_server(ranking_service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_unchanged_tables_keep_the_snapshot(ranking_service):
+    first = ranking_service.snapshot()
+
+    assert ranking_service.snapshot() is first
+
+
+def test_refetched_tables_bump_the_version(ranking_service):
+    first = ranking_service.snapshot()
+    for _ in range(5):
+        # New dicts may land at the addresses of the evicted ones; they must still count as new
+        ranking_service.api.clear_cache()
+        snapshot = ranking_service.snapshot()
+        assert snapshot is not first
+        first = snapshot
+
+    assert snapshot.version == 6
+
+
+@pytest.mark.parametrize('top', ['0', '-3', 'many'])
+def test_ranking_rejects_bad_top(base_url, top):
+    status, body = get(f"{base_url}/ranking?top={top}")
+
+    assert status == 400
+    assert 'error' in body
+
+
+def test_ranking_honours_top(base_url):
+    status, body = get(f"{base_url}/ranking?amount=1000&top=3")
+
+    assert status == 200
+    assert len(body['paths']) == 3
+    assert body['best_path'] == body['paths'][0]
+
+
+def test_cached_rankings_are_bounded(ranking_service, monkeypatch):
+    monkeypatch.setattr(service, 'MAX_CACHED_RANKINGS', 4)
+    snapshot = ranking_service.snapshot()
+    currencies = [c for c in snapshot.rate_matrix.currencies if c not in ('CNY', 'USD')]
+    keys = [tuple(sorted(currencies[i:i + 3])) for i in range(10)]
+
+    for key in keys:
+        snapshot.ranking(key)
+    snapshot.ranking(keys[6])  # Recently used, so it outlives keys[7]
+    snapshot.ranking(keys[0])
+
+    assert list(snapshot.rankings) == [keys[8], keys[9], keys[6], keys[0]]
+
+
+def test_unknown_paths_share_one_metric(base_url):
+    for path in ('/nope', '/also-nope', '/ranking/extra'):
+        assert get(f"{base_url}{path}")[0] == 404
+
+    assert 'service/unknown' in perf_monitor.timings
+    assert not any(name.startswith('service/nope') for name in perf_monitor.timings)
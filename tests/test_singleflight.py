@@ -0,0 +1,84 @@
+"""SingleFlight: concurrent callers share one call and its result or error"""
+
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def run_callers(flight, fn):
+    """Start CALLERS threads at once; fn runs until every other caller is waiting"""
+    barrier = threading.Barrier(CALLERS)
+    outcomes = [None] * CALLERS
+
+    def blocking_fn():
+        deadline = time.monotonic() + 5
+        while flight.coalesced < CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return fn()
+
+    def caller(i):
+        barrier.wait()
+        try:
+            outcomes[i] = ('ok', flight.do('USD', blocking_fn))
+        except Exception as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+def test_concurrent_misses_fetch_once():
+    flight = SingleFlight()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return {'CNY': 7.1}
+
+    outcomes = run_callers(flight, fetch)
+
+    assert len(fetches) == 1
+    assert [status for status, _ in outcomes] == ['ok'] * CALLERS
+    assert [result for _, (result, _) in outcomes] == [{'CNY': 7.1}] * CALLERS
+    assert sorted(shared for _, (_, shared) in outcomes) == [False] + [True] * (CALLERS - 1)
+    assert flight.executions == 1 and flight.coalesced == CALLERS - 1
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    error = RuntimeError('provider down')
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        raise error
+
+    outcomes = run_callers(flight, fetch)
+
+    assert len(fetches) == 1
+    assert outcomes == [('error', error)] * CALLERS
+
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_key_is_released_after_the_call(fails):
+    flight = SingleFlight()
+
+    def fetch():
+        if fails:
+            raise RuntimeError('provider down')
+        return 1
+
+    run_callers(flight, fetch)
+
+    assert flight.in_flight() == 0
+    assert flight.do('USD', lambda: 2) == (2, False)
+    assert flight.executions == 2
@@ -1,10 +1,16 @@
-from typing import List
+import heapq
+import time
+from typing import Iterable, List, Sequence, Tuple
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
 from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
-from currency_analyzer import ConversionPath
+from currency_analyzer import ConversionPath, RankChange, RunningStats
+from path_finder import MultiHopPath
+from rate_matrix import BestIntermediates
+from performance_monitor import perf_monitor
 
 console = Console()
 
@@ -44,7 +50,12 @@ def format_percentage(percentage: float) -> str:
     else:
         return f"{percentage:.4f}%"
 
-def display_conversion_analysis(analysis: dict):
+def display_conversion_analysis(analysis: dict, metric: str = 'display.analysis'):
+    """Display the conversion analysis, timed under ``metric`` (one name per call site)"""
+    with perf_monitor.measure(metric):
+        _render_conversion_analysis(analysis)
+
+def _render_conversion_analysis(analysis: dict):
     """Display the conversion analysis in a formatted table"""
     if analysis['status'] != 'success':
         console.print(f"[red]Error: {analysis['message']}[/red]")
@@ -60,6 +71,8 @@ def display_conversion_analysis(analysis: dict):
     console.print(f"[bold blue]汇率兑换分析报告 (Exchange Rate Analysis)[/bold blue]")
     console.print(f"原始金额 (Original Amount): [bold]{format_currency(cny_amount, 'CNY')}[/bold]")
     console.print("="*80)
+    if analysis.get('deadline_exceeded'):
+        console.print("[yellow]⏱️  已用完时间预算，结果可能不完整或使用了缓存的旧汇率[/yellow]")
     
     # Direct conversion info
     console.print(f"\n[bold]直接兑换 (Direct Conversion):[/bold]")
@@ -72,14 +85,18 @@ def display_conversion_analysis(analysis: dict):
     console.print(f"节省金额: {format_currency(analysis['savings'], 'USD')}")
     console.print(f"收益率: {format_percentage(best_path.efficiency_score)}")
     
-    # Statistics
-    total_currencies = len(all_paths)
-    positive_paths = len([p for p in all_paths if p.efficiency_score > 0])
+    # Statistics (one pass; precomputed over every path when the analysis kept only the top-k)
+    stats = analysis.get('stats')
+    if stats is None:
+        stats = RunningStats()
+        for path in all_paths:
+            stats.add(path.efficiency_score)
+    total_currencies = stats.count
     
     console.print(f"\n[bold]分析统计 (Analysis Statistics):[/bold]")
     console.print(f"总分析货币: {total_currencies} 种")
-    console.print(f"有正收益的路径: {positive_paths} 条")
-    console.print(f"收益率范围: {min(p.efficiency_score for p in all_paths):+.4f}% ~ {max(p.efficiency_score for p in all_paths):+.4f}%")
+    console.print(f"有正收益的路径: {stats.positive} 条")
+    console.print(f"收益率范围: {stats.min_score:+.4f}% ~ {stats.max_score:+.4f}%")
     
     # Determine how many rows to show
     max_display = 50  # Maximum rows to display in table
@@ -90,7 +107,19 @@ def display_conversion_analysis(analysis: dict):
     if total_currencies > max_display:
         table_title += f" (共{total_currencies}种货币)"
     
-    table = Table(title=table_title)
+    console.print(_ranking_table(table_title, display_paths))
+    
+    if total_currencies > max_display:
+        console.print(f"\n[dim]注: 仅显示前{max_display}条结果，完整列表包含{total_currencies}种货币[/dim]")
+    
+    # Summary
+    if best_path.efficiency_score > 0:
+        console.print(f"\n[bold green]推荐使用 {best_path.intermediate_currency} 作为中间货币，可获得额外收益！[/bold green]")
+    else:
+        console.print(f"\n[bold yellow]直接兑换可能是更好的选择。[/bold yellow]")
+
+def _ranking_table(title: str, paths: Sequence[ConversionPath]) -> Table:
+    table = Table(title=title)
     table.add_column("排名", style="cyan", no_wrap=True, width=4)
     table.add_column("中间货币", style="magenta", width=8)
     table.add_column("CNY汇率", style="cyan", width=10)
@@ -98,7 +127,7 @@ def display_conversion_analysis(analysis: dict):
     table.add_column("最终USD", style="green", width=12)
     table.add_column("收益率", style="yellow", width=10)
     
-    for i, path in enumerate(display_paths, 1):
+    for i, path in enumerate(paths, 1):
         efficiency_color = "green" if path.efficiency_score > 0 else "red" if path.efficiency_score < 0 else "white"
         
         table.add_row(
@@ -110,16 +139,138 @@ def display_conversion_analysis(analysis: dict):
             f"[{efficiency_color}]{path.efficiency_score:+.4f}%[/{efficiency_color}]"
         )
     
+    return table
+
+def display_live_ranking(paths: Iterable[ConversionPath], top_k: int = 20,
+                         refresh_seconds: float = 0.25) -> Tuple[List[ConversionPath], RunningStats]:
+    """Render a ranking table that updates while paths stream in.
+    
+    Only the best top_k paths are held (a bounded min-heap), so memory stays
+    constant however many currencies are analyzed. Returns the final top_k
+    paths, best first, and statistics over every path seen.
+    """
+    stats = RunningStats()
+    heap: List[Tuple[float, int, ConversionPath]] = []
+    
+    def render() -> Table:
+        best = [path for _, _, path in sorted(heap, reverse=True)]
+        return _ranking_table(f"\n实时汇率排行 - 已分析 {stats.count} 种货币", best)
+    
+    with Live(render(), console=console, transient=True) as live:
+        last_refresh = time.monotonic()
+        for path in paths:
+            stats.add(path.efficiency_score)
+            # Negative sequence numbers keep the earlier path on ties, as a stable sort would
+            entry = (path.efficiency_score, -stats.count, path)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+            
+            if time.monotonic() - last_refresh >= refresh_seconds:
+                live.update(render())
+                last_refresh = time.monotonic()
+        live.update(render())
+    
+    return [path for _, _, path in sorted(heap, reverse=True)], stats
+
+def display_rank_changes(changes: List[RankChange], limit: int = 10):
+    """Show which currencies moved after a refresh"""
+    if not changes:
+        console.print("[dim]排名无变化[/dim]")
+        return
+    
+    parts = []
+    for change in changes[:limit]:
+        if change.old_rank is None:
+            parts.append(f"[cyan]{change.currency} 新进第{change.new_rank}名[/cyan]")
+        elif change.new_rank is None:
+            parts.append(f"[dim]{change.currency} 移出排行[/dim]")
+        elif change.delta > 0:
+            parts.append(f"[green]{change.currency} ↑{change.delta}[/green]")
+        else:
+            parts.append(f"[red]{change.currency} ↓{-change.delta}[/red]")
+    more = f" 等{len(changes)}项" if len(changes) > limit else ""
+    console.print(f"\n[bold]排名变化:[/bold] {', '.join(parts)}{more}")
+
+def display_multi_hop_paths(paths: List[MultiHopPath], cny_amount: float):
+    """Display ranked multi-hop conversion routes"""
+    if not paths:
+        console.print("[yellow]未找到多跳兑换路径[/yellow]")
+        return
+    
+    table = Table(title=f"\n多跳兑换路径排行 - 前{len(paths)}名 ({format_currency(cny_amount, 'CNY')})")
+    table.add_column("排名", style="cyan", no_wrap=True, width=4)
+    table.add_column("兑换路径", style="magenta")
+    table.add_column("步数", style="cyan", width=4)
+    table.add_column("最终USD", style="green", width=12)
+    table.add_column("收益率", style="yellow", width=10)
+    
+    for i, path in enumerate(paths, 1):
+        table.add_row(
+            str(i),
+            " → ".join(path.currencies),
+            str(path.hops),
+            format_currency(path.total_amount, 'USD'),
+            format_percentage(path.efficiency_score)
+        )
+    
     console.print(table)
+
+def display_best_intermediates(best: BestIntermediates, limit: int = 30):
+    """Display the best intermediate for each source -> target pair, largest gain first"""
+    pairs = best.best_pairs(limit)
+    if not pairs:
+        console.print("[yellow]未找到可用的货币对路径[/yellow]")
+        return
     
-    if total_currencies > max_display:
-        console.print(f"\n[dim]注: 仅显示前{max_display}条结果，完整列表包含{total_currencies}种货币[/dim]")
+    table = Table(title=f"\n各货币对最佳中间货币 - 前{len(pairs)}名 ({len(best.sources)}×{len(best.targets)}组合)")
+    table.add_column("排名", style="cyan", no_wrap=True, width=4)
+    table.add_column("货币对", style="magenta")
+    table.add_column("中间货币", style="magenta")
+    table.add_column("路径汇率", style="green")
+    table.add_column("直接汇率", style="blue")
+    table.add_column("收益率", style="yellow", width=10)
     
-    # Summary
-    if best_path.efficiency_score > 0:
-        console.print(f"\n[bold green]推荐使用 {best_path.intermediate_currency} 作为中间货币，可获得额外收益！[/bold green]")
-    else:
-        console.print(f"\n[bold yellow]直接兑换可能是更好的选择。[/bold yellow]")
+    for i, pair in enumerate(pairs, 1):
+        table.add_row(
+            str(i),
+            f"{pair.source} → {pair.target}",
+            pair.intermediate,
+            f"{pair.rate:.6f}",
+            f"{pair.direct_rate:.6f}",
+            format_percentage(pair.efficiency_score)
+        )
+    
+    console.print(table)
+
+def display_batch_recommendations(result: dict, limit: int = 20):
+    """Display per-amount results of CurrencyAnalyzer.get_batch_recommendations"""
+    if result['status'] != 'success':
+        console.print(f"[red]Error: {result['message']}[/red]")
+        return
+    
+    amounts = result['cny_amounts']
+    best_path = result['best_path']
+    console.print(f"\n[bold]批量金额分析[/bold]: {len(amounts)} 个金额，最佳中间货币 "
+                  f"[magenta]{best_path.intermediate_currency}[/magenta] "
+                  f"({format_percentage(best_path.efficiency_score)})，"
+                  f"总节省 {format_currency(float(result['savings'].sum()), 'USD')}")
+    
+    shown = min(len(amounts), limit)
+    table = Table(title=f"各金额兑换结果 - 前{shown}个")
+    table.add_column("人民币金额", style="cyan", justify="right")
+    table.add_column("直接兑换USD", style="blue", justify="right")
+    table.add_column("最佳路径USD", style="green", justify="right")
+    table.add_column("节省", style="yellow", justify="right")
+    for i in range(shown):
+        table.add_row(
+            format_currency(float(amounts[i]), 'CNY'),
+            format_currency(float(result['direct_usd_amounts'][i]), 'USD'),
+            format_currency(float(result['best_usd_amounts'][i]), 'USD'),
+            format_currency(float(result['savings'][i]), 'USD')
+        )
+    console.print(table)
 
 def display_loading():
     """Display loading message"""